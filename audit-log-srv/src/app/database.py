@@ -1,11 +1,23 @@
 import os
+from typing import Optional
+from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import Column, String, JSON, TIMESTAMP, text, UUID, MetaData, Integer
+from sqlalchemy import (
+    Column, String, JSON, TIMESTAMP, text, UUID, MetaData, Integer, BigInteger, Identity, Table, Index, select, func
+)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.schema import CreateSchema
 from loguru import logger
 import uuid
+import asyncpg
 from dotenv import load_dotenv
+from app.admission import TimedQueuePool
+from app.read_your_writes import mark_write, wrote_recently
+from app.profiling import slow_query_log
+from app.secrets_provider import secrets_provider, engine_options, replica_override
+from app.schema_migrations import lock_migrations, migrate, schema_drift, stored_schema_version
+from app.migrations import MIGRATIONS
 
 Base = declarative_base()
 
@@ -14,6 +26,20 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 DATABASE_SCHEMA = os.getenv("DATABASE_SCHEMA")
+# Optional read replica; GET routes use it unless the client wrote recently
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+# "create" creates or migrates the tables on boot; "verify" only checks the
+# stored schema version (use it for workers once one instance has migrated)
+DB_STARTUP_MODE = os.getenv("DB_STARTUP_MODE", "create").lower()
+
+# Bump whenever the table definitions change, with the DDL in app.migrations
+SCHEMA_VERSION = 4
+
+if secrets_provider is not None:
+    # Credentials and schema come from Vault instead of DATABASE_URL
+    credentials = secrets_provider.load()
+    DATABASE_URL = credentials.url()
+    DATABASE_SCHEMA = credentials.schema or DATABASE_SCHEMA
 
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL environment variable is not set")
@@ -25,14 +51,15 @@ engine = create_async_engine(
     DATABASE_URL,
     echo=True,
     pool_pre_ping=True,  # Enables connection health checks
+    poolclass=TimedQueuePool,  # Reports checkout waits to admission control
     pool_size=5,         # Set connection pool size
     max_overflow=10,     # Maximum number of connections to create beyond pool_size
-    connect_args={
-        "server_settings": {
-            "application_name": "audit-log-service"  # Helps with debugging
-        }
-    }
+    **engine_options("audit-log-service")  # application_name helps with debugging
 )
+if secrets_provider is not None:
+    secrets_provider.attach(engine)
+# Statements over SLOW_QUERY_THRESHOLD_MS are kept for GET /admin/slow-queries
+slow_query_log.attach(engine)
 
 logger.info("Database engine created with URL: {}", DATABASE_URL)
 
@@ -42,10 +69,46 @@ async_session = sessionmaker(
     expire_on_commit=False
 )
 
+# Read engine (falls back to the primary when no replica is configured).
+# With Vault the replica shares the leased credentials: its host comes from the
+# secret's read_host, or from DATABASE_READ_URL, whose credentials are ignored.
+if secrets_provider is not None:
+    read_replica_url = replica_override(DATABASE_READ_URL)
+    has_read_replica = secrets_provider.has_replica(read_replica_url)
+else:
+    read_replica_url = None
+    has_read_replica = bool(DATABASE_READ_URL)
+
+if has_read_replica:
+    read_engine = create_async_engine(
+        DATABASE_READ_URL if secrets_provider is None else DATABASE_URL,
+        echo=True,
+        pool_pre_ping=True,
+        poolclass=TimedQueuePool,
+        pool_size=5,
+        max_overflow=10,
+        **engine_options("audit-log-service-read", replica=True, replica_url=read_replica_url)
+    )
+    if secrets_provider is not None:
+        secrets_provider.attach(read_engine)
+    slow_query_log.attach(read_engine)
+    logger.info("Read replica engine created")
+else:
+    read_engine = engine
+
+async_read_session = sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
     __table_args__ = {"schema": DATABASE_SCHEMA} if DATABASE_SCHEMA else None  # Explicit schema binding
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)  # Use uuid.uuid4
+    # Insert order; the event id of the live stream, which clients resume from
+    seq = Column(BigInteger, Identity(always=True), nullable=False, unique=True)
     timestamp = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"), nullable=False)
     service_name = Column(String(255), nullable=False)
     service_id = Column(String(255), nullable=True)
@@ -56,26 +119,104 @@ class AuditLog(Base):
     previous_data = Column(JSON, nullable=True)
     new_data = Column(JSON, nullable=True)
     meta_data = Column(JSON, nullable=True)
-    
+
+    # Fetch seq with RETURNING on flush, so it can be notified before commit
+    __mapper_args__ = {"eager_defaults": True}
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+        {"schema": DATABASE_SCHEMA} if DATABASE_SCHEMA else {}
+    )
+    scope = Column(String(255), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    claim_token = Column(String(32), nullable=True)  # The request holding the key; replaced on takeover
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is in progress
+    response_body = Column(JSON, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
+schema_version_table = Table(
+    "schema_version",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+    schema=DATABASE_SCHEMA
+)
 
 # Setup database tables
 async def setup_db():
+    if DB_STARTUP_MODE == "verify":
+        await verify_schema_version()
+        return
+    await migrate_db()
+
+# Create the tables of a new database, or migrate an existing one from its
+# stamped version, then stamp SCHEMA_VERSION. See app.migrations.
+async def migrate_db():
     try:
         async with engine.begin() as conn:
+            await lock_migrations(conn)
             # Create the schema if it doesn't exist
             if DATABASE_SCHEMA:
                 await conn.execute(CreateSchema(DATABASE_SCHEMA, if_not_exists=True))
                 logger.info(f"Schema '{DATABASE_SCHEMA}' ensured for audit_logs table.")
-            
-            # Create all tables
+
+            stored_version = await conn.run_sync(stored_schema_version, schema_version_table, "audit_logs")
+            if stored_version is not None and stored_version > SCHEMA_VERSION:
+                raise RuntimeError(
+                    f"Database schema version {stored_version} is newer than this code's version {SCHEMA_VERSION}"
+                )
+
+            # Create new tables, then bring the existing ones up to date
             await conn.run_sync(Base.metadata.create_all)
-            logger.info("Database setup complete.")
+            if stored_version is not None:
+                await migrate(conn, MIGRATIONS, stored_version, SCHEMA_VERSION, DATABASE_SCHEMA)
+
+            # Only stamp the version on tables that match the models
+            drift = await conn.run_sync(schema_drift, Base.metadata)
+            if drift:
+                raise RuntimeError(
+                    f"Tables do not match schema version {SCHEMA_VERSION} after migrating ({'; '.join(drift)})"
+                )
+
+            # Record the schema version checked by DB_STARTUP_MODE=verify
+            await conn.execute(
+                insert(schema_version_table)
+                .values(id=1, version=SCHEMA_VERSION)
+                .on_conflict_do_update(index_elements=["id"], set_={"version": SCHEMA_VERSION})
+            )
+            logger.info(f"Database setup complete (schema version {SCHEMA_VERSION}).")
     except Exception as e:
         logger.error(f"Failed to setup database: {str(e)}")
         raise
 
-# Get a database session
-async def get_db_session():
+# Check the stored schema version with a single query and fail fast on mismatch
+async def verify_schema_version():
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(schema_version_table.c.version).where(schema_version_table.c.id == 1)
+            )
+            version = result.scalar_one_or_none()
+    except Exception as e:
+        logger.error(f"Failed to read database schema version: {str(e)}")
+        raise RuntimeError(f"Could not read database schema version: {str(e)}") from e
+
+    if version != SCHEMA_VERSION:
+        message = (
+            f"Database schema version {version} does not match expected version {SCHEMA_VERSION}; "
+            f"run once with DB_STARTUP_MODE=create or migrate the database"
+        )
+        logger.error(message)
+        raise RuntimeError(message)
+    logger.info(f"Database schema version {version} verified.")
+
+# Get a database session on the primary (used by routes that write)
+async def get_db_session(request: Request = None):
+    mark_write(request)
     try:
         logger.debug("Creating a new database session...")
         async with async_session() as session:
@@ -83,4 +224,40 @@ async def get_db_session():
         logger.debug("Database session closed successfully.")
     except Exception as e:
         logger.error("Failed to get database session: {}", str(e))
+        raise
+
+# Session factory for reads: the replica, or the primary while the caller wrote recently.
+# Used directly by streaming responses, which outlive the request's dependencies.
+def read_session_factory(request: Optional[Request] = None):
+    if read_engine is engine or wrote_recently(request):
+        return async_session
+    return async_read_session
+
+# Where reads of the caller are served, as part of the key of coalesced reads.
+# None while the caller wrote recently: its reads must see its own
+# writes, so they never join a query that may have started before the write.
+def coalescing_target(request: Optional[Request] = None) -> Optional[str]:
+    if wrote_recently(request):
+        return None
+    return "primary" if read_engine is engine else "replica"
+
+# A connection outside the pool (e.g. for LISTEN), opened with the current credentials
+async def connect_unpooled(**kwargs) -> asyncpg.Connection:
+    if secrets_provider is not None:
+        return await secrets_provider.connect(**kwargs)
+    dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    return await asyncpg.connect(dsn, **kwargs)
+
+# Get a database session for read-only routes. Uses the read replica unless the
+# caller wrote within the last READ_YOUR_WRITES_WINDOW seconds.
+async def get_read_db_session(request: Request = None):
+    session_factory = read_session_factory(request)
+    use_primary = session_factory is async_session
+    try:
+        logger.debug("Creating a new read database session (primary={})...", use_primary)
+        async with session_factory() as session:
+            yield session
+        logger.debug("Read database session closed successfully.")
+    except Exception as e:
+        logger.error("Failed to get read database session: {}", str(e))
         raise
\ No newline at end of file
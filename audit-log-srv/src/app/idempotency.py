@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import select, update, delete, func
+from loguru import logger
+
+from app.database import IdempotencyKey, async_session
+
+# How long a completed response is replayed for retries
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+# How long a claim outlives its last extension, i.e. how soon a retry can take
+# over the key of a request that never completes (e.g. a crashed worker's).
+# Claims are extended every third of it while the request is in progress.
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "60"))
+# How long a duplicate waits for the first request before giving up with a conflict
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "10"))
+IDEMPOTENCY_CLEANUP_INTERVAL = int(os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL", "300"))
+
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+
+
+class IdempotencyKeyMismatchError(Exception):
+    """The key was already used for a request with a different payload."""
+    pass
+
+
+class IdempotencyConflictError(Exception):
+    """The first request with this key did not finish within the wait timeout."""
+    pass
+
+
+class IdempotencyClaimLostError(Exception):
+    """The claim expired and another request took over the key before completion."""
+    pass
+
+
+@dataclass
+class IdempotentResponse:
+    status_code: int
+    body: Any
+
+
+@dataclass
+class IdempotencyClaim:
+    """A key owned by the current request, identified by the token stored with it"""
+    scope: str
+    key: str
+    token: str
+    heartbeat: Optional[asyncio.Task] = None
+
+    def stop_heartbeat(self):
+        if self.heartbeat is not None:
+            self.heartbeat.cancel()
+            self.heartbeat = None
+
+
+_last_cleanup = 0.0
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """Stable hash of the request payload used to detect key reuse."""
+    canonical = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _claimed_by(claim: IdempotencyClaim) -> tuple:
+    """Conditions matching the record only while the claim still owns it"""
+    return (
+        IdempotencyKey.scope == claim.scope,
+        IdempotencyKey.key == claim.key,
+        IdempotencyKey.claim_token == claim.token,
+        IdempotencyKey.status_code.is_(None)
+    )
+
+
+async def _claim_key(db: AsyncSession, scope: str, key: str, request_hash: str, token: str) -> bool:
+    """Insert the key as in progress, taking over expired records. Returns True if claimed."""
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT)
+    statement = insert(IdempotencyKey)\
+        .values(scope=scope, key=key, request_hash=request_hash, claim_token=token, expires_at=expires_at)\
+        .on_conflict_do_update(
+            index_elements=[IdempotencyKey.scope, IdempotencyKey.key],
+            set_={
+                "request_hash": request_hash,
+                "claim_token": token,
+                "status_code": None,
+                "response_body": None,
+                "created_at": func.now(),
+                "expires_at": expires_at
+            },
+            where=IdempotencyKey.expires_at < func.now()
+        )\
+        .returning(IdempotencyKey.key)
+    result = await db.execute(statement)
+    claimed = result.scalar_one_or_none() is not None
+    await db.commit()
+    return claimed
+
+
+async def _extend_claim(claim: IdempotencyClaim, owner: Optional[asyncio.Task]):
+    """
+    Push the claim's expiry forward while the owning request runs, in sessions of
+    its own. Stops when the owner finishes without completing or releasing the
+    claim (e.g. cancelled), and when another request took the key over.
+    """
+    interval = IDEMPOTENCY_LOCK_TIMEOUT / 3
+    while True:
+        await asyncio.sleep(interval)
+        if owner is not None and owner.done():
+            return
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT)
+        try:
+            async with async_session() as db:
+                result = await db.execute(
+                    update(IdempotencyKey).where(*_claimed_by(claim)).values(expires_at=expires_at)
+                )
+                await db.commit()
+        except Exception as e:
+            # Retried on the next beat; the claim stays valid until it expires
+            logger.warning(f"Error extending idempotency key {claim.key}: {str(e)}")
+            continue
+        if not result.rowcount:
+            logger.warning(f"Lost the claim on idempotency key {claim.key} in scope {claim.scope}")
+            return
+
+
+async def _get_record(db: AsyncSession, scope: str, key: str):
+    query = select(
+        IdempotencyKey.request_hash,
+        IdempotencyKey.status_code,
+        IdempotencyKey.response_body
+    ).where(
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key,
+        IdempotencyKey.expires_at >= func.now()
+    )
+    result = await db.execute(query)
+    record = result.one_or_none()
+    # End the read transaction so it is not held open while waiting
+    await db.commit()
+    return record
+
+
+async def begin_idempotent_request(
+    db: AsyncSession,
+    scope: str,
+    key: str,
+    request_hash: str
+) -> Union[IdempotencyClaim, IdempotentResponse]:
+    """
+    Claim an idempotency key for the current request. Returns the claim when the
+    caller owns the key and must process the request, then complete or release it;
+    or the stored response of an earlier request with the same key. Concurrent
+    duplicates, in any worker, poll the record until the first request stores its
+    response.
+    """
+    await _cleanup_expired(db)
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+    interval = POLL_INTERVAL
+    token = uuid.uuid4().hex
+    while True:
+        if await _claim_key(db, scope, key, request_hash, token):
+            logger.debug(f"Claimed idempotency key {key} in scope {scope}")
+            claim = IdempotencyClaim(scope, key, token)
+            claim.heartbeat = asyncio.create_task(_extend_claim(claim, asyncio.current_task()))
+            return claim
+
+        record = await _get_record(db, scope, key)
+        if record is not None:
+            if record.request_hash != request_hash:
+                raise IdempotencyKeyMismatchError(
+                    "Idempotency-Key was already used with a different request payload"
+                )
+            if record.status_code is not None:
+                logger.info(f"Replaying stored response for idempotency key {key} in scope {scope}")
+                return IdempotentResponse(record.status_code, record.response_body)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise IdempotencyConflictError(
+                "A request with this Idempotency-Key is still being processed"
+            )
+        await asyncio.sleep(min(remaining, interval))
+        interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+
+async def complete_idempotent_request(
+    db: AsyncSession,
+    claim: IdempotencyClaim,
+    status_code: int,
+    body: Any
+):
+    """
+    Store the response for replay in the caller's transaction, which must be the
+    one making the request's changes: both commit together, so a crash cannot
+    leave the changes without the response a retry would replay. Raises
+    IdempotencyClaimLostError when another request took the key over meanwhile;
+    the caller must then roll its changes back, as that request makes them too.
+    """
+    claim.stop_heartbeat()
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=IDEMPOTENCY_TTL)
+    result = await db.execute(
+        update(IdempotencyKey)
+        .where(*_claimed_by(claim))
+        .values(status_code=status_code, response_body=body, expires_at=expires_at)
+    )
+    if result.rowcount != 1:
+        raise IdempotencyClaimLostError(
+            "The Idempotency-Key was taken over by another request while this one was processed"
+        )
+
+
+async def release_idempotent_request(db: AsyncSession, claim: IdempotencyClaim):
+    """Drop the claim of a failed request so a retry can process it again."""
+    claim.stop_heartbeat()
+    try:
+        await db.rollback()
+        await db.execute(delete(IdempotencyKey).where(*_claimed_by(claim)))
+        await db.commit()
+    except Exception as e:
+        # The claim expires after IDEMPOTENCY_LOCK_TIMEOUT anyway
+        logger.error(f"Error releasing idempotency key {claim.key}: {str(e)}")
+
+
+async def _cleanup_expired(db: AsyncSession):
+    """Delete expired records, at most once per IDEMPOTENCY_CLEANUP_INTERVAL per worker."""
+    global _last_cleanup
+    now = time.monotonic()
+    if now - _last_cleanup < IDEMPOTENCY_CLEANUP_INTERVAL:
+        return
+    _last_cleanup = now
+    try:
+        result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < func.now()))
+        await db.commit()
+        if result.rowcount:
+            logger.info(f"Deleted {result.rowcount} expired idempotency keys")
+    except Exception as e:
+        await db.rollback()
+        logger.warning(f"Error deleting expired idempotency keys: {str(e)}")
@@ -0,0 +1,97 @@
+import json
+import os
+from functools import partial
+from typing import Any, List
+
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+
+from app.schemas import AuditLogEntry
+
+# msgpack is optional: without it MessagePack bodies are answered with 415
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+# Upper bound for entries submitted in one batch request
+AUDIT_BATCH_MAX_ENTRIES = int(os.getenv("AUDIT_BATCH_MAX_ENTRIES", "1000"))
+
+entry_batch_adapter = TypeAdapter(List[AuditLogEntry])
+
+# Request body documentation for endpoints that decode their body themselves
+INGEST_CONTENT_TYPES = ("application/json", "application/msgpack")
+
+
+def request_body_schema(schema: dict) -> dict:
+    """openapi_extra describing a body accepted as JSON or MessagePack"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {media_type: {"schema": schema} for media_type in INGEST_CONTENT_TYPES}
+        }
+    }
+
+
+async def decoded_body(request: Request) -> Any:
+    """
+    Decode a JSON or MessagePack request body according to its Content-Type.
+    Both decode straight into dicts and lists; nothing is re-encoded afterwards.
+    """
+    media_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    body = await request.body()
+    if media_type in MSGPACK_TYPES:
+        if msgpack is None:
+            raise HTTPException(status_code=415, detail="MessagePack bodies are not supported")
+        decode = partial(msgpack.unpackb, raw=False)
+    elif media_type == "application/json" or media_type.endswith("+json"):
+        decode = json.loads
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported Content-Type {media_type}; use application/json or application/msgpack"
+        )
+    try:
+        return decode(body)
+    except ValueError as e:
+        # json.JSONDecodeError and the msgpack unpack errors are ValueErrors
+        raise HTTPException(status_code=400, detail=f"Malformed request body: {str(e)}")
+
+
+def _validation_error(error: ValidationError) -> RequestValidationError:
+    """Report body validation errors the way FastAPI does for declared bodies"""
+    return RequestValidationError([
+        {**detail, "loc": ("body", *detail["loc"])}
+        for detail in error.errors(include_url=False)
+    ])
+
+
+async def audit_log_entry_body(request: Request) -> AuditLogEntry:
+    """Dependency: one audit log entry from a JSON or MessagePack body"""
+    payload = await decoded_body(request)
+    try:
+        return AuditLogEntry.model_validate(payload)
+    except ValidationError as e:
+        raise _validation_error(e)
+
+
+async def audit_log_batch_body(request: Request) -> List[AuditLogEntry]:
+    """
+    Dependency: a list of audit log entries from a JSON or MessagePack body, all
+    from one service_name, which scopes the batch's Idempotency-Key
+    """
+    payload = await decoded_body(request)
+    if isinstance(payload, list) and not 0 < len(payload) <= AUDIT_BATCH_MAX_ENTRIES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"A batch holds between 1 and {AUDIT_BATCH_MAX_ENTRIES} entries"
+        )
+    try:
+        entries = entry_batch_adapter.validate_python(payload)
+    except ValidationError as e:
+        raise _validation_error(e)
+    if len({entry.service_name for entry in entries}) > 1:
+        raise HTTPException(status_code=422, detail="A batch holds entries of a single service_name")
+    return entries
@@ -0,0 +1,34 @@
+# Schema changes per SCHEMA_VERSION, applied in DB_STARTUP_MODE=create (or with
+# `python src/main.py migrate`) to databases stamped with an older version.
+#
+# Upgrading a deployment:
+# 1. Run one instance in create mode, or the migrate command, with the new code.
+#    It locks, migrates from the stamped version and stamps SCHEMA_VERSION, all
+#    in one transaction; on failure nothing changes.
+# 2. Then start the workers in verify mode. Workers of the previous version fail
+#    their verify check against the new stamp, so roll them over rather than
+#    mixing versions.
+from app.schema_migrations import Migrations
+
+MIGRATIONS: Migrations = {
+    # 1: schema_version is a new table
+    # 2: idempotency_keys is a new table
+    # Stream positions: existing entries are numbered in timestamp order, then
+    # the identity continues after them
+    3: [
+        "ALTER TABLE {schema}audit_logs ADD COLUMN IF NOT EXISTS seq BIGINT",
+        "UPDATE {schema}audit_logs SET seq = ordered.position "
+        "FROM (SELECT id, row_number() OVER (ORDER BY \"timestamp\", id) AS position FROM {schema}audit_logs) AS ordered "
+        "WHERE audit_logs.id = ordered.id AND audit_logs.seq IS NULL",
+        "ALTER TABLE {schema}audit_logs ALTER COLUMN seq SET NOT NULL",
+        "ALTER TABLE {schema}audit_logs ALTER COLUMN seq ADD GENERATED ALWAYS AS IDENTITY",
+        "SELECT setval(pg_get_serial_sequence('{schema}audit_logs', 'seq'), "
+        "(SELECT coalesce(max(seq), 0) + 1 FROM {schema}audit_logs), false)",
+        "ALTER TABLE {schema}audit_logs ADD CONSTRAINT audit_logs_seq_key UNIQUE (seq)"
+    ],
+    # Idempotency claims are owned by a token. Requests in progress during the
+    # upgrade hold no token and fail to complete; their retries process again.
+    4: [
+        "ALTER TABLE {schema}idempotency_keys ADD COLUMN IF NOT EXISTS claim_token VARCHAR(32)"
+    ]
+}
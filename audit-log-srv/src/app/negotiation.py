@@ -0,0 +1,222 @@
+import csv
+import io
+import json
+import os
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+# msgpack and zstandard are optional: without them the formats are simply not offered
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+MSGPACK = "application/msgpack"
+
+# Buffered bodies smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
+VARY = "Accept, Accept-Encoding"
+
+
+class NotAcceptableError(Exception):
+    """None of the offered representations is acceptable to the client"""
+    pass
+
+
+def _parse_header(value: Optional[str]) -> List[Tuple[str, float]]:
+    """Split an Accept or Accept-Encoding header into (token, q) pairs"""
+    items = []
+    for part in (value or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, number = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        items.append((token.strip().lower(), q))
+    return items
+
+
+def available_formats(offered: Sequence[str]) -> List[str]:
+    return [media_type for media_type in offered if media_type != MSGPACK or msgpack is not None]
+
+
+def negotiate_format(accept: Optional[str], offered: Sequence[str]) -> str:
+    """
+    Pick the representation for an Accept header. The first offered media type is
+    the default for missing or wildcard headers. Raises NotAcceptableError when
+    nothing offered is acceptable.
+    """
+    offered = available_formats(offered)
+    if not accept or not accept.strip():
+        return offered[0]
+
+    def quality(media_type: str) -> float:
+        best, specificity = 0.0, -1
+        kind = media_type.split("/")[0]
+        for token, q in _parse_header(accept):
+            if token == media_type:
+                rank = 2
+            elif token == f"{kind}/*":
+                rank = 1
+            elif token == "*/*":
+                rank = 0
+            else:
+                continue
+            if rank > specificity:
+                best, specificity = q, rank
+        return best
+
+    scored = [(quality(media_type), -index, media_type) for index, media_type in enumerate(offered)]
+    q, _, media_type = max(scored)
+    if q <= 0:
+        raise NotAcceptableError(f"Acceptable representations: {', '.join(offered)}")
+    return media_type
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick zstd or gzip for an Accept-Encoding header, preferring zstd on equal q"""
+    accepted = dict(_parse_header(accept_encoding))
+    candidates = ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+    scored = [
+        (accepted.get(coding, accepted.get("*", 0.0)), -index, coding)
+        for index, coding in enumerate(candidates)
+    ]
+    q, _, coding = max(scored)
+    return coding if q > 0 else None
+
+
+def _csv_value(value: Any) -> Any:
+    # Nested values (included relationships, JSON columns) are embedded as JSON text
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return "" if value is None else value
+
+
+def render_csv(records: List[Dict[str, Any]], columns: Sequence[str], header: bool = True) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    for record in records:
+        writer.writerow([_csv_value(record.get(column)) for column in columns])
+    return buffer.getvalue().encode()
+
+
+def render(
+    records: List[Dict[str, Any]],
+    media_type: str,
+    columns: Sequence[str],
+    first: bool = True
+) -> bytes:
+    """
+    Encode JSON-compatible records. NDJSON, CSV and MessagePack are concatenable,
+    so a stream is rendered batch by batch (CSV writes its header on the first batch).
+    """
+    if media_type == JSON:
+        return json.dumps(records, separators=(",", ":")).encode()
+    if media_type == NDJSON:
+        return b"".join(json.dumps(record, separators=(",", ":")).encode() + b"\n" for record in records)
+    if media_type == CSV:
+        return render_csv(records, columns, header=first)
+    if media_type == MSGPACK:
+        return b"".join(msgpack.packb(record) for record in records)
+    raise NotAcceptableError(f"Unsupported media type {media_type}")
+
+
+class StreamCompressor:
+    """
+    Incremental gzip or zstd compressor. Every chunk is flushed on a block
+    boundary so clients can decode the stream as it arrives.
+    """
+
+    def __init__(self, coding: str):
+        self.coding = coding
+        if coding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        else:
+            # wbits 16 + MAX_WBITS writes the gzip container
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.coding == "zstd":
+            return self._compressor.compress(chunk) + \
+                self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    compressor = StreamCompressor(coding)
+    return compressor.compress(body) + compressor.finish()
+
+
+def negotiated_response(
+    records: List[Dict[str, Any]],
+    media_type: str,
+    coding: Optional[str],
+    columns: Sequence[str],
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Buffered response, compressed when a coding was negotiated and the body is large enough"""
+    body = render(records, media_type, columns)
+    headers = {**(headers or {}), "Vary": VARY}
+    if coding and len(body) >= COMPRESSION_MIN_SIZE:
+        body = compress(body, coding)
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def negotiated_stream(
+    batches: AsyncIterator[List[Dict[str, Any]]],
+    media_type: str,
+    coding: Optional[str],
+    columns: Sequence[str],
+    headers: Optional[Dict[str, str]] = None
+) -> StreamingResponse:
+    """
+    Streamed response rendering and compressing one batch at a time. Exports are
+    large, so a negotiated coding is always applied; the size is not known upfront.
+    """
+    headers = {**(headers or {}), "Vary": VARY}
+    if coding:
+        headers["Content-Encoding"] = coding
+
+    async def chunks():
+        compressor = StreamCompressor(coding) if coding else None
+        first = True
+        async for batch in batches:
+            chunk = render(batch, media_type, columns, first)
+            first = False
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        if first and media_type == CSV:
+            # Empty export: still send the header row
+            chunk = render_csv([], columns)
+            yield compressor.compress(chunk) if compressor else chunk
+        if compressor:
+            yield compressor.finish()
+
+    return StreamingResponse(chunks(), media_type=media_type, headers=headers)
@@ -0,0 +1,75 @@
+import math
+import os
+import time
+from typing import Optional
+
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+
+# Reads of a client that wrote within this many seconds go to the primary
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+
+# The time of the client's last write travels with the client, so whichever
+# worker serves its next read knows about the write. Browsers send the cookie
+# back; other clients echo the header.
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+def mark_write(request: Optional[Request]):
+    """Note that the request uses the primary for writing"""
+    if request is not None:
+        request.state.wrote = True
+
+
+def last_write_at(request: Optional[Request]) -> Optional[float]:
+    if request is None:
+        return None
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def wrote_recently(request: Optional[Request], window: float = READ_YOUR_WRITES_WINDOW) -> bool:
+    """Whether the caller wrote within the window, by the time it sent back"""
+    written_at = last_write_at(request)
+    if written_at is None:
+        return False
+    # Times in the future only come from clock skew between hosts or forged
+    # values; the window bounds them too
+    return abs(time.time() - written_at) < window
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pure ASGI middleware handing clients that wrote the time of their write, as
+    a cookie and a header. The time is taken when the response starts, after
+    the route committed.
+    """
+
+    def __init__(self, app, window: float = READ_YOUR_WRITES_WINDOW):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_last_write(message):
+            if message["type"] == "http.response.start" and scope.get("state", {}).get("wrote"):
+                written_at = f"{time.time():.3f}"
+                headers = MutableHeaders(raw=list(message.get("headers", [])))
+                headers.append(LAST_WRITE_HEADER, written_at)
+                headers.append(
+                    "set-cookie",
+                    f"{LAST_WRITE_COOKIE}={written_at}; Max-Age={math.ceil(self.window)}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": headers.raw}
+            await send(message)
+
+        await self.app(scope, receive, send_with_last_write)
@@ -1,30 +1,246 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert
 from sqlalchemy.future import select
-from typing import List, Optional
-from app.database import get_db_session, AuditLog
-from app.schemas import AuditLogEntry
+from typing import List, Optional, Tuple
+from uuid import UUID
+from pydantic import TypeAdapter
+from app.database import (
+    get_db_session,
+    get_read_db_session,
+    read_session_factory,
+    coalescing_target,
+    AuditLog
+)
+from app.single_flight import single_flight
+from app.stream import AuditLogFilter, audit_log_events, notify_audit_logs
+from app.schemas import AuditLogEntry, parse_fields, sparse_list_adapter
+from app.ingest import (
+    audit_log_entry_body,
+    audit_log_batch_body,
+    request_body_schema,
+    AUDIT_BATCH_MAX_ENTRIES
+)
+from app.idempotency import (
+    IdempotencyConflictError,
+    IdempotencyKeyMismatchError,
+    IdempotencyClaimLostError,
+    IdempotentResponse,
+    request_fingerprint,
+    begin_idempotent_request,
+    complete_idempotent_request,
+    release_idempotent_request
+)
+from app.negotiation import (
+    JSON,
+    NDJSON,
+    CSV,
+    MSGPACK,
+    VARY,
+    NotAcceptableError,
+    negotiate_format,
+    negotiate_encoding,
+    negotiated_response,
+    negotiated_stream
+)
 from loguru import logger
 from datetime import datetime
+import os
 
 router = APIRouter()
 
-@router.post("/audit-logs/", status_code=201)
-async def create_audit_log(log_entry: AuditLogEntry, db: AsyncSession = Depends(get_db_session)):
+# Entries fetched per query while streaming an export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Representations offered by listings and exports, the first one being the default
+LIST_FORMATS = (JSON, CSV, MSGPACK, NDJSON)
+EXPORT_FORMATS = (NDJSON, CSV, MSGPACK)
+entry_list_adapter = TypeAdapter(List[AuditLogEntry])
+
+
+def negotiate(
+    accept: Optional[str],
+    accept_encoding: Optional[str],
+    offered: Tuple[str, ...]
+) -> Tuple[str, Optional[str]]:
+    """Media type and content coding for the response, or 406"""
+    try:
+        return negotiate_format(accept, offered), negotiate_encoding(accept_encoding)
+    except NotAcceptableError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+
+def parse_audit_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    try:
+        return parse_fields(AuditLogEntry, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def audit_log_query(
+    fieldset: Optional[Tuple[str, ...]],
+    service_name: Optional[str] = None,
+    service_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """Audit log query for the given filters; with a fieldset only those columns are selected"""
+    if fieldset:
+        query = select(*(getattr(AuditLog, field) for field in fieldset))
+    else:
+        query = select(AuditLog)
+
+    # Apply filters based on query parameters
+    if service_name:
+        query = query.filter(AuditLog.service_name == service_name)
+    if service_id:
+        query = query.filter(AuditLog.service_id == service_id)
+    if user_id:
+        query = query.filter(AuditLog.user_id == user_id)
+    if entity_id:
+        query = query.filter(AuditLog.entity_id == entity_id)
+    if entity_type:
+        query = query.filter(AuditLog.entity_type == entity_type)
+    if time_from:
+        query = query.filter(AuditLog.timestamp >= time_from)
+    if time_to:
+        query = query.filter(AuditLog.timestamp <= time_to)
+    return query
+
+# Entries are accepted as JSON or MessagePack (Content-Type: application/msgpack)
+@router.post(
+    "/audit-logs/",
+    status_code=201,
+    openapi_extra=request_body_schema(AuditLogEntry.model_json_schema())
+)
+async def create_audit_log(
+    log_entry: AuditLogEntry = Depends(audit_log_entry_body),
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    db: AsyncSession = Depends(get_db_session)
+):
+    # Retries carrying the same Idempotency-Key get the stored response of the
+    # first request instead of writing a duplicate entry
+    idempotency_scope = f"audit-logs:create:{log_entry.service_name}"
+    claim = None
     try:
-        new_log = AuditLog(**log_entry.dict())
+        if idempotency_key:
+            stored = await begin_idempotent_request(
+                db,
+                idempotency_scope,
+                idempotency_key,
+                request_fingerprint(log_entry.model_dump())
+            )
+            if isinstance(stored, IdempotentResponse):
+                return JSONResponse(
+                    content=stored.body,
+                    status_code=stored.status_code,
+                    headers={"Idempotency-Replayed": "true"}
+                )
+            claim = stored
+    except IdempotencyKeyMismatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        new_log = AuditLog(**log_entry.model_dump())
         db.add(new_log)
+        await db.flush()
+        await notify_audit_logs(db, [new_log.seq])
+        body = jsonable_encoder({"log_id": new_log.id, "message": "Audit log entry created successfully"})
+        if claim:
+            # Stored with the entry, so a retry never writes it twice
+            await complete_idempotent_request(db, claim, 201, body)
         await db.commit()
-        await db.refresh(new_log)
         logger.info(f"Audit Log Entry: '{AuditLogEntry}'.")
-        return {"log_id": new_log.id, "message": "Audit log entry created successfully"}
+    except IdempotencyClaimLostError as e:
+        # The request that took the key over writes the entry instead
+        await db.rollback()
+        logger.warning(f"Rolled back audit log entry: {str(e)}")
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         await db.rollback()
         logger.error(f"Failed to create audit log entry: {AuditLogEntry}")
+        if claim:
+            await release_idempotent_request(db, claim)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return body
+
+@router.post(
+    "/audit-logs/batch",
+    status_code=201,
+    openapi_extra=request_body_schema({
+        "type": "array",
+        "items": AuditLogEntry.model_json_schema(),
+        "minItems": 1,
+        "maxItems": AUDIT_BATCH_MAX_ENTRIES
+    })
+)
+async def create_audit_logs(
+    log_entries: List[AuditLogEntry] = Depends(audit_log_batch_body),
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    db: AsyncSession = Depends(get_db_session)
+):
+    # Writes a batch of entries with one multi-row INSERT; all or none are stored.
+    # Keys are chosen by producers, so they are scoped per service like single entries.
+    idempotency_scope = f"audit-logs:batch:{log_entries[0].service_name}"
+    claim = None
+    try:
+        if idempotency_key:
+            stored = await begin_idempotent_request(
+                db,
+                idempotency_scope,
+                idempotency_key,
+                request_fingerprint([entry.model_dump() for entry in log_entries])
+            )
+            if isinstance(stored, IdempotentResponse):
+                return JSONResponse(
+                    content=stored.body,
+                    status_code=stored.status_code,
+                    headers={"Idempotency-Replayed": "true"}
+                )
+            claim = stored
+    except IdempotencyKeyMismatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        result = await db.execute(
+            insert(AuditLog).returning(AuditLog.id, AuditLog.seq),
+            [entry.model_dump() for entry in log_entries]
+        )
+        rows = result.all()
+        log_ids = [row.id for row in rows]
+        await notify_audit_logs(db, [row.seq for row in rows])
+        body = jsonable_encoder({"log_ids": log_ids, "message": f"{len(log_ids)} audit log entries created successfully"})
+        if claim:
+            await complete_idempotent_request(db, claim, 201, body)
+        await db.commit()
+        logger.info(f"Stored a batch of {len(log_ids)} audit log entries.")
+    except IdempotencyClaimLostError as e:
+        # The request that took the key over writes the batch instead
+        await db.rollback()
+        logger.warning(f"Rolled back a batch of audit log entries: {str(e)}")
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Failed to create a batch of {len(log_entries)} audit log entries: {str(e)}")
+        if claim:
+            await release_idempotent_request(db, claim)
         raise HTTPException(status_code=500, detail=str(e))
 
+    return body
+
 @router.get("/audit-logs/", response_model=List[AuditLogEntry])
 async def get_audit_logs(
+    request: Request,
+    response: Response,
     service_name: Optional[str] = None,
     service_id: Optional[str] = None,
     user_id: Optional[str] = None,
@@ -32,45 +248,148 @@ async def get_audit_logs(
     entity_type: Optional[str] = None,
     time_from: Optional[datetime] = None,
     time_to: Optional[datetime] = None,
-    db: AsyncSession = Depends(get_db_session),
+    fields: Optional[str] = Query(default=None, description="Comma separated AuditLogEntry fields to return"),
+    accept: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_read_db_session),
 ):
-    try:
-        # Default time_from to the current time if not provided
-        time_to = time_to or datetime.utcnow()
-
-        # Build the base query
-        query = select(AuditLog)
+    # With fields only those columns are read and a slim model serializes the rows.
+    # JSON, CSV, MessagePack or NDJSON are returned per Accept, compressed per Accept-Encoding.
+    fieldset = parse_audit_fields(fields)
+    media_type, coding = negotiate(accept, accept_encoding, LIST_FORMATS)
+    adapter = sparse_list_adapter(AuditLogEntry, fieldset) if fieldset else entry_list_adapter
 
-        # Apply filters based on query parameters
-        if service_name:
-            query = query.filter(AuditLog.service_name == service_name)
-        if service_id:
-            query = query.filter(AuditLog.service_id == service_id)
-        if user_id:
-            query = query.filter(AuditLog.user_id == user_id)
-        if entity_id:
-            query = query.filter(AuditLog.entity_id == entity_id)
-        if entity_type:
-            query = query.filter(AuditLog.entity_type == entity_type)
-        if time_from:
-            query = query.filter(AuditLog.timestamp >= time_from)
-        if time_to:
-            query = query.filter(AuditLog.timestamp <= time_to)
+    async def load():
+        # Build the base query; time_to defaults to the current time if not provided
+        query = audit_log_query(
+            fieldset, service_name, service_id, user_id, entity_id, entity_type,
+            time_from, time_to or datetime.utcnow()
+        )
         # Log the query for debugging
         logger.info(f"Executing Audit Log Query: {query}")
 
         # Execute the query
         result = await db.execute(query)
-        logs = result.scalars().all()
+        rows = result.all() if fieldset else result.scalars().all()
         # Log the results
-        if logs:
-            logger.info(f"Query Results: {len(logs)} records found.")
-            for log in logs:
-                logger.debug(f"Record: {log}")
+        if rows:
+            logger.info(f"Query Results: {len(rows)} records found.")
+            for row in rows:
+                logger.debug(f"Record: {row}")
         else:
             logger.info("No records found for the given query.")
+        # Shared with coalesced callers, so detached from this request's session
+        return adapter.validate_python(rows, from_attributes=True)
+
+    # Identical concurrent queries share one database round trip
+    target = coalescing_target(request)
+    key = (
+        "audit_logs", target, service_name, service_id, user_id, entity_id,
+        entity_type, time_from, time_to, fieldset
+    ) if target else None
+    try:
+        logs = await single_flight.do(key, load)
+        if media_type != JSON or coding:
+            records = adapter.dump_python(logs, mode="json")
+            columns = fieldset or tuple(AuditLogEntry.model_fields)
+            return negotiated_response(records, media_type, coding, columns)
+        if fieldset:
+            return Response(content=adapter.dump_json(logs), media_type="application/json", headers={"Vary": VARY})
+        response.headers["Vary"] = VARY
         return logs
     except Exception as e:
         # Log the error and raise an HTTPException
         logger.error(f"Failed to fetch audit logs: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/audit-logs/export")
+async def export_audit_logs(
+    request: Request,
+    service_name: Optional[str] = None,
+    service_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None,
+    fields: Optional[str] = Query(default=None, description="Comma separated AuditLogEntry fields to return"),
+    accept: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+):
+    # Streams every matching entry in seq (insertion) order, EXPORT_BATCH_SIZE at a
+    # time with keyset pagination over seq: each chunk is read in a short
+    # transaction, so no cursor or connection is held while the client downloads.
+    # Newline-delimited JSON by default; CSV or MessagePack per Accept. Compressed
+    # chunk by chunk per Accept-Encoding.
+    fieldset = parse_audit_fields(fields)
+    media_type, coding = negotiate(accept, accept_encoding, EXPORT_FORMATS)
+    query = audit_log_query(
+        fieldset, service_name, service_id, user_id, entity_id, entity_type, time_from, time_to
+    ).order_by(AuditLog.seq).limit(EXPORT_BATCH_SIZE)
+    if fieldset:
+        # The position of the next chunk, whatever the fieldset
+        query = query.add_columns(AuditLog.seq)
+    adapter = sparse_list_adapter(AuditLogEntry, fieldset) if fieldset else entry_list_adapter
+    # The response outlives the request's dependencies, so it brings its own session
+    session_factory = read_session_factory(request)
+
+    async def batches():
+        exported = 0
+        after_seq = None
+        async with session_factory() as db:
+            while True:
+                try:
+                    page = query if after_seq is None else query.where(AuditLog.seq > after_seq)
+                    result = await db.execute(page)
+                    rows = result.all() if fieldset else result.scalars().all()
+                    await db.commit()
+                except Exception as e:
+                    await db.rollback()
+                    logger.error(f"Failed to export audit logs: {str(e)}")
+                    raise
+                if not rows:
+                    break
+                exported += len(rows)
+                yield adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+                if len(rows) < EXPORT_BATCH_SIZE:
+                    break
+                after_seq = rows[-1].seq
+        logger.info(f"Exported {exported} audit log entries.")
+
+    return negotiated_stream(batches(), media_type, coding, fieldset or tuple(AuditLogEntry.model_fields))
+
+
+@router.get("/audit-logs/stream")
+async def stream_audit_logs(
+    service_name: Optional[str] = None,
+    service_id: Optional[str] = None,
+    user_id: Optional[UUID] = None,
+    entity_id: Optional[UUID] = None,
+    entity_type: Optional[str] = None,
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None,
+    after: Optional[int] = Query(default=None, ge=0, description="Resume after this event id"),
+    last_event_id: Optional[str] = Header(default=None),
+):
+    # Server-Sent Events pushing new entries matching the filters as they are
+    # committed, instead of polling overlapping time windows. Each event's id is
+    # the entry's seq: reconnecting clients send it as Last-Event-ID (or ?after=)
+    # and first receive the entries committed since, then the live ones.
+    if after is None and last_event_id:
+        try:
+            after = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be an audit log event id")
+
+    backlog_query = None
+    if after is not None:
+        backlog_query = audit_log_query(
+            None, service_name, service_id, user_id, entity_id, entity_type, time_from, time_to
+        ).where(AuditLog.seq > after).order_by(AuditLog.seq).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    log_filter = AuditLogFilter(service_name, service_id, user_id, entity_id, entity_type, time_from, time_to)
+    return StreamingResponse(
+        audit_log_events(log_filter, backlog_query),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,10 +1,39 @@
-from pydantic import BaseModel, field_validator
-from typing import Optional, Dict, Any
+from functools import lru_cache
+from pydantic import BaseModel, TypeAdapter, create_model, field_validator
+from typing import Optional, Dict, Any, List, Tuple, Type
 from uuid import UUID
 from pydantic.config import ConfigDict
 import json
+import math
 import datetime
 
+JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def find_non_json_value(value: Any) -> Optional[str]:
+    """
+    Check that a decoded payload only holds JSON values, in a single iterative
+    pass over the structure. Returns a description of the first offending value,
+    or None when the payload is valid.
+    """
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            for key, nested in item.items():
+                if not isinstance(key, JSON_SCALARS):
+                    return f"keys must be str, int, float, bool or None, not {type(key).__name__}"
+                stack.append(nested)
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif isinstance(item, float):
+            if not math.isfinite(item):
+                return f"{item} is not a valid JSON number"
+        elif not isinstance(item, JSON_SCALARS):
+            return f"Object of type {type(item).__name__} is not JSON serializable"
+    return None
+
+
 class AuditLogEntry(BaseModel):
     service_name: str
     service_id: Optional[str] = None  # Optional service-specific ID
@@ -23,12 +52,11 @@ class AuditLogEntry(BaseModel):
     def validate_json_serializable(cls, value: Optional[Dict]) -> Optional[Dict]:
         if value is None:
             return value
-        try:
-            # Test if the data is JSON serializable
-            json.dumps(value)
-            return value
-        except (TypeError, ValueError) as e:
-            raise ValueError(f"Value must be JSON serializable: {str(e)}")
+        # Walk the structure once instead of encoding it just to check it
+        problem = find_non_json_value(value)
+        if problem is not None:
+            raise ValueError(f"Value must be JSON serializable: {problem}")
+        return value
 
     def model_dump_json(self, **kwargs):
         def custom_encoder(obj):
@@ -38,3 +66,32 @@ class AuditLogEntry(BaseModel):
             
         return json.dumps(self.model_dump(), default=custom_encoder, **kwargs)
 
+
+def parse_fields(model: Type[BaseModel], fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Parse a comma separated `fields` parameter into field names of `model`, in the
+    model's declaration order so equal sets share one cached sparse model.
+    Raises ValueError for unknown names.
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        raise ValueError("fields must name at least one field")
+    unknown = sorted(requested - model.model_fields.keys())
+    if unknown:
+        raise ValueError(
+            f"Unknown fields {', '.join(unknown)}; allowed: {', '.join(model.model_fields)}"
+        )
+    return tuple(name for name in model.model_fields if name in requested)
+
+
+@lru_cache(maxsize=256)
+def sparse_list_adapter(model: Type[BaseModel], fields: Tuple[str, ...]) -> TypeAdapter:
+    """List adapter for a model carrying only `fields` of `model`, built once per fieldset"""
+    sparse = create_model(
+        f"{model.__name__}Sparse",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields}
+    )
+    return TypeAdapter(List[sparse])
@@ -0,0 +1,274 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+import asyncpg
+from dotenv import load_dotenv
+from loguru import logger
+from sqlalchemy import event, exc
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# hvac is only needed with SECRETS_PROVIDER=vault
+try:
+    import hvac
+except ImportError:  # pragma: no cover
+    hvac = None
+
+load_dotenv()
+
+# "env" connects with DATABASE_URL; "vault" loads the database credentials from
+# the KV secret written by infrastructure/vault/initial_seed.py
+SECRETS_PROVIDER = os.getenv("SECRETS_PROVIDER", "env").lower()
+VAULT_ADDR = os.getenv("VAULT_ADDR", "http://localhost:8200")
+VAULT_TOKEN = os.getenv("VAULT_TOKEN")
+VAULT_MOUNT_POINT = os.getenv("VAULT_MOUNT_POINT", "secret")
+VAULT_DATABASE_PATH = os.getenv("VAULT_DATABASE_PATH", "database/config")
+# KV secrets carry no lease; they are re-read this often (seconds)
+VAULT_REFRESH_INTERVAL = float(os.getenv("VAULT_REFRESH_INTERVAL", "300"))
+# Leased secrets are refreshed once this fraction of the lease has passed
+VAULT_RENEW_AT = float(os.getenv("VAULT_RENEW_AT", "0.66"))
+# Delay before retrying a failed refresh; the cached credentials stay in use
+VAULT_RETRY_INTERVAL = float(os.getenv("VAULT_RETRY_INTERVAL", "10"))
+
+# Keys of database/config in infrastructure/vault/config/vault-structure.yaml
+REQUIRED_KEYS = ("username", "password", "host", "port", "dbname")
+
+
+class DatabaseCredentials(NamedTuple):
+    username: str
+    password: str
+    host: str
+    port: int
+    dbname: str
+    schema: Optional[str] = None
+    # Not applied: asyncpg always talks UTF-8 to the server
+    encoding: Optional[str] = None
+    # Optional read replica, reached with the same credentials
+    read_host: Optional[str] = None
+    read_port: Optional[int] = None
+
+    def url(self) -> URL:
+        return URL.create(
+            "postgresql+asyncpg",
+            username=self.username,
+            password=self.password,
+            host=self.host,
+            port=self.port,
+            database=self.dbname
+        )
+
+
+class VaultSecretsProvider:
+    """
+    Database credentials from Vault. They are fetched once at startup, cached,
+    and refreshed in the background before their lease ends. Connections are
+    opened with the cached credentials, so no request ever waits on Vault. When
+    the credentials change, pooled connections opened with the old ones are
+    replaced the next time they are checked out, never while in use.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        mount_point: str = VAULT_MOUNT_POINT,
+        path: str = VAULT_DATABASE_PATH,
+        refresh_interval: float = VAULT_REFRESH_INTERVAL,
+        renew_at: float = VAULT_RENEW_AT,
+        retry_interval: float = VAULT_RETRY_INTERVAL
+    ):
+        self.client = client
+        self.mount_point = mount_point
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.renew_at = renew_at
+        self.retry_interval = retry_interval
+        self.credentials: Optional[DatabaseCredentials] = None
+        # Bumped whenever the credentials change; tags pooled connections
+        self.generation = 0
+        self.lease_duration = 0
+        self.refreshed_at: Optional[float] = None
+        # Generation each new connection was opened with, until the pool tags it
+        self._opened_with: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _fetch(self) -> Tuple[DatabaseCredentials, int]:
+        response = self.client.secrets.kv.v2.read_secret_version(
+            path=self.path,
+            mount_point=self.mount_point,
+            raise_on_deleted_version=True
+        )
+        data = response["data"]["data"]
+        missing = [key for key in REQUIRED_KEYS if not data.get(key)]
+        if missing:
+            raise RuntimeError(f"Vault secret {self.mount_point}/{self.path} lacks {', '.join(missing)}")
+        credentials = DatabaseCredentials(
+            username=data["username"],
+            password=data["password"],
+            host=data["host"],
+            port=int(data["port"]),
+            dbname=data["dbname"],
+            schema=data.get("schema") or None,
+            encoding=data.get("encoding") or None,
+            read_host=data.get("read_host") or None,
+            read_port=int(data["read_port"]) if data.get("read_port") else None
+        )
+        return credentials, int(response.get("lease_duration") or 0)
+
+    def _store(self, credentials: DatabaseCredentials, lease_duration: int):
+        if credentials != self.credentials:
+            if self.credentials is not None:
+                logger.info("Database credentials rotated; pooled connections are replaced as they are released.")
+            self.credentials = credentials
+            self.generation += 1
+        self.lease_duration = lease_duration
+        self.refreshed_at = time.monotonic()
+
+    def load(self) -> DatabaseCredentials:
+        """Fetch the credentials, blocking; called once at startup."""
+        try:
+            credentials, lease_duration = self._fetch()
+        except Exception as e:
+            logger.error(f"Failed to load database credentials from Vault: {str(e)}")
+            raise RuntimeError(f"Could not load database credentials from Vault: {str(e)}") from e
+        self._store(credentials, lease_duration)
+        logger.info(f"Loaded database credentials from Vault ({self.mount_point}/{self.path}).")
+        return credentials
+
+    async def refresh(self):
+        # hvac is synchronous; keep the event loop serving requests meanwhile
+        credentials, lease_duration = await asyncio.to_thread(self._fetch)
+        self._store(credentials, lease_duration)
+
+    def refresh_delay(self) -> float:
+        if self.lease_duration > 0:
+            return self.lease_duration * self.renew_at
+        return self.refresh_interval
+
+    async def _run(self):
+        delay = self.refresh_delay()
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+                delay = self.refresh_delay()
+            except Exception as e:
+                logger.error(f"Failed to refresh database credentials from Vault: {str(e)}")
+                delay = self.retry_interval
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def has_replica(self, replica_url: Optional[URL] = None) -> bool:
+        return replica_url is not None or self.credentials.read_host is not None
+
+    def address(self, replica: bool = False, replica_url: Optional[URL] = None) -> Tuple[str, int, str]:
+        """
+        Host, port and database of the primary, or of the replica: the one named
+        in replica_url, else the secret's read_host. Both share the primary's
+        credentials, port and database unless they name their own.
+        """
+        credentials = self.credentials
+        if not replica:
+            return credentials.host, credentials.port, credentials.dbname
+        if replica_url is not None:
+            return (
+                replica_url.host or credentials.host,
+                replica_url.port or credentials.port,
+                replica_url.database or credentials.dbname
+            )
+        if credentials.read_host is None:
+            raise RuntimeError("No read replica host configured in Vault or DATABASE_READ_URL")
+        return credentials.read_host, credentials.read_port or credentials.port, credentials.dbname
+
+    async def connect(self, replica: bool = False, replica_url: Optional[URL] = None, **kwargs: Any) -> asyncpg.Connection:
+        """A new asyncpg connection with the cached credentials, to the primary or the replica"""
+        credentials = self.credentials
+        host, port, database = self.address(replica, replica_url)
+        return await asyncpg.connect(
+            user=credentials.username,
+            password=credentials.password,
+            host=host,
+            port=port,
+            database=database,
+            **kwargs
+        )
+
+    def async_creator(self, **kwargs: Any) -> Callable:
+        """Connection factory for create_async_engine(async_creator=...)"""
+        async def creator():
+            generation = self.generation
+            connection = await self.connect(**kwargs)
+            self._opened_with[id(connection)] = generation
+            return connection
+        return creator
+
+    def is_current(self, connection_record) -> bool:
+        return connection_record.info.get("credentials_generation") == self.generation
+
+    def attach(self, engine: AsyncEngine):
+        """Tag the engine's connections with the credentials they were opened with"""
+        def on_connect(dbapi_connection, connection_record):
+            connection_record.info["credentials_generation"] = self._opened_with.pop(
+                id(dbapi_connection.driver_connection), self.generation
+            )
+
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            # The pool discards the connection and opens a new one with the current credentials
+            if not self.is_current(connection_record):
+                raise exc.DisconnectionError("Database credentials rotated")
+
+        event.listen(engine.sync_engine, "connect", on_connect)
+        event.listen(engine.sync_engine, "checkout", on_checkout)
+
+
+def replica_override(read_url: Optional[str]) -> Optional[URL]:
+    """
+    The replica address given in DATABASE_READ_URL when credentials come from
+    Vault. Credentials in it are ignored: the replica uses the leased ones.
+    """
+    if not read_url:
+        return None
+    url = make_url(read_url)
+    if url.username or url.password:
+        logger.warning("Ignoring the credentials in DATABASE_READ_URL; the replica uses those from Vault.")
+    return url._replace(username=None, password=None)
+
+
+def engine_options(application_name: str, replica: bool = False, replica_url: Optional[URL] = None) -> Dict[str, Any]:
+    """
+    create_async_engine arguments connecting with the configured credentials,
+    to the primary or, with replica, to the read replica
+    """
+    server_settings = {"application_name": application_name}
+    if secrets_provider is None:
+        return {"connect_args": {"server_settings": server_settings}}
+    return {"async_creator": secrets_provider.async_creator(
+        replica=replica,
+        replica_url=replica_url,
+        server_settings=server_settings
+    )}
+
+
+def vault_provider_from_env() -> VaultSecretsProvider:
+    if hvac is None:
+        raise RuntimeError("SECRETS_PROVIDER=vault requires the hvac package")
+    if not VAULT_TOKEN:
+        raise RuntimeError("VAULT_TOKEN environment variable is not set")
+    return VaultSecretsProvider(hvac.Client(url=VAULT_ADDR, token=VAULT_TOKEN))
+
+
+secrets_provider: Optional[VaultSecretsProvider] = (
+    vault_provider_from_env() if SECRETS_PROVIDER == "vault" else None
+)
@@ -0,0 +1,79 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """The caller executing a shared call was cancelled; waiters run the call themselves"""
+    pass
+
+
+def _fail(future: asyncio.Future, error: BaseException):
+    future.set_exception(error)
+    # Mark the exception as retrieved, so it is not reported when nobody was waiting
+    future.exception()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for a key is in flight,
+    further callers with the same key wait for its result instead of executing
+    it again. Keys start with a name used to group the counters. Results are
+    shared between callers, so calls must return data that is not bound to the
+    caller's session (plain dicts or models, not ORM instances).
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.executed: Dict[str, int] = defaultdict(int)
+        self.coalesced: Dict[str, int] = defaultdict(int)
+
+    async def do(self, key: Optional[Tuple[Any, ...]], call: Callable[[], Awaitable[T]]) -> T:
+        """Run call, or join the identical call in flight. A key of None disables coalescing."""
+        if key is None:
+            return await call()
+        name = str(key[0])
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced[name] += 1
+            try:
+                # shield: a waiter being cancelled must not cancel the shared call
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                self.coalesced[name] -= 1
+                return await self.do(key, call)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self.executed[name] += 1
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            _fail(future, _LeaderCancelled())
+            raise
+        except Exception as e:
+            _fail(future, e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Executed and coalesced calls per name; coalesced calls are database round trips saved"""
+        names = sorted(set(self.executed) | set(self.coalesced))
+        return {
+            name: {
+                "executed": self.executed[name],
+                "coalesced": self.coalesced[name],
+                "in_flight": sum(1 for key in self._in_flight if str(key[0]) == name)
+            }
+            for name in names
+        }
+
+
+single_flight = SingleFlight()
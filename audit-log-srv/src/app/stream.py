@@ -0,0 +1,272 @@
+import asyncio
+import os
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional, Set, Tuple
+from uuid import UUID
+
+from loguru import logger
+from pydantic import TypeAdapter
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AuditLog, async_session, connect_unpooled
+from app.schemas import AuditLogEntry
+
+# Channel the writers notify with the seq of every committed entry
+AUDIT_NOTIFY_CHANNEL = os.getenv("AUDIT_NOTIFY_CHANNEL", "audit_logs")
+# Comment line sent on idle streams so proxies keep the connection open
+STREAM_HEARTBEAT_INTERVAL = float(os.getenv("STREAM_HEARTBEAT_INTERVAL", "15"))
+# Events buffered per client; a client falling further behind is disconnected
+# and resumes from its Last-Event-ID
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "1000"))
+STREAM_RECONNECT_DELAY = float(os.getenv("STREAM_RECONNECT_DELAY", "1"))
+# Reconnection delay suggested to clients, in milliseconds
+STREAM_CLIENT_RETRY = int(os.getenv("STREAM_CLIENT_RETRY", "2000"))
+
+# NOTIFY payloads are limited to 8000 bytes
+NOTIFY_CHUNK_SIZE = 500
+# Seqs remembered to drop entries delivered twice around a reconnect
+DISPATCHED_HISTORY = 10000
+
+entry_adapter = TypeAdapter(AuditLogEntry)
+
+
+async def notify_audit_logs(db: AsyncSession, seqs: List[int]):
+    """
+    Announce new entries to the live streams. Runs in the inserting transaction,
+    so Postgres delivers the notification only once the entries are committed.
+    """
+    for start in range(0, len(seqs), NOTIFY_CHUNK_SIZE):
+        payload = ",".join(str(seq) for seq in seqs[start:start + NOTIFY_CHUNK_SIZE])
+        await db.execute(select(func.pg_notify(AUDIT_NOTIFY_CHANNEL, payload)))
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # The timestamp column holds naive UTC times
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class AuditLogFilter:
+    """The filters of an audit log listing, applied to entries in memory"""
+
+    def __init__(
+        self,
+        service_name: Optional[str] = None,
+        service_id: Optional[str] = None,
+        user_id: Optional[UUID] = None,
+        entity_id: Optional[UUID] = None,
+        entity_type: Optional[str] = None,
+        time_from: Optional[datetime] = None,
+        time_to: Optional[datetime] = None
+    ):
+        self.equal = {
+            name: value for name, value in (
+                ("service_name", service_name),
+                ("service_id", service_id),
+                ("user_id", user_id),
+                ("entity_id", entity_id),
+                ("entity_type", entity_type),
+            ) if value is not None
+        }
+        self.time_from = _naive_utc(time_from)
+        self.time_to = _naive_utc(time_to)
+
+    def matches(self, log: AuditLog) -> bool:
+        if any(getattr(log, name) != value for name, value in self.equal.items()):
+            return False
+        if self.time_from is not None and log.timestamp < self.time_from:
+            return False
+        if self.time_to is not None and log.timestamp > self.time_to:
+            return False
+        return True
+
+
+class Subscription:
+    """One client stream: its filter and the queue of (seq, JSON) events for it"""
+
+    def __init__(self, log_filter: AuditLogFilter, queue_size: int):
+        self.filter = log_filter
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def offer(self, seq: int, data: bytes):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait((seq, data))
+        except asyncio.QueueFull:
+            # Drop the backlog and end the stream; the client resumes from the database
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class AuditLogHub:
+    """
+    Fans new audit log entries out to the live streams of this worker. A single
+    dedicated connection LISTENs for the seqs notified by committing writers;
+    each batch of notifications is read with one query, serialized once and
+    offered to every subscriber whose filter matches.
+    """
+
+    def __init__(self, channel: str = AUDIT_NOTIFY_CHANNEL, queue_size: int = STREAM_QUEUE_SIZE):
+        self.channel = channel
+        self.queue_size = queue_size
+        self.subscribers: Set[Subscription] = set()
+        self.last_seq = 0
+        self._notified: asyncio.Queue = asyncio.Queue()
+        self._dispatched: Set[int] = set()
+        self._dispatched_order: Deque[int] = deque()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, log_filter: AuditLogFilter) -> Subscription:
+        # The listener starts with the first stream of the worker
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        subscription = Subscription(log_filter, self.queue_size)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        try:
+            self._notified.put_nowait([int(seq) for seq in payload.split(",")])
+        except ValueError:
+            logger.warning(f"Ignoring malformed audit log notification: {payload!r}")
+
+    async def _run(self):
+        dispatcher = asyncio.create_task(self._dispatch_notifications())
+        try:
+            while True:
+                try:
+                    await self._listen()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Audit log listener failed: {str(e)}")
+                await asyncio.sleep(STREAM_RECONNECT_DELAY)
+        finally:
+            dispatcher.cancel()
+
+    async def _listen(self):
+        connection = await connect_unpooled(
+            server_settings={"application_name": "audit-log-service-listen"}
+        )
+        lost = asyncio.Event()
+        connection.add_termination_listener(lambda _: lost.set())
+        try:
+            await connection.add_listener(self.channel, self._on_notification)
+            logger.info(f"Listening for audit log notifications on '{self.channel}'.")
+            if self.last_seq:
+                # Entries committed while the listener was down are read once more
+                self._notified.put_nowait(None)
+            await lost.wait()
+            logger.warning("Audit log listener connection lost, reconnecting.")
+        finally:
+            if not connection.is_closed():
+                await connection.close()
+
+    async def _dispatch_notifications(self):
+        while True:
+            batches = [await self._notified.get()]
+            while not self._notified.empty():
+                batches.append(self._notified.get_nowait())
+            try:
+                condition = AuditLog.seq.in_([seq for batch in batches if batch for seq in batch])
+                if None in batches:
+                    condition = or_(condition, AuditLog.seq > self.last_seq)
+                self.dispatch(await self._fetch(condition))
+            except Exception as e:
+                logger.error(f"Failed to dispatch audit log notifications: {str(e)}")
+
+    async def _fetch(self, condition) -> List[AuditLog]:
+        # The primary: notifications may arrive before the replica has the rows
+        async with async_session() as db:
+            result = await db.scalars(select(AuditLog).where(condition).order_by(AuditLog.seq))
+            return list(result.all())
+
+    def dispatch(self, logs: List[AuditLog]):
+        for log in logs:
+            if log.seq in self._dispatched:
+                continue
+            self._remember(log.seq)
+            self.last_seq = max(self.last_seq, log.seq)
+            data = None
+            for subscription in list(self.subscribers):
+                if subscription.filter.matches(log):
+                    if data is None:
+                        data = entry_adapter.dump_json(entry_adapter.validate_python(log, from_attributes=True))
+                    subscription.offer(log.seq, data)
+
+    def _remember(self, seq: int):
+        self._dispatched.add(seq)
+        self._dispatched_order.append(seq)
+        if len(self._dispatched_order) > DISPATCHED_HISTORY:
+            self._dispatched.discard(self._dispatched_order.popleft())
+
+
+audit_log_hub = AuditLogHub()
+
+
+def sse_event(seq: int, data: bytes) -> bytes:
+    return b"id: %d\nevent: audit_log\ndata: %s\n\n" % (seq, data)
+
+
+async def audit_log_events(
+    log_filter: AuditLogFilter,
+    backlog_query=None,
+    hub: AuditLogHub = audit_log_hub
+):
+    """
+    Server-Sent Events of the entries matching the filter. The subscription is
+    made before the backlog (entries after the client's Last-Event-ID) is read,
+    so entries committed meanwhile are not lost; those delivered by both are
+    sent once.
+    """
+    subscription = hub.subscribe(log_filter)
+    try:
+        yield f"retry: {STREAM_CLIENT_RETRY}\n\n".encode()
+        sent: Set[int] = set()
+        if backlog_query is not None:
+            async with async_session() as db:
+                result = await db.stream_scalars(backlog_query)
+                async for partition in result.partitions():
+                    for log in partition:
+                        sent.add(log.seq)
+                        yield sse_event(
+                            log.seq,
+                            entry_adapter.dump_json(entry_adapter.validate_python(log, from_attributes=True))
+                        )
+            logger.info(f"Replayed {len(sent)} audit log entries to a resumed stream.")
+
+        while True:
+            try:
+                event: Optional[Tuple[int, bytes]] = await asyncio.wait_for(
+                    subscription.queue.get(), STREAM_HEARTBEAT_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            if event is None:
+                logger.warning("Audit log stream fell behind and was closed; the client will resume.")
+                return
+            seq, data = event
+            if seq not in sent:
+                yield sse_event(seq, data)
+    finally:
+        hub.unsubscribe(subscription)
@@ -1,10 +1,14 @@
+import asyncio
 import uvicorn
 import sys
 import os
 import logging
+import random
 from pathlib import Path
 from loguru import logger
+from uvicorn.supervisors import Multiprocess
 from app.api import app
+from app.database import migrate_db
 from dotenv import load_dotenv
 
 # Add the src directory to Python path
@@ -24,6 +28,24 @@ LOG_LEVEL = os.getenv("LOG_LEVEL", DEFAULT_LOG_LEVEL)
 LOG_ROTATION = os.getenv("LOG_ROTATION", DEFAULT_LOG_ROTATION)
 LOG_RETENTION = os.getenv("LOG_RETENTION", DEFAULT_LOG_RETENTION)
 
+def default_worker_count() -> int:
+    """Number of CPUs this process may run on (respects container CPU limits)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+# Server settings. Reload is only used when ENVIRONMENT=development, otherwise
+# the service runs with multiple worker processes.
+ENVIRONMENT = os.getenv("ENVIRONMENT", "production")
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", default_worker_count()))
+KEEP_ALIVE_TIMEOUT = int(os.getenv("KEEP_ALIVE_TIMEOUT", "5"))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+GRACEFUL_SHUTDOWN_TIMEOUT = int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+MAX_REQUESTS_PER_WORKER = int(os.getenv("MAX_REQUESTS_PER_WORKER", "10000"))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+
 
 # Intercept standard logging to route it through Loguru
 class InterceptHandler(logging.Handler):
@@ -38,6 +60,16 @@ class InterceptHandler(logging.Handler):
         logger.log(log_level, record.getMessage())
 
 
+class JitteredServer(uvicorn.Server):
+    """Worker that adds its own random 0..MAX_REQUESTS_JITTER to the request limit"""
+    def run(self, sockets=None):
+        # Runs in the worker process on its own copy of the config, so workers
+        # started together (and their replacements) don't all restart together
+        if self.config.limit_max_requests:
+            self.config.limit_max_requests += random.randint(0, max(MAX_REQUESTS_JITTER, 0))
+        super().run(sockets=sockets)
+
+
 # Configure Loguru for JSON logging
 def configure_logger():
     logger.remove()  # Remove default Loguru handlers
@@ -72,12 +104,50 @@ def configure_logger():
 # Initialize logging
 configure_logger()
 
-if __name__ == "__main__":
-    uvicorn.run(
+def run_server():
+    if ENVIRONMENT == "development":
+        uvicorn.run(
+            "app.api:app",
+            host=SERVER_HOST,
+            port=SERVER_PORT,
+            reload=True,
+            reload_dirs=["src"],
+            log_config=None # Default uvicorn log disabled as using logger
+        )
+        return
+
+    logger.info(
+        f"Starting {WEB_CONCURRENCY} workers (keep-alive={KEEP_ALIVE_TIMEOUT}s, backlog={SERVER_BACKLOG}, "
+        f"max requests per worker={MAX_REQUESTS_PER_WORKER}+0..{MAX_REQUESTS_JITTER}, "
+        f"graceful shutdown={GRACEFUL_SHUTDOWN_TIMEOUT}s)"
+    )
+    # On SIGTERM the supervisor stops accepting connections and lets every worker
+    # finish its in-flight requests for up to GRACEFUL_SHUTDOWN_TIMEOUT seconds.
+    # Workers exit after MAX_REQUESTS_PER_WORKER plus a per-worker jitter requests
+    # and are replaced. This is what uvicorn.run does, with JitteredServer.
+    config = uvicorn.Config(
         "app.api:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        reload_dirs=["src"],
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        workers=WEB_CONCURRENCY,
+        loop="uvloop",
+        http="httptools",
+        timeout_keep_alive=KEEP_ALIVE_TIMEOUT,
+        backlog=SERVER_BACKLOG,
+        limit_max_requests=MAX_REQUESTS_PER_WORKER or None,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT,
         log_config=None # Default uvicorn log disabled as using logger
-    )
\ No newline at end of file
+    )
+    server = JitteredServer(config=config)
+    if config.workers > 1:
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+
+if __name__ == "__main__":
+    # "migrate" brings the database schema to this version and exits; run it
+    # before starting workers with DB_STARTUP_MODE=verify
+    if sys.argv[1:] == ["migrate"]:
+        asyncio.run(migrate_db())
+    else:
+        run_server()
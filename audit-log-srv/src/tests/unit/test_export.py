@@ -0,0 +1,49 @@
+import json
+import pytest
+from datetime import datetime
+from uuid import uuid4
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy.dialects import postgresql
+from app import routes
+from app.database import AuditLog
+from app.routes import export_audit_logs
+
+def make_log(seq: int) -> AuditLog:
+    return AuditLog(
+        id=uuid4(),
+        seq=seq,
+        timestamp=datetime(2024, 1, 1, 12, 0),
+        service_name="company-service",
+        user_id=uuid4(),
+        action_type="UPDATE",
+        entity_type="company"
+    )
+
+def mock_session(pages):
+    session = AsyncMock()
+    session.execute.side_effect = [
+        MagicMock(scalars=MagicMock(return_value=MagicMock(all=MagicMock(return_value=page))))
+        for page in pages
+    ]
+    factory = MagicMock()
+    factory.return_value.__aenter__.return_value = session
+    return factory, session
+
+@pytest.mark.asyncio
+async def test_export_pages_by_seq_in_short_transactions():
+    """Test that the export reads keyset pages after the last seq, ending each transaction"""
+    pages = [[make_log(1), make_log(2)], [make_log(5), make_log(7)], [make_log(9)]]
+    factory, session = mock_session(pages)
+
+    with patch.object(routes, "EXPORT_BATCH_SIZE", 2), \
+         patch.object(routes, "read_session_factory", return_value=factory):
+        response = await export_audit_logs(MagicMock(), fields=None, accept=None, accept_encoding=None)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+
+    assert len(body.decode().splitlines()) == 5
+    assert json.loads(body.decode().splitlines()[0])["service_name"] == "company-service"
+    statements = [call.args[0].compile(dialect=postgresql.dialect()) for call in session.execute.await_args_list]
+    assert "ORDER BY audit_logs.seq" in str(statements[0])
+    assert "audit_logs.seq >" not in str(statements[0])
+    assert [statement.params.get("seq_1") for statement in statements[1:]] == [2, 7]
+    assert session.commit.await_count == 3
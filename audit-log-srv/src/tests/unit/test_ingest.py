@@ -0,0 +1,78 @@
+import json
+import pytest
+from uuid import uuid4
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from starlette.requests import Request
+from app.ingest import audit_log_batch_body, audit_log_entry_body, decoded_body
+from app.schemas import find_non_json_value
+
+ENTRY = {
+    "service_name": "company-srv",
+    "user_id": str(uuid4()),
+    "action_type": "UPDATE",
+    "entity_type": "company",
+    "new_data": {"company_name": "Renamed", "tags": ["a", {"b": None}]}
+}
+
+def make_request(body: bytes, content_type: str = "application/json") -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/audit-logs/",
+        "headers": [(b"content-type", content_type.encode())]
+    }
+    return Request(scope, receive)
+
+def test_find_non_json_value():
+    """Test the single-pass payload check"""
+    nested = {"level": [{"deeper": [1, 2.5, True, None, "text"]}]}
+    assert find_non_json_value(nested) is None
+    assert find_non_json_value({"when": object()}) == "Object of type object is not JSON serializable"
+    assert find_non_json_value({"ratio": float("nan")}) is not None
+    assert find_non_json_value({("a", "b"): 1}) is not None
+
+    deep = current = {}
+    for _ in range(5000):
+        current["child"] = {}
+        current = current["child"]
+    assert find_non_json_value(deep) is None
+
+@pytest.mark.asyncio
+async def test_json_and_msgpack_bodies_decode_alike():
+    """Test that JSON and MessagePack bodies yield the same entry"""
+    from_json = await audit_log_entry_body(make_request(json.dumps(ENTRY).encode()))
+    assert from_json.new_data == ENTRY["new_data"]
+
+    msgpack = pytest.importorskip("msgpack")
+    from_msgpack = await audit_log_entry_body(make_request(msgpack.packb(ENTRY), "application/msgpack"))
+    assert from_msgpack == from_json
+
+    with pytest.raises(RequestValidationError) as exc_info:
+        await audit_log_entry_body(make_request(msgpack.packb({**ENTRY, "meta_data": {"raw": b"\x00"}}), "application/msgpack"))
+    assert exc_info.value.errors()[0]["loc"] == ("body", "meta_data")
+
+@pytest.mark.asyncio
+async def test_rejected_bodies():
+    """Test unsupported content types, malformed bodies, batch limits and mixed producers"""
+    with pytest.raises(HTTPException) as exc_info:
+        await decoded_body(make_request(b"<entry/>", "application/xml"))
+    assert exc_info.value.status_code == 415
+
+    with pytest.raises(HTTPException) as exc_info:
+        await decoded_body(make_request(b"{not json"))
+    assert exc_info.value.status_code == 400
+
+    with pytest.raises(HTTPException) as exc_info:
+        await audit_log_batch_body(make_request(b"[]"))
+    assert exc_info.value.status_code == 422
+
+    entries = await audit_log_batch_body(make_request(json.dumps([ENTRY, ENTRY]).encode()))
+    assert len(entries) == 2
+
+    with pytest.raises(HTTPException) as exc_info:
+        mixed = [ENTRY, {**ENTRY, "service_name": "other-srv"}]
+        await audit_log_batch_body(make_request(json.dumps(mixed).encode()))
+    assert exc_info.value.status_code == 422
@@ -100,6 +100,7 @@ def test_model_columns():
     
     expected_columns = {
         'id': 'UUID',
+        'seq': 'BigInteger',
         'timestamp': 'TIMESTAMP',
         'service_name': 'String',
         'service_id': 'String',
@@ -1,7 +1,7 @@
 import pytest
 from uuid import UUID, uuid4
 from datetime import datetime
-from app.schemas import AuditLogEntry
+from app.schemas import AuditLogEntry, parse_fields, sparse_list_adapter
 from pydantic import ValidationError
 from sqlalchemy import inspect
 
@@ -209,3 +209,17 @@ def test_none_values_in_optional_fields():
     assert log_entry.previous_data is None
     assert log_entry.new_data is None
     assert log_entry.meta_data is None
+
+def test_sparse_fieldsets():
+    """Test that fields select a cached slim model in declaration order"""
+    fields = parse_fields(AuditLogEntry, "entity_id, action_type")
+    assert fields == ("action_type", "entity_id")
+    assert sparse_list_adapter(AuditLogEntry, fields) is sparse_list_adapter(AuditLogEntry, fields)
+
+    adapter = sparse_list_adapter(AuditLogEntry, fields)
+    entity_id = uuid4()
+    rows = adapter.validate_python([{"action_type": "CREATE", "entity_id": entity_id, "new_data": {"a": 1}}])
+    assert adapter.dump_python(rows, mode="json") == [{"action_type": "CREATE", "entity_id": str(entity_id)}]
+
+    with pytest.raises(ValueError):
+        parse_fields(AuditLogEntry, "action_type,password")
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import pytest
+from datetime import datetime, timezone
+from uuid import uuid4
+from app.database import AuditLog
+from app.stream import AuditLogFilter, AuditLogHub, audit_log_events
+
+def make_log(seq: int, **overrides) -> AuditLog:
+    values = {
+        "id": uuid4(),
+        "seq": seq,
+        "timestamp": datetime(2024, 1, 1, 12, 0),
+        "service_name": "company-service",
+        "user_id": uuid4(),
+        "action_type": "UPDATE",
+        "entity_type": "company",
+    }
+    values.update(overrides)
+    return AuditLog(**values)
+
+def idle_hub(queue_size: int = 10) -> AuditLogHub:
+    """A hub whose listener counts as running, so no connection is opened"""
+    hub = AuditLogHub(queue_size=queue_size)
+    hub._task = asyncio.get_running_loop().create_future()
+    return hub
+
+def test_filter_matches_like_the_listing():
+    """Test that the in-memory filter applies the listing's filters"""
+    user_id = uuid4()
+    log = make_log(1, user_id=user_id)
+
+    assert AuditLogFilter().matches(log)
+    assert AuditLogFilter(service_name="company-service", user_id=user_id).matches(log)
+    assert not AuditLogFilter(user_id=uuid4()).matches(log)
+    assert not AuditLogFilter(entity_type="company_status").matches(log)
+    assert AuditLogFilter(time_from=datetime(2024, 1, 1, 11, 0, tzinfo=timezone.utc)).matches(log)
+    assert not AuditLogFilter(time_to=datetime(2024, 1, 1, 11, 0)).matches(log)
+
+@pytest.mark.asyncio
+async def test_dispatch_fans_out_to_matching_subscribers_once():
+    """Test that entries reach matching subscribers only, and only once"""
+    hub = idle_hub()
+    everything = hub.subscribe(AuditLogFilter())
+    companies = hub.subscribe(AuditLogFilter(entity_type="company"))
+    statuses = hub.subscribe(AuditLogFilter(entity_type="company_status"))
+
+    logs = [make_log(1), make_log(2)]
+    hub.dispatch(logs)
+    # Delivered again after a listener reconnect
+    hub.dispatch(logs)
+
+    assert everything.queue.qsize() == 2
+    assert companies.queue.qsize() == 2
+    assert statuses.queue.empty()
+    seq, data = everything.queue.get_nowait()
+    assert seq == 1
+    assert json.loads(data)["entity_type"] == "company"
+    assert hub.last_seq == 2
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_closed():
+    """Test that a subscriber whose queue overflows gets the end-of-stream marker"""
+    hub = idle_hub(queue_size=2)
+    subscription = hub.subscribe(AuditLogFilter())
+
+    hub.dispatch([make_log(seq) for seq in range(1, 5)])
+
+    assert subscription.overflowed
+    assert subscription.queue.get_nowait() is None
+
+@pytest.mark.asyncio
+async def test_events_are_sent_as_sse():
+    """Test that live entries are framed as Server-Sent Events with the seq as id"""
+    hub = idle_hub()
+    events = audit_log_events(AuditLogFilter(), hub=hub)
+
+    assert (await events.__anext__()).startswith(b"retry: ")
+    pending = asyncio.ensure_future(events.__anext__())
+    await asyncio.sleep(0)
+    hub.dispatch([make_log(7)])
+    event = await pending
+
+    assert event.startswith(b"id: 7\nevent: audit_log\ndata: {")
+    assert event.endswith(b"\n\n")
+    await events.aclose()
+    assert not hub.subscribers
@@ -0,0 +1,105 @@
+"""
+CPU time per event of audit log ingestion with JSON and MessagePack bodies.
+
+    python benchmarks/audit_ingest_cpu.py --events 20000 --batch-size 100
+
+Runs the request body handling of audit-log-srv in-process, without HTTP or a
+database: decoding the body, validating the entries and encoding the JSON
+columns the way the ORM does on INSERT. "json-recheck" is the previous
+validation, which encoded each payload field once more just to check it.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+import msgpack
+
+from audit_log_srv import USERS, audit_payload
+from loadgen import REPO_ROOT, SuiteState
+
+sys.path.insert(0, str(REPO_ROOT / "audit-log-srv" / "src"))
+from app.schemas import AuditLogEntry  # noqa: E402
+from app.ingest import entry_batch_adapter  # noqa: E402
+
+PAYLOAD_FIELDS = ("previous_data", "new_data", "meta_data")
+
+
+def store_columns(entries: List[AuditLogEntry]) -> None:
+    # The JSON columns are serialized by the driver layer on INSERT
+    for entry in entries:
+        for field in PAYLOAD_FIELDS:
+            json.dumps(getattr(entry, field))
+
+
+def decode_json(body: bytes) -> List[AuditLogEntry]:
+    return entry_batch_adapter.validate_python(json.loads(body))
+
+
+def decode_msgpack(body: bytes) -> List[AuditLogEntry]:
+    return entry_batch_adapter.validate_python(msgpack.unpackb(body, raw=False))
+
+
+def decode_json_recheck(body: bytes) -> List[AuditLogEntry]:
+    entries = decode_json(body)
+    # The previous validator encoded every payload field to check it
+    store_columns(entries)
+    return entries
+
+
+PROTOCOLS: Dict[str, tuple] = {
+    "json-recheck": (lambda batch: json.dumps(batch).encode(), decode_json_recheck),
+    "json": (lambda batch: json.dumps(batch).encode(), decode_json),
+    "msgpack": (lambda batch: msgpack.packb(batch), decode_msgpack),
+}
+
+
+def cpu_per_event(bodies: List[bytes], events: int, handle: Callable[[bytes], List[AuditLogEntry]]) -> float:
+    started = time.process_time()
+    for body in bodies:
+        store_columns(handle(body))
+    return (time.process_time() - started) / events
+
+
+def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    state = SuiteState(rng=random.Random(args.seed), run_id="cpu")
+    state.entity_ids = [USERS[i % len(USERS)] for i in range(100)]
+    payloads = [audit_payload(state) for _ in range(args.events)]
+    batches = [payloads[i:i + args.batch_size] for i in range(0, len(payloads), args.batch_size)]
+
+    results = {}
+    for name, (encode, decode) in PROTOCOLS.items():
+        started = time.process_time()
+        bodies = [encode(batch) for batch in batches]
+        encode_us = (time.process_time() - started) / args.events * 1e6
+        # Best of the repeats, to keep scheduler noise out of the comparison
+        ingest_us = min(
+            cpu_per_event(bodies, args.events, decode) for _ in range(args.repeat)
+        ) * 1e6
+        results[name] = {
+            "producer_encode_us": round(encode_us, 2),
+            "ingest_cpu_us": round(ingest_us, 2),
+            "bytes_per_event": round(sum(len(body) for body in bodies) / args.events, 1),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU per event of audit log ingestion")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1, help="Entries per request body (1 = single endpoint)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    results = run(args)
+    columns = list(next(iter(results.values())).keys())
+    print(f"\n{'protocol':<14}" + "".join(f"{column:>22}" for column in columns))
+    for name, row in results.items():
+        print(f"{name:<14}" + "".join(f"{row[column]:>22}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Load benchmark for audit-log-srv.
+
+    python benchmarks/audit_log_srv.py --duration 30 --concurrency 20
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+
+from loadgen import Operation, SuiteState, main
+
+SERVICES = ["company-srv", "billing-srv", "portfolio-srv"]
+ACTIONS = ["CREATE", "UPDATE", "DELETE", "RESTORE"]
+USERS = [str(uuid.UUID(int=i + 1)) for i in range(20)]
+
+
+def audit_payload(state: SuiteState) -> dict:
+    sequence = state.next_sequence()
+    return {
+        "service_name": state.rng.choice(SERVICES),
+        "service_id": f"bench-{state.run_id}",
+        "user_id": state.rng.choice(USERS),
+        "action_type": state.rng.choice(ACTIONS),
+        "entity_type": "company",
+        "entity_id": state.pick_entity(),
+        "previous_data": {"company_name": f"Company {sequence - 1}", "company_country": "DE"},
+        "new_data": {"company_name": f"Company {sequence}", "company_country": "FR"},
+        "meta_data": {"request_id": sequence, "source": "benchmark"}
+    }
+
+
+async def ingest(client: httpx.AsyncClient, state: SuiteState) -> httpx.Response:
+    return await client.post("/audit-logs/", json=audit_payload(state))
+
+
+async def query_entity(client: httpx.AsyncClient, state: SuiteState) -> httpx.Response:
+    return await client.get("/audit-logs/", params={"entity_id": state.pick_entity()})
+
+
+async def query_user_window(client: httpx.AsyncClient, state: SuiteState) -> httpx.Response:
+    now = datetime.utcnow()
+    return await client.get("/audit-logs/", params={
+        "user_id": state.rng.choice(USERS),
+        "time_from": (now - timedelta(seconds=10)).isoformat(),
+        "time_to": now.isoformat()
+    })
+
+
+async def query_service_window(client: httpx.AsyncClient, state: SuiteState) -> httpx.Response:
+    now = datetime.utcnow()
+    return await client.get("/audit-logs/", params={
+        "service_name": state.rng.choice(SERVICES),
+        "service_id": f"bench-{state.run_id}",
+        "time_from": (now - timedelta(seconds=5)).isoformat(),
+        "time_to": now.isoformat()
+    })
+
+
+MIXES = {
+    "ingest_heavy": [
+        Operation("ingest", 85, ingest),
+        Operation("query_entity", 15, query_entity),
+    ],
+    "query_heavy": [
+        Operation("ingest", 20, ingest),
+        Operation("query_entity", 40, query_entity),
+        Operation("query_user_window", 20, query_user_window),
+        Operation("query_service_window", 20, query_service_window),
+    ],
+}
+
+
+async def prepare(client: httpx.AsyncClient, state: SuiteState, args: argparse.Namespace):
+    """Seed a fixed set of entities with some history each"""
+    state.entity_ids = [str(uuid.UUID(int=state.rng.getrandbits(128))) for _ in range(args.seed_entities)]
+    for start in range(0, args.seed_entities * 5, args.concurrency):
+        await asyncio.gather(*(ingest(client, state) for _ in range(args.concurrency)))
+
+
+def configure(parser: argparse.ArgumentParser):
+    parser.add_argument("--seed-entities", type=int, default=200)
+
+
+if __name__ == "__main__":
+    main("audit_log_srv", "audit-log-srv", MIXES, prepare, configure)
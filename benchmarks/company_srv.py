@@ -0,0 +1,123 @@
+"""
+Load benchmark for company-srv.
+
+    python benchmarks/company_srv.py --duration 30 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import httpx
+from jose import jwt
+
+from loadgen import Operation, SuiteState, main
+
+COUNTRIES = ["DE", "FR", "US", "UK", "IT", "ES", "NL"]
+STANDARDS = ["IFRS", "GAAP", "HGB"]
+
+
+def bearer_headers() -> dict:
+    token = jwt.encode(
+        {"user_id": "bench-user", "exp": datetime.utcnow() + timedelta(days=1)},
+        os.getenv("JWT_SECRET_KEY", "your-secret-key-for-testing"),
+        algorithm="HS256"
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+def company_payload(state: SuiteState) -> dict:
+    sequence = state.next_sequence()
+    return {
+        "company_code": f"BENCH-{state.run_id}-{sequence}",
+        "company_name": f"Bench Company {sequence}",
+        "company_country": state.rng.choice(COUNTRIES),
+        "company_accounting_standards": state.rng.choice(STANDARDS)
+    }
+
+
+async def create(client: httpx.AsyncClient, state: SuiteState) -> httpx.Response:
+    response = await client.post("/companies/", json=company_payload(state), headers=state.headers)
+    if response.status_code == 200:
+        state.entity_ids.append(response.json()["company_id"])
+    return response
+
+
+async def update(client: httpx.AsyncClient, state: SuiteState) -> httpx.Response:
+    return await client.put(
+        f"/companies/{state.pick_entity()}",
+        json={"company_name": f"Renamed {state.next_sequence()}", "company_country": state.rng.choice(COUNTRIES)},
+        params={"change_reason": "benchmark"},
+        headers=state.headers
+    )
+
+
+async def get(client: httpx.AsyncClient, state: SuiteState) -> httpx.Response:
+    return await client.get(f"/companies/{state.pick_entity()}", headers=state.headers)
+
+
+async def list_page(client: httpx.AsyncClient, state: SuiteState) -> httpx.Response:
+    return await client.get(
+        "/companies/companies",
+        params={"skip": state.rng.randrange(0, max(1, len(state.entity_ids) - 50)), "limit": 50},
+        headers=state.headers
+    )
+
+
+async def versions(client: httpx.AsyncClient, state: SuiteState) -> httpx.Response:
+    return await client.get(
+        f"/companies/{state.pick_entity()}/versions",
+        params={"skip": 0, "limit": 10},
+        headers=state.headers
+    )
+
+
+async def restore(client: httpx.AsyncClient, state: SuiteState) -> httpx.Response:
+    return await client.post(
+        f"/companies/{state.pick_entity()}/restore/1",
+        params={"change_reason": "benchmark"},
+        headers=state.headers
+    )
+
+
+MIXES = {
+    "read_heavy": [
+        Operation("get", 60, get),
+        Operation("list", 15, list_page),
+        Operation("versions", 15, versions),
+        Operation("update", 5, update),
+        Operation("create", 5, create),
+    ],
+    "write_heavy": [
+        Operation("create", 30, create),
+        Operation("update", 40, update),
+        Operation("restore", 10, restore),
+        Operation("get", 20, get),
+    ],
+    "mixed": [
+        Operation("create", 10, create),
+        Operation("update", 20, update),
+        Operation("get", 35, get),
+        Operation("list", 15, list_page),
+        Operation("versions", 15, versions),
+        Operation("restore", 5, restore),
+    ],
+}
+
+
+async def prepare(client: httpx.AsyncClient, state: SuiteState, args: argparse.Namespace):
+    """Seed companies so reads and updates have something to hit"""
+    state.headers = bearer_headers()
+    for start in range(0, args.seed_companies, args.concurrency):
+        batch = min(args.concurrency, args.seed_companies - start)
+        await asyncio.gather(*(create(client, state) for _ in range(batch)))
+    if not state.entity_ids:
+        raise RuntimeError("Seeding failed: no companies could be created")
+
+
+def configure(parser: argparse.ArgumentParser):
+    parser.add_argument("--seed-companies", type=int, default=200)
+
+
+if __name__ == "__main__":
+    main("company_srv", "company-srv", MIXES, prepare, configure)
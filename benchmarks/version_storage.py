@@ -0,0 +1,145 @@
+"""
+Storage size and reconstruction latency of the company version history in
+"full" and "delta" storage mode (see VERSION_STORAGE_MODE in company-srv).
+
+    python benchmarks/version_storage.py --companies 50 --updates 200
+
+The service is loaded in-process; both modes are run against the same database
+and only the rows written by the run are measured.
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+from sqlalchemy import func, select
+
+from company_srv import COUNTRIES, STANDARDS, bearer_headers
+from loadgen import percentile, service_client
+
+FIELDS = ["company_name", "company_country", "company_accounting_standards"]
+
+
+def change(rng_value: int, sequence: int) -> dict:
+    field = FIELDS[rng_value % len(FIELDS)]
+    if field == "company_name":
+        return {field: f"Versioned Company {sequence}"}
+    if field == "company_country":
+        return {field: COUNTRIES[sequence % len(COUNTRIES)]}
+    return {field: STANDARDS[sequence % len(STANDARDS)]}
+
+
+async def write_history(client: httpx.AsyncClient, headers: dict, run_id: str, index: int, updates: int) -> str:
+    response = await client.post("/companies/", json={
+        "company_code": f"VSTORE-{run_id}-{index}",
+        "company_name": f"Versioned Company {index}",
+        "company_country": COUNTRIES[index % len(COUNTRIES)],
+        "company_accounting_standards": STANDARDS[index % len(STANDARDS)]
+    }, headers=headers)
+    response.raise_for_status()
+    company_id = response.json()["company_id"]
+    for sequence in range(updates):
+        response = await client.put(
+            f"/companies/{company_id}",
+            json=change(index + sequence, sequence),
+            headers=headers
+        )
+        response.raise_for_status()
+    return company_id
+
+
+async def timed(samples: List[float], request) -> None:
+    started = time.perf_counter()
+    response = await request
+    samples.append(time.perf_counter() - started)
+    response.raise_for_status()
+
+
+async def run_mode(client: httpx.AsyncClient, mode: str, args: argparse.Namespace) -> Dict[str, float]:
+    from app.database import CompanyVersion, engine
+    from app.services import version_storage
+
+    version_storage.VERSION_STORAGE_MODE = mode
+    version_storage.VERSION_SNAPSHOT_INTERVAL = args.snapshot_interval
+    headers = bearer_headers()
+    run_id = f"{mode}-{int(time.time())}"
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(index: int) -> str:
+        async with semaphore:
+            return await write_history(client, headers, run_id, index, args.updates)
+
+    started = time.perf_counter()
+    company_ids = await asyncio.gather(*(limited(i) for i in range(args.companies)))
+    write_seconds = time.perf_counter() - started
+
+    async with engine.connect() as conn:
+        versions = CompanyVersion.__table__
+        result = await conn.execute(
+            select(func.count(), func.sum(func.pg_column_size(versions.table_valued())))
+            .where(versions.c.company_id.in_(company_ids))
+        )
+        rows, size = result.one()
+
+    page_latencies: List[float] = []
+    diff_latencies: List[float] = []
+    total_versions = args.updates + 1
+    for sample in range(args.samples):
+        company_id = company_ids[sample % len(company_ids)]
+        await timed(page_latencies, client.get(
+            f"/companies/{company_id}/versions",
+            params={"skip": (sample * 7) % total_versions, "limit": 10},
+            headers=headers
+        ))
+        await timed(diff_latencies, client.get(
+            f"/companies/{company_id}/versions/diff",
+            params={"from_version": 1, "to_version": 1 + (sample * 13) % total_versions},
+            headers=headers
+        ))
+
+    return {
+        "versions": rows,
+        "bytes_total": int(size or 0),
+        "bytes_per_version": round((size or 0) / rows, 1) if rows else 0.0,
+        "write_seconds": round(write_seconds, 2),
+        "page_p50_ms": round(percentile(page_latencies, 50) * 1000, 2),
+        "page_p95_ms": round(percentile(page_latencies, 95) * 1000, 2),
+        "diff_p50_ms": round(percentile(diff_latencies, 50) * 1000, 2),
+        "diff_p95_ms": round(percentile(diff_latencies, 95) * 1000, 2),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    results = {}
+    async with service_client("company-srv", None) as client:
+        for mode in args.mode or ["full", "delta"]:
+            results[mode] = await run_mode(client, mode, args)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Version history storage benchmark for company-srv")
+    parser.add_argument("--companies", type=int, default=50)
+    parser.add_argument("--updates", type=int, default=200, help="Updates per company")
+    parser.add_argument("--snapshot-interval", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=500, help="Timed reads per mode")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--mode", action="append", choices=["full", "delta"])
+    parser.add_argument("--output", type=Path, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    columns = list(next(iter(results.values())).keys())
+    print(f"\n{'mode':<8}" + "".join(f"{column:>20}" for column in columns))
+    for mode, row in results.items():
+        print(f"{mode:<8}" + "".join(f"{row[column]:>20}" for column in columns))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import math
+import os
+import time
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Low-priority requests (reads and exports) are shed with 503 once the smoothed
+# connection pool wait exceeds ADMISSION_POOL_WAIT_THRESHOLD seconds or
+# ADMISSION_MAX_IN_FLIGHT requests are being served. Writes are always admitted.
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+ADMISSION_POOL_WAIT_THRESHOLD = float(os.getenv("ADMISSION_POOL_WAIT_THRESHOLD", "0.1"))
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "100"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+# Pool wait samples lose half their weight after this many seconds
+ADMISSION_POOL_WAIT_HALF_LIFE = float(os.getenv("ADMISSION_POOL_WAIT_HALF_LIFE", "2"))
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# Paths that are never shed
+EXEMPT_PATHS = {"/docs", "/openapi.json", "/redoc"}
+EXEMPT_PREFIXES = ("/metrics/", "/admin/")
+# Long-lived streams and long polls are admitted like reads but not counted in
+# flight: they hold no connection while idle and would otherwise exhaust the limit
+LONG_LIVED_SUFFIXES = ("/stream", "/changes")
+
+
+class PoolWaitMonitor:
+    """
+    Exponentially weighted average of the time spent waiting for a pooled
+    connection. The average decays with time, so it recovers while no
+    connections are requested (e.g. while reads are being shed).
+    """
+
+    def __init__(self, half_life: float, alpha: float = 0.2):
+        self.half_life = half_life
+        self.alpha = alpha
+        self._average = 0.0
+        self._updated_at = time.monotonic()
+
+    def _decayed(self, now: float) -> float:
+        if self.half_life <= 0:
+            return self._average
+        return self._average * math.pow(0.5, (now - self._updated_at) / self.half_life)
+
+    def record(self, wait: float):
+        now = time.monotonic()
+        average = self._decayed(now)
+        self._average = average + (wait - average) * self.alpha
+        self._updated_at = now
+
+    @property
+    def average(self) -> float:
+        return self._decayed(time.monotonic())
+
+
+pool_wait_monitor = PoolWaitMonitor(ADMISSION_POOL_WAIT_HALF_LIFE)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool reporting how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_monitor.record(time.perf_counter() - started)
+
+
+class AdmissionController:
+    """Decides per request whether it is served or shed, and counts requests in flight."""
+
+    def __init__(
+        self,
+        monitor: PoolWaitMonitor,
+        pool_wait_threshold: float,
+        max_in_flight: int
+    ):
+        self.monitor = monitor
+        self.pool_wait_threshold = pool_wait_threshold
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.shed_total = 0
+
+    def overload_reason(self) -> Optional[str]:
+        if self.in_flight >= self.max_in_flight:
+            return f"{self.in_flight} requests in flight"
+        pool_wait = self.monitor.average
+        if pool_wait > self.pool_wait_threshold:
+            return f"pool wait {pool_wait * 1000:.0f} ms"
+        return None
+
+    def is_low_priority(self, method: str, path: str) -> bool:
+        return method not in WRITE_METHODS and path not in EXEMPT_PATHS and not path.startswith(EXEMPT_PREFIXES)
+
+
+admission_controller = AdmissionController(
+    pool_wait_monitor,
+    ADMISSION_POOL_WAIT_THRESHOLD,
+    ADMISSION_MAX_IN_FLIGHT
+)
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware applying the admission controller. Shed requests get
+    503 with Retry-After before any dependency (and thus any connection) is used.
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_CONTROL_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        if controller.is_low_priority(scope["method"], scope["path"]):
+            reason = controller.overload_reason()
+            if reason is not None:
+                controller.shed_total += 1
+                logger.warning(f"Shedding {scope['method']} {scope['path']}: {reason}")
+                await self._reject(send)
+                return
+
+        if scope["path"].endswith(LONG_LIVED_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        controller.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.in_flight -= 1
+
+    async def _reject(self, send):
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"retry-after", str(ADMISSION_RETRY_AFTER).encode()),
+            ],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": b'{"detail":"Service overloaded, retry later"}',
+        })
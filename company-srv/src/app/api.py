@@ -1,16 +1,56 @@
 from fastapi import FastAPI
+from app.admission import AdmissionMiddleware
+from app.profiling import ProfilingMiddleware, admin_router
+from app.read_your_writes import ReadYourWritesMiddleware
 from app.routes.company_routes import router as company_router
 from app.routes.company_status_routes import router as company_status_router
-from app.database import setup_db
+from app.audit_client import audit_log_client
+from app.database import setup_db, engine, read_engine
+from app.warmup import warm_up_pool
+from app.single_flight import single_flight
+from app.secrets_provider import secrets_provider
+from app.tracing import setup_tracing, shutdown_tracing
 
 # Initialize FastAPI app
 app = FastAPI()
 
+# Hand clients that wrote the time of the write, so any worker routes their
+# next reads to the primary
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Attribute slow queries to routes and profile requests on demand
+app.add_middleware(ProfilingMiddleware)
+
+# Shed reads and exports with 503 while the connection pool is saturated
+app.add_middleware(AdmissionMiddleware)
+
 # Include routers
 app.include_router(company_router)
 app.include_router(company_status_router)
 
+# Slow queries and profiles, behind PROFILING_ADMIN_TOKEN
+app.include_router(admin_router)
+
+# Spans for routes, SQL statements and outbound calls (TRACING_ENABLED)
+setup_tracing(app, "company-service", engines=[engine, read_engine], http_clients=[audit_log_client.client])
+
+# Database round trips saved by coalescing identical concurrent reads
+@app.get("/metrics/single-flight")
+async def single_flight_metrics():
+    return single_flight.stats()
+
 # Database setup
 @app.on_event("startup")
 async def on_startup():
-    await setup_db()
\ No newline at end of file
+    # Refresh Vault credentials in the background before they expire
+    if secrets_provider is not None:
+        secrets_provider.start()
+    await setup_db()
+    await warm_up_pool()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if secrets_provider is not None:
+        await secrets_provider.stop()
+    await audit_log_client.close()
+    shutdown_tracing()
\ No newline at end of file
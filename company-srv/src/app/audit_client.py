@@ -0,0 +1,121 @@
+import hashlib
+import os
+from typing import Any, Dict, Optional, Sequence, Tuple
+from uuid import NAMESPACE_URL, UUID, uuid5
+
+import httpx
+from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+from loguru import logger
+
+load_dotenv()
+
+# Base URL of audit-log-srv (see docker-compose.yml); unset disables the audit calls
+AUDIT_LOG_SERVICE = os.getenv("AUDIT_LOG_SERVICE")
+AUDIT_LOG_TIMEOUT = float(os.getenv("AUDIT_LOG_TIMEOUT", "5"))
+# Entries per /audit-logs/batch request; at most audit-log-srv's AUDIT_BATCH_MAX_ENTRIES
+AUDIT_LOG_BATCH_SIZE = int(os.getenv("AUDIT_LOG_BATCH_SIZE", "1000"))
+
+SERVICE_NAME = "company-service"
+
+
+def audit_user_id(user_id: str) -> UUID:
+    """Audit entries need a UUID; other token subjects map to a stable one"""
+    try:
+        return UUID(user_id)
+    except ValueError:
+        return uuid5(NAMESPACE_URL, f"{SERVICE_NAME}:user:{user_id}")
+
+
+class AuditLogClient:
+    """
+    Records company changes in audit-log-srv. Called after the change is
+    committed, so failures are logged instead of raised. Each entry has an
+    Idempotency-Key, so a retried request never writes it twice.
+    """
+
+    def __init__(self, base_url: Optional[str], timeout: float = AUDIT_LOG_TIMEOUT, transport=None):
+        self.client: Optional[httpx.AsyncClient] = None
+        if base_url:
+            self.client = httpx.AsyncClient(base_url=base_url, timeout=timeout, transport=transport)
+
+    @staticmethod
+    def _entry(
+        action_type: str,
+        company_id: UUID,
+        user_id: str,
+        version: int,
+        new_data: Optional[Dict[str, Any]],
+        change_reason: Optional[str]
+    ) -> Dict[str, Any]:
+        return {
+            "service_name": SERVICE_NAME,
+            "user_id": audit_user_id(user_id),
+            "action_type": action_type,
+            "entity_type": "company",
+            "entity_id": company_id,
+            "new_data": new_data,
+            "meta_data": {"user": user_id, "version": version, "change_reason": change_reason}
+        }
+
+    async def record(
+        self,
+        action_type: str,
+        company_id: UUID,
+        user_id: str,
+        version: int,
+        new_data: Optional[Dict[str, Any]] = None,
+        change_reason: Optional[str] = None
+    ):
+        if self.client is None:
+            return
+        entry = self._entry(action_type, company_id, user_id, version, new_data, change_reason)
+        try:
+            response = await self.client.post(
+                "/audit-logs/",
+                json=jsonable_encoder(entry),
+                headers={"Idempotency-Key": f"company:{company_id}:{action_type}:{version}"}
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to record {action_type} of company {company_id} in the audit log: {str(e)}")
+
+    async def record_batch(
+        self,
+        action_type: str,
+        changes: Sequence[Tuple[UUID, int]],
+        user_id: str,
+        new_data: Optional[Dict[str, Any]] = None,
+        change_reason: Optional[str] = None
+    ):
+        """
+        Record the same change to many companies, given as (company_id, version)
+        pairs, with one /audit-logs/batch request per AUDIT_LOG_BATCH_SIZE of them.
+        """
+        if self.client is None:
+            return
+        for start in range(0, len(changes), AUDIT_LOG_BATCH_SIZE):
+            chunk = changes[start:start + AUDIT_LOG_BATCH_SIZE]
+            entries = [
+                self._entry(action_type, company_id, user_id, version, new_data, change_reason)
+                for company_id, version in chunk
+            ]
+            # Derived from the per-entry keys, so a retried chunk is the same request
+            entry_keys = "\n".join(f"{company_id}:{version}" for company_id, version in chunk)
+            idempotency_key = f"companies:{action_type}:{hashlib.sha256(entry_keys.encode()).hexdigest()}"
+            try:
+                response = await self.client.post(
+                    "/audit-logs/batch",
+                    json=jsonable_encoder(entries),
+                    headers={"Idempotency-Key": idempotency_key}
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                logger.error(f"Failed to record {action_type} of {len(chunk)} companies in the audit log: {str(e)}")
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+
+
+audit_log_client = AuditLogClient(AUDIT_LOG_SERVICE)
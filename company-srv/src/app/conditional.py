@@ -0,0 +1,101 @@
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+from uuid import UUID
+
+
+def make_etag(company_id: UUID, version: int, variant: Optional[str] = None) -> str:
+    """Build a strong ETag from a company id and its current version number"""
+    tag = f"{company_id}-v{version}"
+    if variant:
+        tag = f"{tag}-{variant}"
+    return f'"{tag}"'
+
+
+def parse_if_match_version(if_match: Optional[str], company_id: UUID) -> Optional[int]:
+    """
+    Extract the expected company version from an If-Match header value.
+    Returns None when no precondition applies ("*" or no header). Raises
+    ValueError when the header names no current representation of the company.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    pattern = re.compile(rf'^"{re.escape(str(company_id))}-v(\d+)"$')
+    versions = set()
+    for candidate in if_match.split(","):
+        # If-Match uses strong comparison, so weak tags never match
+        match = pattern.match(candidate.strip())
+        if match:
+            versions.add(int(match.group(1)))
+    if len(versions) != 1:
+        raise ValueError("If-Match does not name a single version of this company")
+    return versions.pop()
+
+
+def format_http_date(value: datetime) -> str:
+    """Format a datetime as an RFC 9110 HTTP-date"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _opaque_tag(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header value against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        _opaque_tag(candidate) == _opaque_tag(etag)
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified_since(if_modified_since: Optional[str], last_modified: datetime) -> bool:
+    """Check an If-Modified-Since header value against the last modification time"""
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP dates only carry whole seconds
+    return last_modified.replace(microsecond=0) <= since
+
+
+def is_not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: str,
+    last_modified: Optional[datetime]
+) -> bool:
+    """
+    Evaluate conditional GET headers. If-None-Match takes precedence over
+    If-Modified-Since when both are sent.
+    """
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if last_modified is not None:
+        return not_modified_since(if_modified_since, last_modified)
+    return False
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    """Validator headers sent with both 200 and 304 responses"""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache"
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_http_date(last_modified)
+    return headers
@@ -1,14 +1,35 @@
-from .config import engine, async_session, get_db_session, setup_db
+from .config import (
+    engine,
+    read_engine,
+    async_session,
+    async_read_session,
+    get_db_session,
+    get_read_db_session,
+    read_session_factory,
+    coalescing_target,
+    setup_db,
+    migrate_db
+)
 from .models.company import Company
 from .models.company_version import CompanyVersion
+from .models.company_deletion import CompanyDeletion
 from .models.company_status import CompanyStatus
+from .models.idempotency_key import IdempotencyKey
 
 __all__ = [
     'engine',
+    'read_engine',
     'async_session',
+    'async_read_session',
     'get_db_session',
+    'get_read_db_session',
+    'read_session_factory',
+    'coalescing_target',
     'setup_db',
+    'migrate_db',
     'Company',
     'CompanyVersion',
-    'CompanyStatus'
+    'CompanyDeletion',
+    'CompanyStatus',
+    'IdempotencyKey'
 ]
\ No newline at end of file
@@ -1,15 +1,39 @@
 import os
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import Column, Integer, Table, select, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.schema import CreateSchema
 from loguru import logger
 from dotenv import load_dotenv
+from app.admission import TimedQueuePool
+from app.read_your_writes import mark_write, wrote_recently
+from app.profiling import slow_query_log
+from app.secrets_provider import secrets_provider, engine_options, replica_override
+from app.schema_migrations import lock_migrations, migrate, schema_drift, stored_schema_version
+from app.database.migrations import MIGRATIONS
 
 # Load environment variables
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 DATABASE_SCHEMA = os.getenv("DATABASE_SCHEMA")
+# Optional read replica; GET routes use it unless the client wrote recently
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+# "create" creates or migrates the tables on boot; "verify" only checks the
+# stored schema version (use it for workers once one instance has migrated)
+DB_STARTUP_MODE = os.getenv("DB_STARTUP_MODE", "create").lower()
+
+# Bump whenever the table definitions change, with the DDL in app.database.migrations
+SCHEMA_VERSION = 11
+
+if secrets_provider is not None:
+    # Credentials and schema come from Vault instead of DATABASE_URL
+    credentials = secrets_provider.load()
+    DATABASE_URL = credentials.url()
+    DATABASE_SCHEMA = credentials.schema or DATABASE_SCHEMA
 
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL environment variable is not set")
@@ -17,19 +41,28 @@ if not DATABASE_URL:
 # Create Base class for models
 Base = declarative_base()
 
+schema_version_table = Table(
+    "schema_version",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+    schema=DATABASE_SCHEMA
+)
+
 # Create engine
 engine = create_async_engine(
     DATABASE_URL,
     echo=True,
     pool_pre_ping=True,
+    poolclass=TimedQueuePool,  # Reports checkout waits to admission control
     pool_size=5,
     max_overflow=10,
-    connect_args={
-        "server_settings": {
-            "application_name": "company-service"
-        }
-    }
+    **engine_options("company-service")
 )
+if secrets_provider is not None:
+    secrets_provider.attach(engine)
+# Statements over SLOW_QUERY_THRESHOLD_MS are kept for GET /admin/slow-queries
+slow_query_log.attach(engine)
 
 logger.info("Database engine created with URL: {}", DATABASE_URL)
 
@@ -40,20 +73,111 @@ async_session = sessionmaker(
     expire_on_commit=False
 )
 
+# Create read engine (falls back to the primary when no replica is configured).
+# With Vault the replica shares the leased credentials: its host comes from the
+# secret's read_host, or from DATABASE_READ_URL, whose credentials are ignored.
+if secrets_provider is not None:
+    read_replica_url = replica_override(DATABASE_READ_URL)
+    has_read_replica = secrets_provider.has_replica(read_replica_url)
+else:
+    read_replica_url = None
+    has_read_replica = bool(DATABASE_READ_URL)
+
+if has_read_replica:
+    read_engine = create_async_engine(
+        DATABASE_READ_URL if secrets_provider is None else DATABASE_URL,
+        echo=True,
+        pool_pre_ping=True,
+        poolclass=TimedQueuePool,
+        pool_size=5,
+        max_overflow=10,
+        **engine_options("company-service-read", replica=True, replica_url=read_replica_url)
+    )
+    if secrets_provider is not None:
+        secrets_provider.attach(read_engine)
+    slow_query_log.attach(read_engine)
+    logger.info("Read replica engine created")
+else:
+    read_engine = engine
+
+async_read_session = sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+
 async def setup_db():
+    if DB_STARTUP_MODE == "verify":
+        await verify_schema_version()
+        return
+    await migrate_db()
+
+async def migrate_db():
+    """
+    Create the tables of a new database, or migrate an existing one from its
+    stamped version, then stamp SCHEMA_VERSION. See app.database.migrations.
+    """
     try:
         async with engine.begin() as conn:
+            await lock_migrations(conn)
             if DATABASE_SCHEMA:
                 await conn.execute(CreateSchema(DATABASE_SCHEMA, if_not_exists=True))
                 logger.info(f"Schema '{DATABASE_SCHEMA}' ensured for company table.")
-            
+
+            # Trigram operator classes used by the company name search index
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+            stored_version = await conn.run_sync(stored_schema_version, schema_version_table, "companies")
+            if stored_version is not None and stored_version > SCHEMA_VERSION:
+                raise RuntimeError(
+                    f"Database schema version {stored_version} is newer than this code's version {SCHEMA_VERSION}"
+                )
+
             await conn.run_sync(Base.metadata.create_all)
-            logger.info("Database setup complete.")
+            if stored_version is not None:
+                await migrate(conn, MIGRATIONS, stored_version, SCHEMA_VERSION, DATABASE_SCHEMA)
+
+            # Only stamp the version on tables that match the models
+            drift = await conn.run_sync(schema_drift, Base.metadata)
+            if drift:
+                raise RuntimeError(
+                    f"Tables do not match schema version {SCHEMA_VERSION} after migrating ({'; '.join(drift)})"
+                )
+            await conn.execute(
+                insert(schema_version_table)
+                .values(id=1, version=SCHEMA_VERSION)
+                .on_conflict_do_update(index_elements=["id"], set_={"version": SCHEMA_VERSION})
+            )
+            logger.info(f"Database setup complete (schema version {SCHEMA_VERSION}).")
     except Exception as e:
         logger.error(f"Failed to setup database: {str(e)}")
         raise
 
-async def get_db_session():
+async def verify_schema_version():
+    """Check the stored schema version with a single query and fail fast on mismatch."""
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(schema_version_table.c.version).where(schema_version_table.c.id == 1)
+            )
+            version = result.scalar_one_or_none()
+    except Exception as e:
+        logger.error(f"Failed to read database schema version: {str(e)}")
+        raise RuntimeError(f"Could not read database schema version: {str(e)}") from e
+
+    if version != SCHEMA_VERSION:
+        message = (
+            f"Database schema version {version} does not match expected version {SCHEMA_VERSION}; "
+            f"run once with DB_STARTUP_MODE=create or migrate the database"
+        )
+        logger.error(message)
+        raise RuntimeError(message)
+    logger.info(f"Database schema version {version} verified.")
+
+async def get_db_session(request: Request = None):
+    """Session on the primary, used by routes that write."""
+    mark_write(request)
     try:
         logger.debug("Creating a new database session...")
         async with async_session() as session:
@@ -61,4 +185,39 @@ async def get_db_session():
         logger.debug("Database session closed successfully.")
     except Exception as e:
         logger.error("Failed to get database session: {}", str(e))
+        raise
+
+def read_session_factory(request: Optional[Request] = None):
+    """
+    Session factory for reads: the replica, or the primary while the caller wrote recently.
+    Used directly by streaming responses, which outlive the request's dependencies.
+    """
+    if read_engine is engine or wrote_recently(request):
+        return async_session
+    return async_read_session
+
+def coalescing_target(request: Optional[Request] = None) -> Optional[str]:
+    """
+    Where the caller's reads are served, as part of the key of coalesced reads.
+    None while the caller wrote recently: its reads must see its own
+    writes, so they never join a query that may have started before the write.
+    """
+    if wrote_recently(request):
+        return None
+    return "primary" if read_engine is engine else "replica"
+
+async def get_read_db_session(request: Request = None):
+    """
+    Session for read-only routes. Uses the read replica unless the caller wrote
+    within the last READ_YOUR_WRITES_WINDOW seconds.
+    """
+    session_factory = read_session_factory(request)
+    use_primary = session_factory is async_session
+    try:
+        logger.debug("Creating a new read database session (primary={})...", use_primary)
+        async with session_factory() as session:
+            yield session
+        logger.debug("Read database session closed successfully.")
+    except Exception as e:
+        logger.error("Failed to get read database session: {}", str(e))
         raise
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Schema changes per SCHEMA_VERSION, applied in DB_STARTUP_MODE=create (or with
+`python src/main.py migrate`) to databases stamped with an older version.
+
+Upgrading a deployment:
+1. Run one instance in create mode, or the migrate command, with the new code.
+   It locks, migrates from the stamped version and stamps SCHEMA_VERSION, all in
+   one transaction; on failure nothing changes.
+2. Then start the workers in verify mode. Workers of the previous version fail
+   their verify check against the new stamp, so roll them over rather than
+   mixing versions.
+"""
+from app.schema_migrations import Migrations
+
+MIGRATIONS: Migrations = {
+    # Tables created before versions were stamped
+    1: [
+        "CREATE INDEX IF NOT EXISTS ix_company_versions_company_id_version_number "
+        "ON {schema}company_versions (company_id, version_number)"
+    ],
+    # 2: idempotency_keys is a new table
+    # Optimistic concurrency: current_version continues each company's history
+    3: [
+        "ALTER TABLE {schema}companies ADD COLUMN IF NOT EXISTS current_version INTEGER NOT NULL DEFAULT 1",
+        "UPDATE {schema}companies SET current_version = latest.version_number "
+        "FROM (SELECT company_id, max(version_number) AS version_number "
+        "FROM {schema}company_versions GROUP BY company_id) AS latest "
+        "WHERE companies.company_id = latest.company_id"
+    ],
+    # Search filters; pg_trgm is created by setup_db
+    4: [
+        "CREATE INDEX IF NOT EXISTS ix_companies_company_country ON {schema}companies (company_country)",
+        "CREATE INDEX IF NOT EXISTS ix_companies_company_accounting_standards "
+        "ON {schema}companies (company_accounting_standards)",
+        "CREATE INDEX IF NOT EXISTS ix_companies_status_id ON {schema}companies (status_id)",
+        "CREATE INDEX IF NOT EXISTS ix_companies_company_name_trgm "
+        "ON {schema}companies USING gin (company_name gin_trgm_ops)"
+    ],
+    # Snapshot-plus-delta history: every existing version is a full snapshot,
+    # and delta versions leave the state columns empty
+    5: [
+        "ALTER TABLE {schema}company_versions ADD COLUMN IF NOT EXISTS is_snapshot BOOLEAN",
+        "UPDATE {schema}company_versions SET is_snapshot = true WHERE is_snapshot IS NULL",
+        "ALTER TABLE {schema}company_versions "
+        "ALTER COLUMN is_snapshot SET DEFAULT true, ALTER COLUMN is_snapshot SET NOT NULL",
+        "ALTER TABLE {schema}company_versions ADD COLUMN IF NOT EXISTS changes JSON",
+        "ALTER TABLE {schema}company_versions "
+        "ALTER COLUMN company_code DROP NOT NULL, ALTER COLUMN company_name DROP NOT NULL, "
+        "ALTER COLUMN company_country DROP NOT NULL, ALTER COLUMN company_accounting_standards DROP NOT NULL"
+    ],
+    # Point-in-time lookups
+    6: [
+        "CREATE INDEX IF NOT EXISTS ix_company_versions_company_id_changed_at "
+        "ON {schema}company_versions (company_id, changed_at DESC, version_number DESC)"
+    ],
+    # Change feed positions; company_deletions and company_change_seq are new.
+    # Existing history is numbered in the order it was written, all in the
+    # migrating transaction, so consumers read it as one batch.
+    7: [
+        "ALTER TABLE {schema}company_versions ADD COLUMN IF NOT EXISTS change_txid BIGINT",
+        "ALTER TABLE {schema}company_versions ADD COLUMN IF NOT EXISTS change_seq BIGINT",
+        "UPDATE {schema}company_versions SET change_txid = txid_current(), change_seq = ordered.position "
+        "FROM (SELECT version_id, row_number() OVER (ORDER BY changed_at, version_number) AS position "
+        "FROM {schema}company_versions) AS ordered "
+        "WHERE company_versions.version_id = ordered.version_id AND company_versions.change_seq IS NULL",
+        "SELECT setval('{schema}company_change_seq', "
+        "(SELECT coalesce(max(change_seq), 0) + 1 FROM {schema}company_versions), false)",
+        "ALTER TABLE {schema}company_versions "
+        "ALTER COLUMN change_txid SET DEFAULT txid_current(), ALTER COLUMN change_txid SET NOT NULL, "
+        "ALTER COLUMN change_seq SET DEFAULT nextval('{schema}company_change_seq'), "
+        "ALTER COLUMN change_seq SET NOT NULL",
+        "CREATE INDEX IF NOT EXISTS ix_company_versions_change_txid_change_seq "
+        "ON {schema}company_versions (change_txid, change_seq)"
+    ],
+    # One row per version number. Fails on histories that already hold
+    # duplicates; resolve those, then rerun the migration.
+    8: [
+        "DROP INDEX IF EXISTS {schema}ix_company_versions_company_id_version_number",
+        "CREATE UNIQUE INDEX ix_company_versions_company_id_version_number "
+        "ON {schema}company_versions (company_id, version_number)"
+    ],
+    # Idempotency claims are owned by a token. Requests in progress during the
+    # upgrade hold no token and fail to complete; their retries process again.
+    9: [
+        "ALTER TABLE {schema}idempotency_keys ADD COLUMN IF NOT EXISTS claim_token VARCHAR(32)"
+    ],
+    # Status transition rules; existing statuses keep allowing every move
+    10: [
+        "ALTER TABLE {schema}company_statuses ADD COLUMN IF NOT EXISTS next_status_ids UUID[]"
+    ],
+    # Version history outlives deleted companies
+    11: [
+        "ALTER TABLE {schema}company_versions DROP CONSTRAINT IF EXISTS company_versions_company_id_fkey"
+    ]
+}
@@ -1,11 +1,24 @@
 import uuid
-from sqlalchemy import Column, String, TIMESTAMP, UUID, ForeignKey, func
+from sqlalchemy import Column, String, TIMESTAMP, UUID, ForeignKey, Integer, Index, func
 from sqlalchemy.orm import relationship
 from ..config import Base, DATABASE_SCHEMA
 
 class Company(Base):
     __tablename__ = "companies"
-    __table_args__ = {"schema": DATABASE_SCHEMA} if DATABASE_SCHEMA else None
+    __table_args__ = (
+        # Equality filters of the search and bulk update endpoints
+        Index("ix_companies_company_country", "company_country"),
+        Index("ix_companies_company_accounting_standards", "company_accounting_standards"),
+        Index("ix_companies_status_id", "status_id"),
+        # Serves substring (ILIKE) and fuzzy (%) name searches; needs the pg_trgm extension
+        Index(
+            "ix_companies_company_name_trgm",
+            "company_name",
+            postgresql_using="gin",
+            postgresql_ops={"company_name": "gin_trgm_ops"}
+        ),
+        {"schema": DATABASE_SCHEMA} if DATABASE_SCHEMA else {}
+    )
     
     company_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     company_code = Column(String, nullable=False, unique=True)
@@ -22,5 +35,25 @@ class Company(Base):
     created_by = Column(String, nullable=False)
     updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     updated_by = Column(String, nullable=False)
+
+    # Number of the latest CompanyVersion. The ORM adds "WHERE current_version = :v"
+    # to every UPDATE/DELETE and raises StaleDataError if another writer got there first
+    current_version = Column(Integer, nullable=False, server_default="1")
     
-    versions = relationship("CompanyVersion", back_populates="company")
\ No newline at end of file
+    # Deleting a company leaves its versions alone (passive_deletes="all")
+    versions = relationship(
+        "CompanyVersion",
+        primaryjoin="Company.company_id == foreign(CompanyVersion.company_id)",
+        back_populates="company",
+        passive_deletes="all"
+    )
+    # Read-only shortcut to the version matching current_version; load it with selectinload
+    latest_version = relationship(
+        "CompanyVersion",
+        primaryjoin="and_(Company.company_id == foreign(CompanyVersion.company_id), "
+                    "Company.current_version == CompanyVersion.version_number)",
+        viewonly=True,
+        uselist=False
+    )
+
+    __mapper_args__ = {"version_id_col": current_version}
\ No newline at end of file
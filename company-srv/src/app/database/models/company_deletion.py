@@ -0,0 +1,39 @@
+import uuid
+from sqlalchemy import Column, String, TIMESTAMP, UUID, Integer, BigInteger, Index, func, text
+from ..config import Base, DATABASE_SCHEMA
+from .company_version import company_change_seq
+
+class CompanyDeletion(Base):
+    """
+    Tombstone of a company deleted before schema version 11, when deleting a
+    company removed its version history; the change feed still reports those
+    deletions from this record, which holds the final state in the shape of a
+    version. Later deletions keep the history, ending in a DELETE version.
+    """
+    __tablename__ = "company_deletions"
+    __table_args__ = (
+        # Serves the change feed (GET /companies/changes)
+        Index("ix_company_deletions_change_txid_change_seq", "change_txid", "change_seq"),
+        {"schema": DATABASE_SCHEMA} if DATABASE_SCHEMA else {}
+    )
+
+    version_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # No foreign key: the company no longer exists
+    company_id = Column(UUID(as_uuid=True), nullable=False)
+    version_number = Column(Integer, nullable=False)
+
+    company_code = Column(String, nullable=True)
+    company_name = Column(String, nullable=True)
+    company_country = Column(String, nullable=True)
+    company_accounting_standards = Column(String, nullable=True)
+
+    changed_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    changed_by = Column(String, nullable=False)
+    change_type = Column(String, nullable=False, default="DELETE", server_default="DELETE")
+    change_reason = Column(String, nullable=True)
+
+    status_id = Column(UUID(as_uuid=True), nullable=True)
+    status_reason = Column(String, nullable=True)
+
+    change_txid = Column(BigInteger, server_default=text("txid_current()"), nullable=False)
+    change_seq = Column(BigInteger, server_default=company_change_seq.next_value(), nullable=False)
@@ -1,5 +1,6 @@
 import uuid
 from sqlalchemy import Column, String, TIMESTAMP, UUID, Boolean, func
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from ..config import Base, DATABASE_SCHEMA
 
@@ -11,6 +12,8 @@ class CompanyStatus(Base):
     status_code = Column(String, nullable=False, unique=True)
     status_description = Column(String, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
+    # Statuses companies in this status may move to; NULL allows every active status
+    next_status_ids = Column(ARRAY(UUID(as_uuid=True)), nullable=True)
     
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
     created_by = Column(String, nullable=False)
@@ -1,20 +1,39 @@
 import uuid
-from sqlalchemy import Column, String, TIMESTAMP, UUID, ForeignKey, Integer, func
+from sqlalchemy import (
+    Column, String, TIMESTAMP, UUID, ForeignKey, Integer, BigInteger, Index, Boolean, JSON, Sequence, func, text
+)
 from sqlalchemy.orm import relationship
 from ..config import Base, DATABASE_SCHEMA
 
+# Orders the change feed; shared by versions and deletion tombstones
+company_change_seq = Sequence("company_change_seq", metadata=Base.metadata, schema=DATABASE_SCHEMA)
+
 class CompanyVersion(Base):
     __tablename__ = "company_versions"
-    __table_args__ = {"schema": DATABASE_SCHEMA} if DATABASE_SCHEMA else None
+    __table_args__ = (
+        # Serves version history pages and the latest-version lookup used for ETags.
+        # Unique, so a version number written twice fails instead of forking history
+        Index("ix_company_versions_company_id_version_number", "company_id", "version_number", unique=True),
+        # Serves the change feed (GET /companies/changes)
+        Index("ix_company_versions_change_txid_change_seq", "change_txid", "change_seq"),
+        {"schema": DATABASE_SCHEMA} if DATABASE_SCHEMA else {}
+    )
     
     version_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    company_id = Column(UUID(as_uuid=True), ForeignKey(f"{DATABASE_SCHEMA}.companies.company_id" if DATABASE_SCHEMA else "companies.company_id"))
+    # No foreign key: the history outlives the company, ending in a DELETE version
+    company_id = Column(UUID(as_uuid=True))
     version_number = Column(Integer, nullable=False)
     
-    company_code = Column(String, nullable=False)
-    company_name = Column(String, nullable=False)
-    company_country = Column(String, nullable=False)
-    company_accounting_standards = Column(String, nullable=False)
+    # Snapshots carry the full company state in the columns below; delta versions
+    # (VERSION_STORAGE_MODE=delta) leave them empty and store only the changed
+    # fields in `changes`. See app.services.version_storage.
+    is_snapshot = Column(Boolean, nullable=False, default=True, server_default="true")
+    changes = Column(JSON, nullable=True)
+
+    company_code = Column(String, nullable=True)
+    company_name = Column(String, nullable=True)
+    company_country = Column(String, nullable=True)
+    company_accounting_standards = Column(String, nullable=True)
     
     changed_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
     changed_by = Column(String, nullable=False)
@@ -24,4 +43,23 @@ class CompanyVersion(Base):
     status_id = Column(UUID(as_uuid=True), ForeignKey(f"{DATABASE_SCHEMA}.company_statuses.status_id" if DATABASE_SCHEMA else "company_statuses.status_id"))
     status_reason = Column(String, nullable=True)
 
-    company = relationship("Company", back_populates="versions")
\ No newline at end of file
+    # Position in the change feed: the writing transaction and the order within it.
+    # Rows are read in (change_txid, change_seq) order once their transaction is
+    # older than every transaction still running, so no commit is ever skipped
+    change_txid = Column(BigInteger, server_default=text("txid_current()"), nullable=False)
+    change_seq = Column(BigInteger, server_default=company_change_seq.next_value(), nullable=False)
+
+    company = relationship(
+        "Company",
+        primaryjoin="Company.company_id == foreign(CompanyVersion.company_id)",
+        back_populates="versions"
+    )
+
+# Point-in-time lookups: latest version per company at or before a timestamp
+# (DISTINCT ON (company_id) ... ORDER BY company_id, changed_at DESC)
+Index(
+    "ix_company_versions_company_id_changed_at",
+    CompanyVersion.company_id,
+    CompanyVersion.changed_at.desc(),
+    CompanyVersion.version_number.desc()
+)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, TIMESTAMP, Integer, JSON, Index, func
+from ..config import Base, DATABASE_SCHEMA
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+        {"schema": DATABASE_SCHEMA} if DATABASE_SCHEMA else {}
+    )
+
+    scope = Column(String(255), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    # Identifies the request holding the key; a takeover after expiry replaces it
+    claim_token = Column(String(32), nullable=True)
+
+    # NULL while the first request is still being processed
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(JSON, nullable=True)
+
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
@@ -0,0 +1,239 @@
+import asyncio
+import os
+import random
+import re
+import secrets
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+from uuid import uuid4
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.admission import EXEMPT_PATHS, EXEMPT_PREFIXES, LONG_LIVED_SUFFIXES
+
+# pyinstrument is only needed when requests are profiled
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+except ImportError:  # pragma: no cover
+    Profiler = None
+
+# Token of the /admin endpoints; a request sending it in PROFILING_HEADER is
+# profiled. Without a token both are disabled.
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")
+PROFILING_HEADER = os.getenv("PROFILING_HEADER", "X-Profile").lower()
+# Share of the other requests profiled (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", "profiles")
+# "html" (pyinstrument's flame view) or "speedscope" (JSON for speedscope.app)
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "html").lower()
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+# Statements running at least this long are kept for GET /admin/slow-queries
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "500"))
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "200"))
+
+ARTIFACT_HEADER = b"x-profile-artifact"
+# Batch inserts can carry thousands of parameters
+MAX_PARAMETERS_LENGTH = 2000
+ARTIFACT_NAME = re.compile(r"^[\w.-]+\.(html|speedscope\.json)$")
+
+# ASGI scope of the request being served, for attributing queries to routes
+current_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_scope", default=None)
+
+
+def current_route() -> Optional[str]:
+    """Method and route template of the request being served, if any"""
+    scope = current_scope.get()
+    if scope is None:
+        return None
+    # The router stores the matched route in the scope
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', None) or scope['path']}"
+
+
+class SlowQueryLog:
+    """Ring buffer of the SQL statements that ran longer than the threshold"""
+
+    def __init__(self, threshold_ms: float, size: int):
+        self.threshold_ms = threshold_ms
+        self.entries: Deque[Dict[str, Any]] = deque(maxlen=size)
+        self.recorded_total = 0
+
+    def record(self, statement: str, parameters: Any, duration_ms: float, executemany: bool = False):
+        parameters = repr(parameters)
+        if len(parameters) > MAX_PARAMETERS_LENGTH:
+            parameters = parameters[:MAX_PARAMETERS_LENGTH] + "..."
+        route = current_route()
+        self.entries.append({
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(duration_ms, 3),
+            "route": route,
+            "statement": statement,
+            "parameters": parameters,
+            "executemany": executemany
+        })
+        self.recorded_total += 1
+        logger.warning(f"Slow query ({duration_ms:.0f} ms) from {route or 'no request'}: {statement[:200]}")
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Newest first"""
+        entries = list(reversed(self.entries))
+        return entries if limit is None else entries[:limit]
+
+    def attach(self, engine: AsyncEngine):
+        """Time every statement the engine executes"""
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._slow_query_started_at = time.perf_counter()
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started_at = getattr(context, "_slow_query_started_at", None)
+            if started_at is None:
+                return
+            duration_ms = (time.perf_counter() - started_at) * 1000
+            if duration_ms >= self.threshold_ms:
+                self.record(statement, parameters, duration_ms, executemany)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_BUFFER_SIZE)
+
+
+def is_admin_token(token: Optional[str], admin_token: Optional[str]) -> bool:
+    return bool(admin_token) and token is not None and secrets.compare_digest(token, admin_token)
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware recording which request issues each query, and
+    profiling requests that send the admin token in the profiling header or
+    are sampled. Each profile is written to its own file, named in the
+    X-Profile-Artifact response header.
+    """
+
+    def __init__(
+        self,
+        app,
+        admin_token: Optional[str] = PROFILING_ADMIN_TOKEN,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        output_dir: str = PROFILE_OUTPUT_DIR,
+        output_format: str = PROFILE_FORMAT
+    ):
+        self.app = app
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.profiled_total = 0
+
+    def should_profile(self, scope) -> bool:
+        if Profiler is None:
+            return False
+        for name, value in scope["headers"]:
+            if name.decode("latin-1") == PROFILING_HEADER:
+                return is_admin_token(value.decode("latin-1"), self.admin_token)
+        path = scope["path"]
+        # Streams would be profiled until the client disconnects
+        if path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES) or path.endswith(LONG_LIVED_SUFFIXES):
+            return False
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = current_scope.set(scope)
+        try:
+            if self.should_profile(scope):
+                await self._profile(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(token)
+
+    def artifact_name(self, scope) -> str:
+        extension = "speedscope.json" if self.output_format == "speedscope" else "html"
+        path = re.sub(r"[^\w-]+", "_", scope["path"]).strip("_") or "root"
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        return f"{stamp}-{scope['method']}-{path[:80]}-{uuid4().hex[:8]}.{extension}"
+
+    async def _profile(self, scope, receive, send):
+        name = self.artifact_name(scope)
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+        try:
+            profiler.start()
+        except RuntimeError as e:
+            # Another profiler is already running in this context
+            logger.warning(f"Not profiling {scope['method']} {scope['path']}: {str(e)}")
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_artifact(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (ARTIFACT_HEADER, name.encode())]}
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_artifact)
+        finally:
+            profiler.stop()
+            duration_ms = (time.perf_counter() - started) * 1000
+            try:
+                path = await asyncio.to_thread(self._write, profiler, name)
+                self.profiled_total += 1
+                logger.info(f"Profiled {scope['method']} {scope['path']} ({duration_ms:.0f} ms): {path}")
+            except Exception as e:
+                logger.error(f"Failed to write profile {name}: {str(e)}")
+
+    def _write(self, profiler, name: str) -> str:
+        renderer = SpeedscopeRenderer() if self.output_format == "speedscope" else HTMLRenderer()
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, name)
+        with open(path, "w", encoding="utf-8") as artifact:
+            artifact.write(profiler.output(renderer))
+        return path
+
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    if not is_admin_token(x_admin_token, PROFILING_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+admin_router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin_token)])
+
+
+@admin_router.get("/slow-queries")
+async def list_slow_queries(limit: int = Query(100, ge=1, le=max(SLOW_QUERY_BUFFER_SIZE, 1))):
+    """The slowest recent statements, newest first"""
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "recorded_total": slow_query_log.recorded_total,
+        "queries": slow_query_log.recent(limit)
+    }
+
+
+@admin_router.get("/profiles")
+async def list_profiles():
+    """Profile artifacts written by this instance, newest first"""
+    if not os.path.isdir(PROFILE_OUTPUT_DIR):
+        return []
+    return sorted((name for name in os.listdir(PROFILE_OUTPUT_DIR) if ARTIFACT_NAME.match(name)), reverse=True)
+
+
+@admin_router.get("/profiles/{name}")
+async def get_profile(name: str):
+    path = os.path.join(PROFILE_OUTPUT_DIR, name)
+    if not ARTIFACT_NAME.match(name) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/html" if name.endswith(".html") else "application/json"
+    return FileResponse(path, media_type=media_type)
@@ -1,21 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Security
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, Response, Security
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
+from pydantic import TypeAdapter
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
-from app.database import get_db_session
-from app.schemas import CompanyCreate, CompanyUpdate, CompanyResponse, CompanyVersionResponse
+import asyncio
+import time
+from app.audit_client import audit_log_client
+from app.database import get_db_session, get_read_db_session, read_session_factory, coalescing_target
+from app.schemas import (
+    CompanyChangesResponse,
+    CompanyCreate,
+    CompanyUpdate,
+    CompanyBulkUpdate,
+    CompanyBulkUpdateResponse,
+    CompanyStatusTransition,
+    CompanyBulkStatusTransition,
+    CompanyFilter,
+    CompanyResponse,
+    CompanyDetailResponse,
+    CompanyVersionResponse,
+    CompanyVersionDiff,
+    parse_fields,
+    sparse_model,
+    sparse_list_adapter
+)
+from app.conditional import make_etag, is_not_modified, cache_headers, parse_if_match_version
+from app.negotiation import (
+    JSON,
+    NDJSON,
+    CSV,
+    MSGPACK,
+    VARY,
+    NotAcceptableError,
+    negotiate_format,
+    negotiate_encoding,
+    negotiated_response,
+    negotiated_stream
+)
 from app.services import (
+    ConcurrencyConflictError,
     create_company,
     get_company,
+    get_company_validator,
     get_companies,
+    company_details,
+    COMPANY_INCLUDES,
+    get_company_as_of,
+    get_companies_as_of,
+    iter_companies,
+    count_companies,
+    search_companies,
+    count_search_results,
     update_company,
+    bulk_update_companies,
+    transition_company_status,
+    bulk_transition_company_status,
+    InvalidStatusTransitionError,
     delete_company,
     get_company_versions,
-    restore_company_version
+    count_company_versions,
+    diff_company_versions,
+    get_company_changes,
+    ChangePosition,
+    restore_company_version,
+    IdempotencyConflictError,
+    IdempotencyKeyMismatchError,
+    IdempotencyClaimLostError,
+    IdempotentResponse,
+    request_fingerprint,
+    begin_idempotent_request,
+    complete_idempotent_request,
+    release_idempotent_request
 )
+from app.single_flight import single_flight
 from loguru import logger
 import os
 
@@ -27,6 +90,18 @@ security = HTTPBearer()
 # Configuration (should be in environment variables in production)
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-for-testing")
 ALGORITHM = "HS256"
+# Companies fetched per query while streaming an export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Long-polling of the change feed: the longest wait a client may ask for, and
+# how often the feed is re-read meanwhile
+CHANGES_MAX_WAIT = int(os.getenv("CHANGES_MAX_WAIT", "30"))
+CHANGES_POLL_INTERVAL = float(os.getenv("CHANGES_POLL_INTERVAL", "1"))
+
+# Representations offered by listings and exports, the first one being the default
+LIST_FORMATS = (JSON, CSV, MSGPACK, NDJSON)
+EXPORT_FORMATS = (NDJSON, CSV, MSGPACK)
+detail_list_adapter = TypeAdapter(List[CompanyDetailResponse])
 
 class AuthenticationError(Exception):
     pass
@@ -58,66 +133,510 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(
 @router.post("/", response_model=CompanyResponse)
 async def create_company_endpoint(
     company: CompanyCreate,
+    background_tasks: BackgroundTasks,
     change_reason: Optional[str] = None,
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db_session)
 ):
-    """Create a new company."""
+    """
+    Create a new company. Retries carrying the same Idempotency-Key header get the
+    stored response of the first request instead of creating a duplicate.
+    """
     logger.info(f"User {current_user['user_id']} creating new company: {company.company_name}")
+    # Keys are chosen by clients, so they are scoped per user
+    idempotency_scope = f"companies:create:{current_user['user_id']}"
+    claim = None
+    try:
+        if idempotency_key:
+            stored = await begin_idempotent_request(
+                db,
+                idempotency_scope,
+                idempotency_key,
+                request_fingerprint(company.model_dump(), change_reason)
+            )
+            if isinstance(stored, IdempotentResponse):
+                return JSONResponse(
+                    content=stored.body,
+                    status_code=stored.status_code,
+                    headers={"Idempotency-Replayed": "true"}
+                )
+            claim = stored
+    except IdempotencyKeyMismatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    async def store_response(new_company):
+        # Stored with the company, so a retry never creates it twice
+        body = jsonable_encoder(CompanyResponse.model_validate(new_company))
+        await complete_idempotent_request(db, claim, 200, body)
+
     try:
         result = await create_company(
             db=db,
             company_data=company,
             user_id=current_user["user_id"],
-            change_reason=change_reason
+            change_reason=change_reason,
+            before_commit=store_response if claim else None
         )
         logger.success(f"Successfully created company: {result.company_id}")
-        return result
+        background_tasks.add_task(
+            audit_log_client.record,
+            "CREATE",
+            result.company_id,
+            current_user["user_id"],
+            result.current_version,
+            new_data=company.model_dump(),
+            change_reason=change_reason
+        )
+    except IdempotencyClaimLostError as e:
+        # The request that took the key over creates the company instead
+        logger.warning(f"Rolled back company creation: {str(e)}")
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Error creating company: {str(e)}")
+        if claim:
+            await release_idempotent_request(db, claim)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{company_id}", response_model=CompanyResponse)
-async def get_company_endpoint(
+    return result
+
+def resolve_expected_version(
     company_id: UUID,
-    current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db_session)
-):
-    """Get a specific company by ID."""
-    logger.info(f"User {current_user['user_id']} fetching company with ID: {company_id}")
-    company = await get_company(db, company_id)
-    if not company:
-        logger.warning(f"Company with ID {company_id} not found")
-        raise HTTPException(status_code=404, detail="Company not found")
-    return company
+    if_match: Optional[str],
+    expected_version: Optional[int]
+) -> Optional[int]:
+    """Combine the If-Match header and the expected_version parameter into one precondition"""
+    try:
+        header_version = parse_if_match_version(if_match, company_id)
+    except ValueError as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    if header_version is not None and expected_version is not None and header_version != expected_version:
+        raise HTTPException(status_code=400, detail="If-Match and expected_version disagree")
+    return header_version if header_version is not None else expected_version
+
+def parse_include(include: Optional[str], as_of: Optional[datetime] = None) -> List[str]:
+    """Parse the comma separated include parameter into known relationship names"""
+    names = [name.strip() for name in (include or "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in COMPANY_INCLUDES]
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown include {', '.join(unknown)}; allowed: {', '.join(COMPANY_INCLUDES)}"
+        )
+    if names and as_of is not None:
+        raise HTTPException(status_code=400, detail="include cannot be combined with as_of")
+    return list(dict.fromkeys(names))
+
+def parse_company_fields(fields: Optional[str], includes: List[str]) -> Optional[Tuple[str, ...]]:
+    """Parse the comma separated fields parameter; company_id is always returned"""
+    try:
+        fieldset = parse_fields(CompanyResponse, fields, always=("company_id",))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if fieldset and includes:
+        raise HTTPException(status_code=400, detail="fields cannot be combined with include")
+    return fieldset
+
+def sparse_response(
+    data: Any,
+    fieldset: Tuple[str, ...],
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Serialize a company or a list of companies with the slim response model of the fieldset"""
+    if isinstance(data, list):
+        adapter = sparse_list_adapter(CompanyResponse, fieldset)
+        body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    else:
+        body = sparse_model(CompanyResponse, fieldset).model_validate(data).model_dump_json()
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def coalescing_key(request: Request, name: str, *args: Any) -> Optional[Tuple[Any, ...]]:
+    """Single-flight key of a read, or None when the caller must not share reads"""
+    target = coalescing_target(request)
+    return (name, target, *args) if target else None
+
+def parse_change_cursor(since: Optional[str]) -> Optional[ChangePosition]:
+    """Feed position encoded in a change cursor, or 400"""
+    if since is None:
+        return None
+    try:
+        txid, seq = (int(part) for part in since.split("-"))
+        return txid, seq
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid change cursor: {since}")
+
+def format_change_cursor(position: Optional[ChangePosition]) -> Optional[str]:
+    return f"{position[0]}-{position[1]}" if position is not None else None
+
+def negotiate(
+    accept: Optional[str],
+    accept_encoding: Optional[str],
+    offered: Tuple[str, ...]
+) -> Tuple[str, Optional[str]]:
+    """Media type and content coding for the response, or 406"""
+    try:
+        return negotiate_format(accept, offered), negotiate_encoding(accept_encoding)
+    except NotAcceptableError as e:
+        raise HTTPException(status_code=406, detail=str(e))
 
-@router.get("/companies", response_model=List[CompanyResponse])
+def company_list_response(
+    companies: List[Any],
+    fieldset: Optional[Tuple[str, ...]],
+    media_type: str,
+    coding: Optional[str],
+    headers: Dict[str, str]
+) -> Response:
+    """Render a company page in the negotiated format and coding"""
+    adapter = sparse_list_adapter(CompanyResponse, fieldset) if fieldset else detail_list_adapter
+    records = adapter.dump_python(
+        adapter.validate_python(companies, from_attributes=True),
+        mode="json",
+        exclude_unset=True
+    )
+    columns = fieldset or tuple(CompanyResponse.model_fields)
+    return negotiated_response(records, media_type, coding, columns, headers)
+
+FIELDS_DESCRIPTION = "Comma separated CompanyResponse fields to return; company_id is always included"
+
+# Static paths are registered before "/{company_id}" so they are not captured by it
+@router.get("/companies", response_model=List[CompanyDetailResponse], response_model_exclude_unset=True)
 async def list_companies(
+    response: Response,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=10, ge=1, le=100),
+    include_total: bool = False,
+    as_of: Optional[datetime] = None,
+    include: Optional[str] = Query(default=None, description="Comma separated: status, latest_version, versions"),
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION),
+    accept: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_read_db_session)
 ):
-    """List companies with pagination."""
-    logger.info(f"User {current_user['user_id']} fetching companies with skip={skip}, limit={limit}")
+    """
+    List companies with pagination. With include_total the X-Total-Count header
+    carries the total number of companies (see X-Total-Count-Estimated). With
+    as_of the companies are returned as they were at that time, ordered by id.
+    include embeds the named relationships, loaded with one query each per page;
+    fields restricts the columns read and returned. JSON, CSV, MessagePack or
+    NDJSON are returned per Accept, compressed per Accept-Encoding.
+    """
+    logger.info(f"User {current_user['user_id']} fetching companies with skip={skip}, limit={limit}, as_of={as_of}")
+    includes = parse_include(include, as_of)
+    fieldset = parse_company_fields(fields, includes)
+    media_type, coding = negotiate(accept, accept_encoding, LIST_FORMATS)
     try:
-        companies = await get_companies(db, skip, limit)
+        if as_of is not None:
+            companies = [
+                CompanyResponse.model_validate(company).model_dump()
+                for company in await get_companies_as_of(db, as_of, skip, limit)
+            ]
+        elif fieldset:
+            companies = await get_companies(db, skip, limit, fields=fieldset)
+        else:
+            companies = await company_details(db, await get_companies(db, skip, limit, includes), includes)
+        headers = (await count_companies(db, as_of)).headers() if include_total else {}
         logger.success(f"Successfully fetched {len(companies)} companies")
+        if media_type != JSON or coding:
+            return company_list_response(companies, fieldset, media_type, coding, headers)
+        headers["Vary"] = VARY
+        if fieldset:
+            return sparse_response(companies, fieldset, headers)
+        response.headers.update(headers)
         return companies
     except Exception as e:
         logger.error(f"Error fetching companies: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/export")
+async def export_companies_endpoint(
+    request: Request,
+    as_of: Optional[datetime] = None,
+    accept: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Stream all companies in their current state or as they were at as_of, one
+    CompanyResponse per record. Newline-delimited JSON by default; CSV or
+    MessagePack per Accept. Compressed chunk by chunk per Accept-Encoding.
+    """
+    logger.info(f"User {current_user['user_id']} exporting companies as_of={as_of}")
+    media_type, coding = negotiate(accept, accept_encoding, EXPORT_FORMATS)
+    # The response outlives the request's dependencies, so it brings its own session
+    session_factory = read_session_factory(request)
+
+    async def batches():
+        exported = 0
+        async with session_factory() as db:
+            async for batch in iter_companies(db, as_of, EXPORT_BATCH_SIZE):
+                exported += len(batch)
+                yield [
+                    CompanyResponse.model_validate(company).model_dump(mode="json")
+                    for company in batch
+                ]
+        logger.success(f"Exported {exported} companies")
+
+    return negotiated_stream(batches(), media_type, coding, tuple(CompanyResponse.model_fields))
+
+@router.get("/search", response_model=List[CompanyDetailResponse], response_model_exclude_unset=True)
+async def search_companies_endpoint(
+    response: Response,
+    company_country: Optional[str] = None,
+    company_accounting_standards: Optional[str] = None,
+    status_id: Optional[UUID] = None,
+    name: Optional[str] = Query(default=None, min_length=1, max_length=200),
+    fuzzy: bool = False,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=10, ge=1, le=100),
+    include_total: bool = False,
+    include: Optional[str] = Query(default=None, description="Comma separated: status, latest_version, versions"),
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION),
+    accept: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db_session)
+):
+    """
+    Search companies. All given filters must match; name matches substrings,
+    or similar names ranked by similarity when fuzzy is set. With include_total
+    the X-Total-Count header carries the number of matches; include embeds the
+    named relationships and fields restricts the columns read and returned.
+    Output formats are negotiated as for the company listing.
+    """
+    logger.info(f"User {current_user['user_id']} searching companies (name={name}, fuzzy={fuzzy})")
+    # Search without criteria is a plain listing, so the at-least-one-field check is skipped
+    company_filter = CompanyFilter.model_construct(
+        company_country=company_country,
+        company_accounting_standards=company_accounting_standards,
+        status_id=status_id
+    )
+    includes = parse_include(include)
+    fieldset = parse_company_fields(fields, includes)
+    media_type, coding = negotiate(accept, accept_encoding, LIST_FORMATS)
+    try:
+        companies = await search_companies(db, company_filter, name, fuzzy, skip, limit, includes, fieldset)
+        if not fieldset:
+            companies = await company_details(db, companies, includes)
+        headers = (await count_search_results(db, company_filter, name, fuzzy)).headers() if include_total else {}
+        logger.success(f"Search returned {len(companies)} companies")
+        if media_type != JSON or coding:
+            return company_list_response(companies, fieldset, media_type, coding, headers)
+        headers["Vary"] = VARY
+        if fieldset:
+            return sparse_response(companies, fieldset, headers)
+        response.headers.update(headers)
+        return companies
+    except Exception as e:
+        logger.error(f"Error searching companies: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/changes", response_model=CompanyChangesResponse)
+async def get_company_changes_endpoint(
+    request: Request,
+    since: Optional[str] = Query(default=None, description="next_cursor of the previous page; omit to start at the beginning"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    wait: int = Query(default=0, ge=0, le=CHANGES_MAX_WAIT, description="Seconds to wait for changes when there are none yet"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Incremental change feed: company versions and deletions (change_type DELETE)
+    recorded after the cursor, in commit order. Consumers keep next_cursor and
+    sync in O(changes). With wait the request is held until changes arrive or
+    the wait expires (long polling); no connection is held while waiting.
+    """
+    logger.info(f"User {current_user['user_id']} reading company changes since {since}")
+    after = parse_change_cursor(since)
+    session_factory = read_session_factory(request)
+    deadline = time.monotonic() + wait
+    try:
+        while True:
+            async with session_factory() as db:
+                changes, position = await get_company_changes(db, after, limit + 1)
+                has_more = len(changes) > limit
+                if has_more:
+                    changes = changes[:limit]
+                    last = changes[-1]
+                    position = (last.change_txid, last.change_seq)
+                page = CompanyChangesResponse(
+                    changes=[CompanyVersionResponse.model_validate(change) for change in changes],
+                    next_cursor=format_change_cursor(position),
+                    has_more=has_more
+                )
+            remaining = deadline - time.monotonic()
+            if page.changes or remaining <= 0:
+                return page
+            await asyncio.sleep(min(CHANGES_POLL_INTERVAL, remaining))
+    except Exception as e:
+        logger.error(f"Error reading company changes: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/bulk-update", response_model=CompanyBulkUpdateResponse)
+async def bulk_update_companies_endpoint(
+    bulk_update: CompanyBulkUpdate,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """Apply one update to all companies matching the filter, in a single transaction."""
+    logger.info(f"User {current_user['user_id']} bulk updating companies matching {bulk_update.filter}")
+    try:
+        updated = await bulk_update_companies(
+            db=db,
+            company_filter=bulk_update.filter,
+            update_data=bulk_update.update,
+            user_id=current_user["user_id"],
+            change_reason=bulk_update.change_reason
+        )
+        logger.success(f"Successfully bulk updated {len(updated)} companies")
+        background_tasks.add_task(
+            audit_log_client.record_batch,
+            "UPDATE",
+            [(row.company_id, row.version_number) for row in updated],
+            current_user["user_id"],
+            new_data=bulk_update.update.model_dump(exclude_unset=True),
+            change_reason=bulk_update.change_reason
+        )
+        return CompanyBulkUpdateResponse(updated_count=len(updated))
+    except ValueError as ve:
+        logger.error(f"Validation error while bulk updating companies: {str(ve)}")
+        raise HTTPException(status_code=400, detail=str(ve))
+    except IntegrityError as e:
+        logger.error(f"Constraint violation while bulk updating companies: {str(e)}")
+        raise HTTPException(status_code=409, detail="The update conflicts with existing companies")
+    except Exception as e:
+        logger.error(f"Error bulk updating companies: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/bulk-status", response_model=CompanyBulkUpdateResponse)
+async def bulk_transition_company_status_endpoint(
+    transition: CompanyBulkStatusTransition,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """Move all companies matching the filter to a status, in a single transaction."""
+    logger.info(
+        f"User {current_user['user_id']} moving companies matching {transition.filter} to status {transition.status_id}"
+    )
+    try:
+        updated = await bulk_transition_company_status(
+            db=db,
+            company_filter=transition.filter,
+            status_id=transition.status_id,
+            user_id=current_user["user_id"],
+            status_reason=transition.status_reason,
+            change_reason=transition.change_reason
+        )
+        logger.success(f"Successfully changed status of {len(updated)} companies")
+        background_tasks.add_task(
+            audit_log_client.record_batch,
+            "STATUS",
+            [(row.company_id, row.version_number) for row in updated],
+            current_user["user_id"],
+            new_data={"status_id": transition.status_id, "status_reason": transition.status_reason},
+            change_reason=transition.change_reason
+        )
+        return CompanyBulkUpdateResponse(updated_count=len(updated))
+    except InvalidStatusTransitionError as e:
+        logger.warning(f"Invalid status transition: {str(e)}")
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error bulk changing company status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{company_id}", response_model=CompanyDetailResponse, response_model_exclude_unset=True)
+async def get_company_endpoint(
+    company_id: UUID,
+    request: Request,
+    response: Response,
+    as_of: Optional[datetime] = None,
+    include: Optional[str] = Query(default=None, description="Comma separated: status, latest_version, versions"),
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION),
+    if_none_match: Optional[str] = Header(default=None),
+    if_modified_since: Optional[str] = Header(default=None),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db_session)
+):
+    """
+    Get a specific company by ID. Supports conditional GET via ETag/Last-Modified.
+    With as_of the company is returned as it was at that time. include embeds
+    the named relationships; such responses are not conditional, as the
+    embedded records change independently of the company version. fields
+    restricts the columns read and returned. Identical concurrent reads of the
+    same company share their queries.
+    """
+    logger.info(f"User {current_user['user_id']} fetching company with ID: {company_id}")
+    includes = parse_include(include, as_of)
+    fieldset = parse_company_fields(fields, includes)
+    if includes:
+        company = await get_company(db, company_id, includes)
+        if not company:
+            logger.warning(f"Company with ID {company_id} not found")
+            raise HTTPException(status_code=404, detail="Company not found")
+        return (await company_details(db, [company], includes))[0]
+
+    if as_of is not None:
+        company = await get_company_as_of(db, company_id, as_of)
+        if not company:
+            logger.warning(f"Company with ID {company_id} did not exist at {as_of}")
+            raise HTTPException(status_code=404, detail="Company not found")
+        if fieldset:
+            return sparse_response(company, fieldset)
+        return CompanyResponse.model_validate(company).model_dump()
+
+    validator = await single_flight.do(
+        coalescing_key(request, "company_validator", company_id),
+        lambda: get_company_validator(db, company_id)
+    )
+    if not validator:
+        logger.warning(f"Company with ID {company_id} not found")
+        raise HTTPException(status_code=404, detail="Company not found")
+
+    version, updated_at = validator
+    # Each fieldset is a separate representation with its own entity tag
+    variant = "fields-" + "+".join(fieldset) if fieldset else None
+    headers = cache_headers(make_etag(company_id, version, variant), updated_at)
+    if is_not_modified(if_none_match, if_modified_since, headers["ETag"], updated_at):
+        logger.info(f"Company {company_id} not modified (version {version})")
+        return Response(status_code=304, headers=headers)
+
+    async def load():
+        company = await get_company(db, company_id, fields=fieldset)
+        if not company or fieldset:
+            return company
+        # Shared with coalesced callers, so detached from this request's session
+        return (await company_details(db, [company]))[0]
+
+    company = await single_flight.do(coalescing_key(request, "company", company_id, fieldset), load)
+    if not company:
+        logger.warning(f"Company with ID {company_id} not found")
+        raise HTTPException(status_code=404, detail="Company not found")
+    if fieldset:
+        return sparse_response(company, fieldset, headers)
+    response.headers.update(headers)
+    return company
+
 @router.put("/{company_id}", response_model=CompanyResponse)
 async def update_company_endpoint(
     company_id: UUID,
     company: CompanyUpdate,
+    response: Response,
+    background_tasks: BackgroundTasks,
     change_reason: Optional[str] = None,
+    expected_version: Optional[int] = Query(default=None, ge=1),
+    if_match: Optional[str] = Header(default=None),
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db_session)
 ):
-    """Update an existing company."""
+    """
+    Update an existing company. With If-Match or expected_version the update only
+    applies if the company is still at that version, otherwise 412 is returned.
+    """
     logger.info(f"User {current_user['user_id']} updating company with ID: {company_id}")
+    expected_version = resolve_expected_version(company_id, if_match, expected_version)
     try:
         # The CompanyUpdate schema now validates that at least one field is provided
         updated_company = await update_company(
@@ -125,14 +644,31 @@ async def update_company_endpoint(
             company_id=company_id,
             update_data=company,
             user_id=current_user["user_id"],
-            change_reason=change_reason
+            change_reason=change_reason,
+            expected_version=expected_version
         )
         if not updated_company:
             logger.warning(f"Company with ID {company_id} not found")
             raise HTTPException(status_code=404, detail="Company not found")
         
         logger.success(f"Successfully updated company: {company_id}")
+        # Sent after the response, in the request's trace
+        background_tasks.add_task(
+            audit_log_client.record,
+            "UPDATE",
+            company_id,
+            current_user["user_id"],
+            updated_company.current_version,
+            new_data=company.model_dump(exclude_unset=True),
+            change_reason=change_reason
+        )
+        response.headers["ETag"] = make_etag(company_id, updated_company.current_version)
         return updated_company
+    except HTTPException:
+        raise
+    except ConcurrencyConflictError as e:
+        logger.warning(f"Precondition failed while updating company {company_id}: {str(e)}")
+        raise HTTPException(status_code=412, detail=str(e))
     except ValueError as ve:
         logger.error(f"Validation error while updating company: {str(ve)}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -144,6 +680,7 @@ async def update_company_endpoint(
 @router.delete("/{company_id}", response_model=CompanyResponse)
 async def delete_company_endpoint(
     company_id: UUID,
+    background_tasks: BackgroundTasks,
     change_reason: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db_session)
@@ -161,46 +698,164 @@ async def delete_company_endpoint(
             logger.warning(f"Company with ID {company_id} not found")
             raise HTTPException(status_code=404, detail="Company not found")
         logger.success(f"Successfully deleted company: {company_id}")
+        background_tasks.add_task(
+            audit_log_client.record,
+            "DELETE",
+            company_id,
+            current_user["user_id"],
+            deleted_company.current_version + 1,  # The version recording the deletion
+            change_reason=change_reason
+        )
         return deleted_company
+    except HTTPException:
+        raise
+    except ConcurrencyConflictError as e:
+        logger.warning(f"Conflict while deleting company {company_id}: {str(e)}")
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Error deleting company: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/{company_id}/status", response_model=CompanyResponse)
+async def transition_company_status_endpoint(
+    company_id: UUID,
+    transition: CompanyStatusTransition,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    expected_version: Optional[int] = Query(default=None, ge=1),
+    if_match: Optional[str] = Header(default=None),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """
+    Move a company to another status. Accepts the same If-Match and
+    expected_version preconditions as the update endpoint.
+    """
+    logger.info(f"User {current_user['user_id']} moving company {company_id} to status {transition.status_id}")
+    expected_version = resolve_expected_version(company_id, if_match, expected_version)
+    try:
+        company = await transition_company_status(
+            db=db,
+            company_id=company_id,
+            status_id=transition.status_id,
+            user_id=current_user["user_id"],
+            status_reason=transition.status_reason,
+            change_reason=transition.change_reason,
+            expected_version=expected_version
+        )
+        if not company:
+            logger.warning(f"Company with ID {company_id} not found")
+            raise HTTPException(status_code=404, detail="Company not found")
+        logger.success(f"Successfully changed status of company: {company_id}")
+        background_tasks.add_task(
+            audit_log_client.record,
+            "STATUS",
+            company_id,
+            current_user["user_id"],
+            company.current_version,
+            new_data={"status_id": transition.status_id, "status_reason": transition.status_reason},
+            change_reason=transition.change_reason
+        )
+        response.headers["ETag"] = make_etag(company_id, company.current_version)
+        return company
+    except HTTPException:
+        raise
+    except ConcurrencyConflictError as e:
+        logger.warning(f"Precondition failed while changing status of company {company_id}: {str(e)}")
+        raise HTTPException(status_code=412, detail=str(e))
+    except InvalidStatusTransitionError as e:
+        logger.warning(f"Invalid status transition for company {company_id}: {str(e)}")
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error changing company status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{company_id}/versions", response_model=List[CompanyVersionResponse])
 async def get_company_versions_endpoint(
     company_id: UUID,
+    response: Response,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=10, ge=1, le=100),
+    include_total: bool = False,
+    if_none_match: Optional[str] = Header(default=None),
+    if_modified_since: Optional[str] = Header(default=None),
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_read_db_session)
 ):
-    """Get version history for a company."""
+    """
+    Get version history for a company. Supports conditional GET via ETag/Last-Modified.
+    With include_total the X-Total-Count header carries the number of versions.
+    """
     logger.info(f"User {current_user['user_id']} fetching version history for company: {company_id}")
     try:
+        validator = await get_company_validator(db, company_id)
+        if validator:
+            version, updated_at = validator
+            headers = cache_headers(make_etag(company_id, version, "versions"), updated_at)
+            if is_not_modified(if_none_match, if_modified_since, headers["ETag"], updated_at):
+                logger.info(f"Version history of company {company_id} not modified (version {version})")
+                return Response(status_code=304, headers=headers)
+            response.headers.update(headers)
+
         versions = await get_company_versions(db, company_id, skip, limit)
+        if include_total:
+            response.headers.update((await count_company_versions(db, company_id)).headers())
         logger.success(f"Successfully fetched {len(versions)} versions for company: {company_id}")
         return versions
     except Exception as e:
         logger.error(f"Error fetching company versions: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{company_id}/versions/diff", response_model=CompanyVersionDiff)
+async def diff_company_versions_endpoint(
+    company_id: UUID,
+    from_version: int = Query(ge=1),
+    to_version: int = Query(ge=1),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db_session)
+):
+    """Get the fields that changed between two versions of a company."""
+    logger.info(
+        f"User {current_user['user_id']} comparing versions {from_version} and {to_version} of company: {company_id}"
+    )
+    try:
+        diff = await diff_company_versions(db, company_id, from_version, to_version)
+        if diff is None:
+            logger.warning(f"Versions {from_version}/{to_version} not found for company {company_id}")
+            raise HTTPException(status_code=404, detail="Version not found")
+        return diff
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error comparing company versions: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/{company_id}/restore/{version_number}", response_model=CompanyResponse)
 async def restore_company_version_endpoint(
     company_id: UUID,
     version_number: int,
+    response: Response,
+    background_tasks: BackgroundTasks,
     change_reason: Optional[str] = None,
+    expected_version: Optional[int] = Query(default=None, ge=1),
+    if_match: Optional[str] = Header(default=None),
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db_session)
 ):
-    """Restore a company to a specific version."""
+    """
+    Restore a company to a specific version. Accepts the same If-Match and
+    expected_version preconditions as the update endpoint.
+    """
     logger.info(f"User {current_user['user_id']} restoring company {company_id} to version {version_number}")
+    expected_version = resolve_expected_version(company_id, if_match, expected_version)
     try:
         restored_company = await restore_company_version(
             db=db,
             company_id=company_id,
             version_number=version_number,
             user_id=current_user["user_id"],
-            change_reason=change_reason
+            change_reason=change_reason,
+            expected_version=expected_version
         )
         if not restored_company:
             logger.warning(f"Version {version_number} not found for company {company_id}")
@@ -209,7 +864,22 @@ async def restore_company_version_endpoint(
                 detail=f"Version {version_number} not found for company {company_id}"
             )
         logger.success(f"Successfully restored company {company_id} to version {version_number}")
+        background_tasks.add_task(
+            audit_log_client.record,
+            "RESTORE",
+            company_id,
+            current_user["user_id"],
+            restored_company.current_version,
+            new_data={"restored_version": version_number},
+            change_reason=change_reason
+        )
+        response.headers["ETag"] = make_etag(company_id, restored_company.current_version)
         return restored_company
+    except HTTPException:
+        raise
+    except ConcurrencyConflictError as e:
+        logger.warning(f"Precondition failed while restoring company {company_id}: {str(e)}")
+        raise HTTPException(status_code=412, detail=str(e))
     except Exception as e:
         logger.error(f"Error restoring company version: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from uuid import UUID
-from app.database import get_db_session
+from app.database import get_db_session, get_read_db_session, coalescing_target
 from app.schemas import CompanyStatusResponse, CompanyStatusCreate, CompanyStatusUpdate
 from app.services import (
     create_company_status,
@@ -11,6 +11,7 @@ from app.services import (
     update_company_status_type
 )
 from app.auth import get_current_user
+from app.single_flight import single_flight
 from loguru import logger
 
 router = APIRouter(prefix="/company-status",
@@ -28,16 +29,23 @@ async def create_company_status_endpoint(
 
 @router.get("/", response_model=List[CompanyStatusResponse])
 async def list_company_statuses(
+    request: Request,
     active_only: bool = True,
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_read_db_session)
 ):
-    """List all company statuses."""
-    return await get_company_statuses(db, active_only)
+    """List all company statuses. Identical concurrent listings share one query."""
+    async def load():
+        statuses = await get_company_statuses(db, active_only)
+        return [CompanyStatusResponse.model_validate(status) for status in statuses]
+
+    target = coalescing_target(request)
+    key = ("company_statuses", target, active_only) if target else None
+    return await single_flight.do(key, load)
 
 @router.get("/{status_id}", response_model=CompanyStatusResponse)
 async def get_company_status_endpoint(
     status_id: UUID,
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_read_db_session)
 ):
     """Get a specific company status."""
     status = await get_company_status(db, status_id)
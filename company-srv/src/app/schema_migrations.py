@@ -0,0 +1,78 @@
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import MetaData, Table, inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# DDL bringing the tables of schema version N - 1 to version N, keyed by N.
+# "{schema}" stands for the schema prefix of names ('"name".' or nothing).
+# Tables and sequences new in a version come from create_all, which runs
+# first; the statements only change what existed before.
+Migrations = Dict[int, List[str]]
+
+# Serializes migrators started at the same time (any constant key works)
+MIGRATION_LOCK_KEY = 7_300_261
+
+
+def schema_prefix(schema: Optional[str]) -> str:
+    return f'"{schema}".' if schema else ""
+
+
+def stored_schema_version(sync_conn, version_table: Table, first_table: str) -> Optional[int]:
+    """
+    The schema version stamped in the database: 0 for tables created before
+    versions were stamped, None for a database without the service's tables.
+    """
+    inspector = inspect(sync_conn)
+    if inspector.has_table(version_table.name, schema=version_table.schema):
+        version = sync_conn.execute(select(version_table.c.version).where(version_table.c.id == 1)).scalar()
+        if version is not None:
+            return version
+    return 0 if inspector.has_table(first_table, schema=version_table.schema) else None
+
+
+def pending_migrations(migrations: Migrations, from_version: int, to_version: int) -> List[Tuple[int, List[str]]]:
+    """The steps after from_version up to to_version, in order; versions without DDL are skipped"""
+    return [
+        (version, migrations[version])
+        for version in range(from_version + 1, to_version + 1)
+        if migrations.get(version)
+    ]
+
+
+async def lock_migrations(conn: AsyncConnection):
+    """Hold the migration lock until the transaction ends"""
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+async def migrate(
+    conn: AsyncConnection,
+    migrations: Migrations,
+    from_version: int,
+    to_version: int,
+    schema: Optional[str]
+):
+    """Apply the migrations after from_version in the connection's transaction"""
+    prefix = schema_prefix(schema)
+    for version, statements in pending_migrations(migrations, from_version, to_version):
+        logger.info(f"Migrating database schema to version {version}...")
+        for statement in statements:
+            await conn.execute(text(statement.format(schema=prefix)))
+
+
+def schema_drift(sync_conn, metadata: MetaData) -> List[str]:
+    """
+    Columns the existing tables lack, or still declare NOT NULL, compared with
+    the models; what is left after a migration that missed a change.
+    """
+    inspector = inspect(sync_conn)
+    drift = []
+    for table in metadata.sorted_tables:
+        existing = {column["name"]: column for column in inspector.get_columns(table.name, schema=table.schema)}
+        for column in table.columns:
+            reflected = existing.get(column.name)
+            if reflected is None:
+                drift.append(f"{table.fullname}.{column.name} is missing")
+            elif column.nullable and not reflected["nullable"]:
+                drift.append(f"{table.fullname}.{column.name} is NOT NULL")
+    return drift
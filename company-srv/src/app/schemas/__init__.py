@@ -2,8 +2,17 @@ from .company_schema import (
     CompanyBase,
     CompanyCreate,
     CompanyUpdate,
+    CompanyFilter,
+    CompanyBulkUpdate,
+    CompanyBulkUpdateResponse,
+    CompanyStatusTransition,
+    CompanyBulkStatusTransition,
     CompanyResponse,
-    CompanyVersionResponse
+    CompanyVersionResponse,
+    CompanyDetailResponse,
+    CompanyChangesResponse,
+    FieldChange,
+    CompanyVersionDiff
 )
 
 from .company_status_schema import (
@@ -13,14 +22,32 @@ from .company_status_schema import (
     CompanyStatusResponse
 )
 
+from .fieldsets import (
+    parse_fields,
+    sparse_model,
+    sparse_list_adapter
+)
+
 __all__ = [
     'CompanyBase',
     'CompanyCreate',
     'CompanyUpdate',
+    'CompanyFilter',
+    'CompanyBulkUpdate',
+    'CompanyBulkUpdateResponse',
+    'CompanyStatusTransition',
+    'CompanyBulkStatusTransition',
     'CompanyResponse',
     'CompanyVersionResponse',
+    'CompanyDetailResponse',
+    'CompanyChangesResponse',
+    'FieldChange',
+    'CompanyVersionDiff',
     'CompanyStatusBase',
     'CompanyStatusCreate',
     'CompanyStatusUpdate',
-    'CompanyStatusResponse'
+    'CompanyStatusResponse',
+    'parse_fields',
+    'sparse_model',
+    'sparse_list_adapter'
 ]
\ No newline at end of file
@@ -1,7 +1,8 @@
-from pydantic import BaseModel, UUID4
-from typing import Optional
+from pydantic import BaseModel, UUID4, model_validator
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from pydantic.config import ConfigDict
+from .company_status_schema import CompanyStatusResponse
 
 class CompanyBase(BaseModel):
     company_code: str
@@ -18,10 +19,49 @@ class CompanyUpdate(BaseModel):
     company_country: Optional[str] = None
     company_accounting_standards: Optional[str] = None
 
+class CompanyFilter(BaseModel):
+    """Selects companies by exact match; all given fields must match"""
+    company_ids: Optional[List[UUID4]] = None
+    company_country: Optional[str] = None
+    company_accounting_standards: Optional[str] = None
+    status_id: Optional[UUID4] = None
+
+    @model_validator(mode="after")
+    def require_criterion(self):
+        # An empty filter would match every company
+        if not any(value is not None for value in self.model_dump().values()):
+            raise ValueError("At least one filter field must be provided")
+        return self
+
+class CompanyBulkUpdate(BaseModel):
+    filter: CompanyFilter
+    update: CompanyUpdate
+    change_reason: Optional[str] = None
+
+    @model_validator(mode="after")
+    def forbid_company_code(self):
+        # Company codes are unique, so one code cannot be applied to many companies
+        if "company_code" in self.update.model_fields_set:
+            raise ValueError("company_code cannot be changed by a bulk update")
+        return self
+
+class CompanyBulkUpdateResponse(BaseModel):
+    updated_count: int
+
+class CompanyStatusTransition(BaseModel):
+    status_id: UUID4
+    status_reason: Optional[str] = None
+    change_reason: Optional[str] = None
 
+class CompanyBulkStatusTransition(CompanyStatusTransition):
+    filter: CompanyFilter
 
 class CompanyResponse(CompanyBase):
     company_id: UUID4
+    current_version: int
+    status_id: Optional[UUID4] = None
+    status_reason: Optional[str] = None
+    status_changed_at: Optional[datetime] = None
     created_at: datetime
     created_by: str
     updated_at: datetime
@@ -40,3 +80,26 @@ class CompanyVersionResponse(CompanyBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+
+class CompanyChangesResponse(BaseModel):
+    """A page of the change feed; pass next_cursor as `since` to continue"""
+    changes: List[CompanyVersionResponse]
+    next_cursor: Optional[str] = None
+    has_more: bool
+
+
+class CompanyDetailResponse(CompanyResponse):
+    """Company with the relationships requested via `include`"""
+    status: Optional[CompanyStatusResponse] = None
+    latest_version: Optional[CompanyVersionResponse] = None
+    versions: Optional[List[CompanyVersionResponse]] = None
+
+class FieldChange(BaseModel):
+    old: Any
+    new: Any
+
+class CompanyVersionDiff(BaseModel):
+    company_id: UUID4
+    from_version: int
+    to_version: int
+    changes: Dict[str, FieldChange]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, UUID4
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from pydantic.config import ConfigDict
 
@@ -7,6 +7,8 @@ class CompanyStatusBase(BaseModel):
     status_code: str
     status_description: Optional[str] = None
     is_active: bool = True
+    # Statuses companies may move to from this one; None allows every active status
+    next_status_ids: Optional[List[UUID4]] = None
 
 class CompanyStatusCreate(CompanyStatusBase):
     pass
@@ -15,6 +17,7 @@ class CompanyStatusUpdate(BaseModel):
     status_code: Optional[str] = None
     status_description: Optional[str] = None
     is_active: Optional[bool] = None
+    next_status_ids: Optional[List[UUID4]] = None
 
 class CompanyStatusResponse(CompanyStatusBase):
     status_id: UUID4
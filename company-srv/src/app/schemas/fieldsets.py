@@ -0,0 +1,43 @@
+from functools import lru_cache
+from typing import List, Optional, Tuple, Type
+from pydantic import BaseModel, TypeAdapter, create_model
+from pydantic.config import ConfigDict
+
+
+def parse_fields(
+    model: Type[BaseModel],
+    fields: Optional[str],
+    always: Tuple[str, ...] = ()
+) -> Optional[Tuple[str, ...]]:
+    """
+    Parse a comma separated `fields` parameter into field names of `model`, in the
+    model's declaration order so equal sets share one cached sparse model. Fields in
+    `always` are added to every fieldset. Raises ValueError for unknown names.
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        raise ValueError("fields must name at least one field")
+    unknown = sorted(requested - model.model_fields.keys())
+    if unknown:
+        raise ValueError(
+            f"Unknown fields {', '.join(unknown)}; allowed: {', '.join(model.model_fields)}"
+        )
+    requested.update(always)
+    return tuple(name for name in model.model_fields if name in requested)
+
+
+@lru_cache(maxsize=256)
+def sparse_model(model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """Response model carrying only `fields` of `model`, built once per fieldset"""
+    return create_model(
+        f"{model.__name__}Sparse",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields}
+    )
+
+
+@lru_cache(maxsize=256)
+def sparse_list_adapter(model: Type[BaseModel], fields: Tuple[str, ...]) -> TypeAdapter:
+    return TypeAdapter(List[sparse_model(model, fields)])
@@ -1,30 +1,91 @@
 from .company_service import (
+    ConcurrencyConflictError,
     create_company,
     get_company,
+    get_company_validator,
     get_companies,
+    company_details,
+    COMPANY_INCLUDES,
+    get_company_as_of,
+    get_companies_as_of,
+    iter_companies,
+    count_companies,
+    build_company_search_query,
+    search_companies,
+    count_search_results,
     get_company_versions,
+    count_company_versions,
+    diff_company_versions,
+    get_company_changes,
+    ChangePosition,
     update_company,
+    bulk_update_companies,
+    transition_company_status,
+    bulk_transition_company_status,
     delete_company,
     restore_company_version
 )
 
+from .count_service import TotalCount, count_total
+
 from .company_status_service import (
+    InvalidStatusTransitionError,
     create_company_status,
     get_company_status,
     get_company_statuses,
     update_company_status_type
 )
 
+from .idempotency_service import (
+    IdempotencyConflictError,
+    IdempotencyKeyMismatchError,
+    IdempotencyClaimLostError,
+    IdempotentResponse,
+    request_fingerprint,
+    begin_idempotent_request,
+    complete_idempotent_request,
+    release_idempotent_request
+)
+
 __all__ = [
+    'ConcurrencyConflictError',
     'create_company',
     'get_company',
+    'get_company_validator',
     'get_companies',
+    'company_details',
+    'COMPANY_INCLUDES',
+    'get_company_as_of',
+    'get_companies_as_of',
+    'iter_companies',
+    'count_companies',
+    'build_company_search_query',
+    'search_companies',
+    'count_search_results',
     'get_company_versions',
+    'count_company_versions',
+    'diff_company_versions',
+    'get_company_changes',
+    'ChangePosition',
     'update_company',
+    'bulk_update_companies',
+    'transition_company_status',
+    'bulk_transition_company_status',
     'delete_company',
     'restore_company_version',
+    'TotalCount',
+    'count_total',
+    'InvalidStatusTransitionError',
     'create_company_status',
     'get_company_status',
     'get_company_statuses',
-    'update_company_status_type'
+    'update_company_status_type',
+    'IdempotencyConflictError',
+    'IdempotencyKeyMismatchError',
+    'IdempotencyClaimLostError',
+    'IdempotentResponse',
+    'request_fingerprint',
+    'begin_idempotent_request',
+    'complete_idempotent_request',
+    'release_idempotent_request'
 ]
\ No newline at end of file
@@ -1,22 +1,60 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
-from datetime import datetime
+from sqlalchemy import and_, desc, func, insert, literal, or_, tuple_, update, String
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy.sql import Select
+from sqlalchemy.orm.exc import StaleDataError
+from datetime import datetime, timezone
 from uuid import UUID
-from typing import List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Collection, Dict, List, Optional, Sequence, Tuple, Union
 from loguru import logger
 
-from app.database import Company, CompanyVersion
-from app.schemas import CompanyCreate, CompanyUpdate
+from app.database import Company, CompanyVersion, CompanyDeletion
+from app.tracing import traced
+from app.schemas import (
+    CompanyCreate,
+    CompanyUpdate,
+    CompanyFilter,
+    CompanyResponse,
+    CompanyStatusResponse,
+    CompanyVersionResponse
+)
+from app.services.count_service import TotalCount, count_total
+from app.services.company_status_service import (
+    InvalidStatusTransitionError,
+    validate_status_transition,
+    status_transition_allowed
+)
+from app.services.version_storage import (
+    VERSIONED_FIELDS,
+    company_state,
+    delta_columns,
+    diff_states,
+    materialize_versions,
+    new_version
+)
 
+
+# Position in the company change feed: (change_txid, change_seq)
+ChangePosition = Tuple[int, int]
+
+
+class ConcurrencyConflictError(Exception):
+    """The company was changed by another writer since the expected version."""
+    pass
+
+@traced()
 async def create_company(
     db: AsyncSession, 
     company_data: CompanyCreate, 
     user_id: str,
-    change_reason: Optional[str] = None
+    change_reason: Optional[str] = None,
+    before_commit: Optional[Callable[[Company], Awaitable[None]]] = None
 ) -> Company:
     """
-    Create a new company and its initial version history record.
+    Create a new company and its initial version history record. before_commit
+    runs with the loaded company inside the creating transaction.
     """
     try:
         # Create main company record
@@ -39,7 +77,12 @@ async def create_company(
             **company_data.dict()
         )
         db.add(version)
-        
+
+        if before_commit is not None:
+            await db.flush()
+            await db.refresh(new_company)
+            await before_commit(new_company)
+
         await db.commit()
         await db.refresh(new_company)
         logger.info(f"Created new company: {new_company.company_id} by user: {user_id}")
@@ -49,14 +92,50 @@ async def create_company(
         logger.error(f"Error creating company: {str(e)}")
         raise
 
-async def get_company(db: AsyncSession, company_id: UUID) -> Optional[Company]:
+# Relationships that can be requested with `include`, each loaded with one
+# extra SELECT ... WHERE company_id IN (...) per page regardless of its size
+COMPANY_INCLUDES = {
+    "status": Company.status,
+    "latest_version": Company.latest_version,
+    "versions": Company.versions
+}
+
+def _include_options(include: Collection[str]) -> list:
+    return [selectinload(COMPANY_INCLUDES[name]) for name in include]
+
+async def _fetch_companies(
+    db: AsyncSession,
+    query: Select,
+    fields: Optional[Sequence[str]]
+) -> List[Union[Company, Dict[str, Any]]]:
     """
-    Retrieve a company by its ID.
+    Run a company query. With fields only those columns are selected and the rows
+    are returned as dicts, skipping entity construction and the identity map.
     """
-    try:
-        query = select(Company).where(Company.company_id == company_id)
+    if fields:
+        query = query.with_only_columns(*(getattr(Company, field) for field in fields))
         result = await db.execute(query)
-        company = result.scalar_one_or_none()
+        return [dict(row._mapping) for row in result]
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+@traced()
+async def get_company(
+    db: AsyncSession,
+    company_id: UUID,
+    include: Collection[str] = (),
+    fields: Optional[Sequence[str]] = None
+) -> Optional[Union[Company, Dict[str, Any]]]:
+    """
+    Retrieve a company by its ID, eager loading the relationships named in include.
+    With fields only those columns are read and a dict is returned.
+    """
+    try:
+        query = select(Company)\
+            .where(Company.company_id == company_id)\
+            .options(*_include_options(include))
+        companies = await _fetch_companies(db, query, fields)
+        company = companies[0] if companies else None
         if company:
             logger.info(f"Retrieved company: {company_id}")
         else:
@@ -66,24 +145,288 @@ async def get_company(db: AsyncSession, company_id: UUID) -> Optional[Company]:
         logger.error(f"Error retrieving company {company_id}: {str(e)}")
         raise
 
+@traced()
+async def get_company_validator(
+    db: AsyncSession,
+    company_id: UUID
+) -> Optional[Tuple[int, datetime]]:
+    """
+    Retrieve the current version number and last modification time of a company
+    without loading the full row. Used to answer conditional requests.
+    """
+    try:
+        query = select(Company.current_version, Company.updated_at)\
+            .where(Company.company_id == company_id)
+        result = await db.execute(query)
+        row = result.one_or_none()
+        if row is None:
+            return None
+        return row[0], row[1]
+    except Exception as e:
+        logger.error(f"Error retrieving validator for company {company_id}: {str(e)}")
+        raise
+
+@traced()
 async def get_companies(
     db: AsyncSession, 
     skip: int = 0, 
-    limit: int = 10
-) -> List[Company]:
+    limit: int = 10,
+    include: Collection[str] = (),
+    fields: Optional[Sequence[str]] = None
+) -> List[Union[Company, Dict[str, Any]]]:
     """
-    Retrieve a list of companies with pagination.
+    Retrieve a list of companies with pagination, eager loading the relationships
+    named in include. With fields only those columns are read and dicts are returned.
     """
     try:
-        query = select(Company).offset(skip).limit(limit)
-        result = await db.execute(query)
-        companies = result.scalars().all()
+        query = select(Company).offset(skip).limit(limit).options(*_include_options(include))
+        companies = await _fetch_companies(db, query, fields)
         logger.info(f"Retrieved {len(companies)} companies")
-        return list(companies)
+        return companies
     except Exception as e:
         logger.error(f"Error retrieving companies: {str(e)}")
         raise
 
+@traced()
+async def company_details(
+    db: AsyncSession,
+    companies: List[Company],
+    include: Collection[str] = ()
+) -> List[Dict[str, Any]]:
+    """
+    Serialize companies with the relationships named in include, which must have
+    been eager loaded. Only loaded relationships are touched, so no lazy load is
+    triggered; delta versions of the whole page are rebuilt with one query.
+    """
+    loaded_versions = []
+    for company in companies:
+        if "latest_version" in include and company.latest_version is not None:
+            loaded_versions.append(company.latest_version)
+        if "versions" in include:
+            loaded_versions.extend(company.versions)
+    rebuilt = {
+        (version.company_id, version.version_number): version
+        for version in await materialize_versions(db, loaded_versions)
+    }
+
+    def version_data(version: CompanyVersion) -> dict:
+        version = rebuilt[(version.company_id, version.version_number)]
+        return CompanyVersionResponse.model_validate(version).model_dump()
+
+    details = []
+    for company in companies:
+        data = CompanyResponse.model_validate(company).model_dump()
+        if "status" in include:
+            data["status"] = CompanyStatusResponse.model_validate(company.status).model_dump() \
+                if company.status is not None else None
+        if "latest_version" in include:
+            data["latest_version"] = version_data(company.latest_version) \
+                if company.latest_version is not None else None
+        if "versions" in include:
+            data["versions"] = [
+                version_data(version)
+                for version in sorted(company.versions, key=lambda v: v.version_number, reverse=True)
+            ]
+        details.append(data)
+    return details
+
+@traced()
+async def count_companies(db: AsyncSession, as_of: Optional[datetime] = None) -> TotalCount:
+    """Total number of companies, optionally at a point in time (exact or estimated, see count_total)."""
+    return await count_total(db, _as_of_query(as_of) if as_of is not None else select(Company))
+
+def _as_of_query(
+    as_of: datetime,
+    company_id: Optional[UUID] = None,
+    after_company_id: Optional[UUID] = None
+) -> Select:
+    """
+    Latest version of each company at `as_of`, picked with DISTINCT ON over the
+    (company_id, changed_at DESC) index, with the creation data of its first
+    version, which deleted companies keep too. Companies whose latest version is
+    a deletion did not exist at that time.
+    """
+    if as_of.tzinfo is None:
+        as_of = as_of.replace(tzinfo=timezone.utc)
+    latest = select(CompanyVersion)\
+        .where(CompanyVersion.changed_at <= as_of)
+    if company_id is not None:
+        latest = latest.where(CompanyVersion.company_id == company_id)
+    if after_company_id is not None:
+        latest = latest.where(CompanyVersion.company_id > after_company_id)
+    latest = latest\
+        .distinct(CompanyVersion.company_id)\
+        .order_by(
+            CompanyVersion.company_id,
+            desc(CompanyVersion.changed_at),
+            desc(CompanyVersion.version_number)
+        )\
+        .subquery("latest_versions")
+    version = aliased(CompanyVersion, latest)
+    created = aliased(CompanyVersion, name="created_versions")
+    return select(version, created.changed_at.label("created_at"), created.changed_by.label("created_by"))\
+        .join(created, and_(created.company_id == version.company_id, created.version_number == 1))\
+        .where(version.change_type != 'DELETE')\
+        .order_by(version.company_id)
+
+async def _as_of_companies(db: AsyncSession, query: Select) -> List[Dict[str, Any]]:
+    """Run an as-of query and shape the versions like CompanyResponse"""
+    rows = (await db.execute(query)).all()
+    versions = await materialize_versions(db, [row[0] for row in rows])
+    return [
+        {
+            **company_state(version),
+            "company_id": version.company_id,
+            "current_version": version.version_number,
+            "created_at": row.created_at,
+            "created_by": row.created_by,
+            "updated_at": version.changed_at,
+            "updated_by": version.changed_by
+        }
+        for version, row in zip(versions, rows)
+    ]
+
+@traced()
+async def get_company_as_of(db: AsyncSession, company_id: UUID, as_of: datetime) -> Optional[Dict[str, Any]]:
+    """
+    Retrieve a company as it was at a point in time.
+    """
+    try:
+        companies = await _as_of_companies(db, _as_of_query(as_of, company_id=company_id))
+        return companies[0] if companies else None
+    except Exception as e:
+        logger.error(f"Error retrieving company {company_id} as of {as_of}: {str(e)}")
+        raise
+
+@traced()
+async def get_companies_as_of(
+    db: AsyncSession,
+    as_of: datetime,
+    skip: int = 0,
+    limit: int = 10
+) -> List[Dict[str, Any]]:
+    """
+    Retrieve a page of companies as they were at a point in time, ordered by id.
+    """
+    try:
+        companies = await _as_of_companies(db, _as_of_query(as_of).offset(skip).limit(limit))
+        logger.info(f"Retrieved {len(companies)} companies as of {as_of}")
+        return companies
+    except Exception as e:
+        logger.error(f"Error retrieving companies as of {as_of}: {str(e)}")
+        raise
+
+async def iter_companies(
+    db: AsyncSession,
+    as_of: Optional[datetime] = None,
+    batch_size: int = 1000
+) -> AsyncIterator[List[Any]]:
+    """
+    Yield all companies (current state, or as of a point in time) in batches ordered
+    by id. Batches are fetched with keyset pagination, so no transaction or cursor
+    is held open between them.
+    """
+    after_company_id = None
+    while True:
+        try:
+            if as_of is not None:
+                batch = await _as_of_companies(
+                    db, _as_of_query(as_of, after_company_id=after_company_id).limit(batch_size)
+                )
+                last_id = batch[-1]["company_id"] if batch else None
+            else:
+                query = select(Company).order_by(Company.company_id).limit(batch_size)
+                if after_company_id is not None:
+                    query = query.where(Company.company_id > after_company_id)
+                batch = list((await db.execute(query)).scalars().all())
+                last_id = batch[-1].company_id if batch else None
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Error exporting companies: {str(e)}")
+            raise
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        after_company_id = last_id
+
+def _company_filter_conditions(company_filter: CompanyFilter, table=Company.__table__) -> list:
+    """Translate a CompanyFilter into WHERE conditions on the companies table"""
+    conditions = []
+    if company_filter.company_ids is not None:
+        conditions.append(table.c.company_id.in_(company_filter.company_ids))
+    if company_filter.company_country is not None:
+        conditions.append(table.c.company_country == company_filter.company_country)
+    if company_filter.company_accounting_standards is not None:
+        conditions.append(table.c.company_accounting_standards == company_filter.company_accounting_standards)
+    if company_filter.status_id is not None:
+        conditions.append(table.c.status_id == company_filter.status_id)
+    return conditions
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input only matches literally (escape character "/")"""
+    return value.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+def build_company_search_query(
+    company_filter: CompanyFilter,
+    name: Optional[str] = None,
+    fuzzy: bool = False,
+    skip: int = 0,
+    limit: int = 10
+) -> Select:
+    """
+    Build the company search query. Equality filters use the B-tree indexes and the
+    name match uses the trigram index: ILIKE for substrings, the pg_trgm similarity
+    operator (%) for fuzzy matches, which are ranked by similarity.
+    """
+    query = select(Company).where(*_company_filter_conditions(company_filter))
+    if name and fuzzy:
+        query = query.where(Company.company_name.op("%")(name))\
+            .order_by(desc(func.similarity(Company.company_name, name)), Company.company_id)
+    else:
+        if name:
+            query = query.where(Company.company_name.ilike(f"%{_escape_like(name)}%", escape="/"))
+        query = query.order_by(Company.company_name, Company.company_id)
+    return query.offset(skip).limit(limit)
+
+@traced()
+async def search_companies(
+    db: AsyncSession,
+    company_filter: CompanyFilter,
+    name: Optional[str] = None,
+    fuzzy: bool = False,
+    skip: int = 0,
+    limit: int = 10,
+    include: Collection[str] = (),
+    fields: Optional[Sequence[str]] = None
+) -> List[Union[Company, Dict[str, Any]]]:
+    """
+    Search companies by country, accounting standards, status and name.
+    With fields only those columns are read and dicts are returned.
+    """
+    try:
+        query = build_company_search_query(company_filter, name, fuzzy, skip, limit)\
+            .options(*_include_options(include))
+        companies = await _fetch_companies(db, query, fields)
+        logger.info(f"Search returned {len(companies)} companies")
+        return companies
+    except Exception as e:
+        logger.error(f"Error searching companies: {str(e)}")
+        raise
+
+@traced()
+async def count_search_results(
+    db: AsyncSession,
+    company_filter: CompanyFilter,
+    name: Optional[str] = None,
+    fuzzy: bool = False
+) -> TotalCount:
+    """Total number of companies matching a search (exact or estimated, see count_total)."""
+    return await count_total(db, build_company_search_query(company_filter, name, fuzzy))
+
+@traced()
 async def get_company_versions(
     db: AsyncSession, 
     company_id: UUID,
@@ -100,13 +443,94 @@ async def get_company_versions(
             .offset(skip)\
             .limit(limit)
         result = await db.execute(query)
-        versions = result.scalars().all()
+        versions = await materialize_versions(db, list(result.scalars().all()))
         logger.info(f"Retrieved {len(versions)} versions for company: {company_id}")
-        return list(versions)
+        return versions
     except Exception as e:
         logger.error(f"Error retrieving company versions: {str(e)}")
         raise
 
+@traced()
+async def get_company_changes(
+    db: AsyncSession,
+    after: Optional[ChangePosition],
+    limit: int = 100
+) -> Tuple[List[Union[CompanyVersion, CompanyDeletion]], Optional[ChangePosition]]:
+    """
+    Company versions and deletions recorded after the feed position `after`, in
+    feed order, with the position of the last one. Only changes of transactions
+    older than every transaction still running are returned, so a change that
+    commits later can never land behind a position already handed out.
+    """
+    try:
+        changes = []
+        for model in (CompanyVersion, CompanyDeletion):
+            query = select(model)\
+                .where(or_(
+                    model.change_txid < func.txid_snapshot_xmin(func.txid_current_snapshot()),
+                    # A transaction sees its own changes
+                    model.change_txid == func.txid_current_if_assigned()
+                ))\
+                .order_by(model.change_txid, model.change_seq)\
+                .limit(limit)
+            if after is not None:
+                query = query.where(tuple_(model.change_txid, model.change_seq) > tuple_(*after))
+            result = await db.execute(query)
+            changes.extend(result.scalars().all())
+        changes.sort(key=lambda change: (change.change_txid, change.change_seq))
+        changes = changes[:limit]
+        if not changes:
+            return [], after
+
+        versions = [change for change in changes if isinstance(change, CompanyVersion)]
+        rebuilt = dict(zip(map(id, versions), await materialize_versions(db, versions)))
+        last = changes[-1]
+        logger.info(f"Retrieved {len(changes)} company changes after position {after}")
+        return [rebuilt.get(id(change), change) for change in changes], (last.change_txid, last.change_seq)
+    except Exception as e:
+        logger.error(f"Error retrieving company changes: {str(e)}")
+        raise
+
+@traced()
+async def diff_company_versions(
+    db: AsyncSession,
+    company_id: UUID,
+    from_version: int,
+    to_version: int
+) -> Optional[dict]:
+    """
+    Field-level differences of a company between two versions, or None if either
+    version does not exist.
+    """
+    try:
+        query = select(CompanyVersion)\
+            .where(
+                CompanyVersion.company_id == company_id,
+                CompanyVersion.version_number.in_([from_version, to_version])
+            )
+        result = await db.execute(query)
+        versions = {v.version_number: v for v in await materialize_versions(db, list(result.scalars().all()))}
+        if from_version not in versions or to_version not in versions:
+            return None
+        old, new = (company_state(versions[n]) for n in (from_version, to_version))
+        return {
+            "company_id": company_id,
+            "from_version": from_version,
+            "to_version": to_version,
+            "changes": diff_states(old, new)
+        }
+    except Exception as e:
+        logger.error(f"Error comparing company versions: {str(e)}")
+        raise
+
+@traced()
+async def count_company_versions(db: AsyncSession, company_id: UUID) -> TotalCount:
+    """Total number of versions of a company (exact or estimated, see count_total)."""
+    return await count_total(
+        db, select(CompanyVersion).where(CompanyVersion.company_id == company_id)
+    )
+
+@traced()
 async def get_latest_version_number(
     db: AsyncSession, 
     company_id: UUID
@@ -126,22 +550,38 @@ async def get_latest_version_number(
         logger.error(f"Error getting latest version number: {str(e)}")
         raise
 
+def _check_expected_version(company: Company, expected_version: Optional[int]):
+    if expected_version is not None and company.current_version != expected_version:
+        logger.warning(
+            f"Version mismatch for company {company.company_id}: "
+            f"expected {expected_version}, current {company.current_version}"
+        )
+        raise ConcurrencyConflictError(
+            f"Company {company.company_id} is at version {company.current_version}, "
+            f"expected {expected_version}"
+        )
+
+@traced()
 async def update_company(
     db: AsyncSession, 
     company_id: UUID, 
     update_data: CompanyUpdate,
     user_id: str,
-    change_reason: Optional[str] = None
+    change_reason: Optional[str] = None,
+    expected_version: Optional[int] = None
 ) -> Optional[Company]:
     """
     Update a company and create a new version history record.
     Only updates fields that are explicitly provided (not None).
+    If expected_version is given, the update only applies to that version.
+    Raises ConcurrencyConflictError when another writer changed the company first.
     """
     try:
         # Get current company
         company = await get_company(db, company_id)
         if not company:
             return None
+        _check_expected_version(company, expected_version)
 
         # Filter out None values and empty strings from the update data
         update_dict = {
@@ -153,23 +593,22 @@ async def update_company(
             raise ValueError("At least one non-empty field must be provided for update")
 
         # Update only the provided fields
+        previous_state = company_state(company)
         for key, value in update_dict.items():
             setattr(company, key, value)
         company.updated_by = user_id
         
-        
-        # Create new version record
-        next_version = await get_latest_version_number(db, company_id) + 1
-        version = CompanyVersion(
+        # Create new version record; the conditional UPDATE of the company
+        # guarantees no one else wrote this version number in the meantime
+        next_version = company.current_version + 1
+        version = new_version(
+            company,
+            next_version,
+            previous_state,
             company_id=company_id,
-            version_number=next_version,
             changed_by=user_id,
             change_type='UPDATE',
-            change_reason=change_reason,
-            company_code=company.company_code,
-            company_name=company.company_name,
-            company_country=company.company_country,
-            company_accounting_standards=company.company_accounting_standards
+            change_reason=change_reason
         )
         db.add(version)
         
@@ -177,11 +616,222 @@ async def update_company(
         await db.refresh(company)
         logger.info(f"Updated company: {company_id} by user: {user_id}")
         return company
+    except StaleDataError:
+        await db.rollback()
+        logger.warning(f"Concurrent update of company {company_id} detected")
+        raise ConcurrencyConflictError(f"Company {company_id} was modified concurrently")
+    except ConcurrencyConflictError:
+        raise
     except Exception as e:
         await db.rollback()
         logger.error(f"Error updating company: {str(e)}")
         raise
 
+def _versioned_bulk_update(
+    conditions: list,
+    values: Dict[str, Any],
+    user_id: str,
+    change_type: str,
+    change_reason: Optional[str]
+) -> Select:
+    """
+    Single statement that applies `values` to every company matching `conditions`
+    (UPDATE ... RETURNING) and writes one version per updated company from it
+    (INSERT ... SELECT). Selects the company_id and new version_number of every
+    updated company.
+    """
+    companies = Company.__table__
+    versions = CompanyVersion.__table__
+    # Bumping current_version keeps concurrent single-company writers honest:
+    # their versioned UPDATE no longer matches and they get a conflict
+    updated = update(companies)\
+        .where(*conditions)\
+        .values(**values, updated_by=user_id, current_version=companies.c.current_version + 1)\
+        .returning(
+            companies.c.company_id,
+            companies.c.current_version,
+            companies.c.company_code,
+            companies.c.company_name,
+            companies.c.company_country,
+            companies.c.company_accounting_standards,
+            companies.c.status_id,
+            companies.c.status_reason
+        )\
+        .cte("updated_companies")
+    # Full state or, between snapshots in delta mode, just the updated fields
+    changes = {field: value for field, value in values.items() if field in VERSIONED_FIELDS}
+    state_columns = delta_columns(updated, changes)
+    inserted = insert(versions)\
+        .from_select(
+            [
+                versions.c.version_id,
+                versions.c.company_id,
+                versions.c.version_number,
+                *(versions.c[name] for name in state_columns),
+                versions.c.changed_by,
+                versions.c.change_type,
+                versions.c.change_reason
+            ],
+            select(
+                func.gen_random_uuid(),
+                updated.c.company_id,
+                updated.c.current_version,
+                *state_columns.values(),
+                literal(user_id, String),
+                literal(change_type, String),
+                literal(change_reason, String)
+            )
+        )\
+        .returning(versions.c.company_id, versions.c.version_number)\
+        .cte("inserted_versions")
+    return select(inserted.c.company_id, inserted.c.version_number)
+
+@traced()
+async def bulk_update_companies(
+    db: AsyncSession,
+    company_filter: CompanyFilter,
+    update_data: CompanyUpdate,
+    user_id: str,
+    change_reason: Optional[str] = None
+) -> List[Row]:
+    """
+    Apply the same update to every company matching the filter and record a version
+    for each of them. Runs as a single statement (UPDATE ... RETURNING feeding an
+    INSERT ... SELECT) in one transaction. Returns (company_id, version_number) of
+    each updated company.
+    """
+    try:
+        update_dict = {
+            k: v for k, v in update_data.model_dump(exclude_unset=True).items()
+            if v is not None and v != ""
+        }
+        if not update_dict:
+            raise ValueError("At least one non-empty field must be provided for update")
+
+        statement = _versioned_bulk_update(
+            _company_filter_conditions(company_filter),
+            update_dict,
+            user_id,
+            'UPDATE',
+            change_reason
+        )
+        result = await db.execute(statement)
+        updated = list(result.all())
+        await db.commit()
+        logger.info(f"Bulk updated {len(updated)} companies by user: {user_id}")
+        return updated
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error bulk updating companies: {str(e)}")
+        raise
+
+@traced()
+async def transition_company_status(
+    db: AsyncSession,
+    company_id: UUID,
+    status_id: UUID,
+    user_id: str,
+    status_reason: Optional[str] = None,
+    change_reason: Optional[str] = None,
+    expected_version: Optional[int] = None
+) -> Optional[Company]:
+    """
+    Move a company to another status and record the change as a new version.
+    Raises InvalidStatusTransitionError if the status is unknown, inactive,
+    already the company's status or may not follow its current status.
+    """
+    try:
+        company = await get_company(db, company_id)
+        if not company:
+            return None
+        _check_expected_version(company, expected_version)
+        if company.status_id == status_id:
+            raise InvalidStatusTransitionError(f"Company {company_id} already has status {status_id}")
+        await validate_status_transition(db, status_id, company.status_id)
+
+        # The status rules are checked again by the UPDATE itself: the cached
+        # ones may predate a status being deactivated in another worker
+        companies = Company.__table__
+        statement = _versioned_bulk_update(
+            [
+                companies.c.company_id == company_id,
+                companies.c.current_version == company.current_version,
+                status_transition_allowed(status_id, companies.c.status_id)
+            ],
+            {
+                "status_id": status_id,
+                "status_reason": status_reason,
+                "status_changed_at": func.now()
+            },
+            user_id,
+            'STATUS',
+            change_reason
+        )
+        result = await db.execute(statement)
+        if not result.all():
+            await db.rollback()
+            # Tell outdated status rules apart from a concurrent company update
+            await validate_status_transition(db, status_id, company.status_id, reload=True)
+            logger.warning(f"Concurrent update of company {company_id} during status change detected")
+            raise ConcurrencyConflictError(f"Company {company_id} was modified concurrently")
+
+        await db.commit()
+        await db.refresh(company)
+        logger.info(f"Changed status of company {company_id} to {status_id} by user: {user_id}")
+        return company
+    except (ConcurrencyConflictError, InvalidStatusTransitionError):
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error changing company status: {str(e)}")
+        raise
+
+@traced()
+async def bulk_transition_company_status(
+    db: AsyncSession,
+    company_filter: CompanyFilter,
+    status_id: UUID,
+    user_id: str,
+    status_reason: Optional[str] = None,
+    change_reason: Optional[str] = None
+) -> List[Row]:
+    """
+    Move every company matching the filter to a status in one transaction, with
+    one version per affected company. Companies already in the status, or in one
+    the status may not follow, are left alone. Returns (company_id,
+    version_number) of each company that changed status.
+    """
+    try:
+        await validate_status_transition(db, status_id)
+        companies = Company.__table__
+        statement = _versioned_bulk_update(
+            [
+                *_company_filter_conditions(company_filter),
+                companies.c.status_id.is_distinct_from(status_id),
+                status_transition_allowed(status_id, companies.c.status_id)
+            ],
+            {
+                "status_id": status_id,
+                "status_reason": status_reason,
+                "status_changed_at": func.now()
+            },
+            user_id,
+            'STATUS',
+            change_reason
+        )
+        result = await db.execute(statement)
+        updated = list(result.all())
+        await db.commit()
+        logger.info(f"Changed status of {len(updated)} companies to {status_id} by user: {user_id}")
+        return updated
+    except InvalidStatusTransitionError:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error bulk changing company status: {str(e)}")
+        raise
+
+@traced()
 async def delete_company(
     db: AsyncSession, 
     company_id: UUID,
@@ -189,8 +839,8 @@ async def delete_company(
     change_reason: Optional[str] = None
 ) -> Optional[Company]:
     """
-    Delete a company and all its version history records.
-    Creates a final version record before deletion for audit purposes.
+    Delete a company. Its version history is kept and ends in a DELETE version,
+    so point-in-time reads before the deletion and the change feed still see it.
     """
     try:
         # Get current company
@@ -198,53 +848,44 @@ async def delete_company(
         if not company:
             return None
 
-        # Create final version record indicating deletion
-        next_version = await get_latest_version_number(db, company_id) + 1
-        final_version = CompanyVersion(
+        # Final version record indicating deletion
+        db.add(new_version(
+            company,
+            company.current_version + 1,
+            company_state(company),
             company_id=company_id,
-            version_number=next_version,
             changed_by=user_id,
             change_type='DELETE',
-            change_reason=change_reason,
-            company_code=company.company_code,
-            company_name=company.company_name,
-            company_country=company.company_country,
-            company_accounting_standards=company.company_accounting_standards
-        )
-        
-        # First add the final version
-        db.add(final_version)
-        await db.flush()  # Ensure the final version is in the session
-        
-        # Delete all version records
-        delete_versions_query = select(CompanyVersion).where(
-            CompanyVersion.company_id == company_id
-        )
-        versions = (await db.execute(delete_versions_query)).scalars().all()
-        for version in versions:
-            await db.delete(version)
-        
-        # Now delete the company
+            change_reason=change_reason
+        ))
+
+        # Only the company row goes; the ORM leaves its versions alone
         await db.delete(company)
-        
-        # Commit all changes
         await db.commit()
-        logger.info(f"Deleted company: {company_id} and all its versions by user: {user_id}")
+        logger.info(f"Deleted company: {company_id} by user: {user_id}")
         return company
+    except StaleDataError:
+        await db.rollback()
+        logger.warning(f"Concurrent modification of company {company_id} during delete detected")
+        raise ConcurrencyConflictError(f"Company {company_id} was modified concurrently")
     except Exception as e:
         await db.rollback()
         logger.error(f"Error deleting company: {str(e)}")
         raise
 
+@traced()
 async def restore_company_version(
     db: AsyncSession,
     company_id: UUID,
     version_number: int,
     user_id: str,
-    change_reason: Optional[str] = None
+    change_reason: Optional[str] = None,
+    expected_version: Optional[int] = None
 ) -> Optional[Company]:
     """
     Restore a company to a specific version.
+    If expected_version is given, the restore only applies to that version.
+    Raises ConcurrencyConflictError when another writer changed the company first.
     """
     try:
         # Get the specified version
@@ -259,12 +900,24 @@ async def restore_company_version(
         if not version:
             logger.warning(f"Version {version_number} not found for company {company_id}")
             return None
+        [version] = await materialize_versions(db, [version])
             
-        # Get current company or create new if it was deleted
+        # Get current company or recreate it if it was deleted; its history
+        # continues after the DELETE version
         company = await get_company(db, company_id)
-        if not company:
-            company = Company(company_id=company_id)
+        if company:
+            _check_expected_version(company, expected_version)
+            next_version = company.current_version + 1
+            previous_state = company_state(company)
+        else:
+            if expected_version is not None:
+                raise ConcurrencyConflictError(f"Company {company_id} no longer exists")
+            company = Company(company_id=company_id, created_by=user_id)
             db.add(company)
+            next_version = await get_latest_version_number(db, company_id) + 1
+            # Keep the row version in step with the version history
+            company.current_version = next_version
+            previous_state = None
         
         # Restore the company data from the version
         company.company_code = version.company_code
@@ -274,24 +927,27 @@ async def restore_company_version(
         company.updated_by = user_id
         
         # Create new version record for the restoration
-        next_version = await get_latest_version_number(db, company_id) + 1
-        new_version = CompanyVersion(
+        restored_version = new_version(
+            company,
+            next_version,
+            previous_state,
             company_id=company_id,
-            version_number=next_version,
             changed_by=user_id,
             change_type='RESTORE',
-            change_reason=f"Restored to version {version_number}. {change_reason or ''}",
-            company_code=version.company_code,
-            company_name=version.company_name,
-            company_country=version.company_country,
-            company_accounting_standards=version.company_accounting_standards
+            change_reason=f"Restored to version {version_number}. {change_reason or ''}"
         )
-        db.add(new_version)
+        db.add(restored_version)
         
         await db.commit()
         await db.refresh(company)
         logger.info(f"Restored company {company_id} to version {version_number} by user: {user_id}")
         return company
+    except StaleDataError:
+        await db.rollback()
+        logger.warning(f"Concurrent update of company {company_id} during restore detected")
+        raise ConcurrencyConflictError(f"Company {company_id} was modified concurrently")
+    except ConcurrencyConflictError:
+        raise
     except Exception as e:
         await db.rollback()
         logger.error(f"Error restoring company version: {str(e)}")
@@ -1,14 +1,113 @@
+import os
+import time
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
+from sqlalchemy import desc, exists, and_, or_
+from sqlalchemy.sql.elements import ColumnElement
 from datetime import datetime
 from uuid import UUID
-from typing import List, Optional
+from typing import Dict, List, Optional
 from loguru import logger
 
 from app.database import CompanyStatus
 from app.schemas import CompanyStatusCreate, CompanyStatusUpdate
 
+# How long the status table is cached per worker for transition checks
+COMPANY_STATUS_CACHE_TTL = float(os.getenv("COMPANY_STATUS_CACHE_TTL", "60"))
+
+
+class InvalidStatusTransitionError(Exception):
+    """The target status does not exist, is inactive, is already set or may not follow the current one."""
+    pass
+
+
+class StatusCache:
+    """
+    All company statuses keyed by id (status code, active flag and the statuses
+    that may follow), reloaded with
+    one query when older than the TTL. Status types rarely change, so transitions
+    do not need to query them per request.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._statuses: Dict[UUID, Dict] = {}
+        self._loaded_at: Optional[float] = None
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def get(self, db: AsyncSession, status_id: UUID) -> Optional[Dict]:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+            result = await db.execute(
+                select(
+                    CompanyStatus.status_id,
+                    CompanyStatus.status_code,
+                    CompanyStatus.is_active,
+                    CompanyStatus.next_status_ids
+                )
+            )
+            self._statuses = {
+                row.status_id: {
+                    "status_code": row.status_code,
+                    "is_active": row.is_active,
+                    "next_status_ids": row.next_status_ids
+                }
+                for row in result
+            }
+            self._loaded_at = time.monotonic()
+            logger.debug(f"Loaded {len(self._statuses)} company statuses into cache")
+        return self._statuses.get(status_id)
+
+
+status_cache = StatusCache(COMPANY_STATUS_CACHE_TTL)
+
+
+async def validate_status_transition(
+    db: AsyncSession,
+    status_id: UUID,
+    from_status_id: Optional[UUID] = None,
+    reload: bool = False
+):
+    """
+    Check that companies may be moved to the status, from from_status_id when
+    given, using the status cache (reloaded first with reload). The cache of each
+    worker can lag behind status changes by up to its TTL, so writes also apply
+    status_transition_allowed.
+    """
+    if reload:
+        status_cache.invalidate()
+    status = await status_cache.get(db, status_id)
+    if status is None:
+        raise InvalidStatusTransitionError(f"Status {status_id} does not exist")
+    if not status["is_active"]:
+        raise InvalidStatusTransitionError(f"Status {status['status_code']} is not active")
+    current = await status_cache.get(db, from_status_id) if from_status_id is not None else None
+    if current is not None and current["next_status_ids"] is not None and status_id not in current["next_status_ids"]:
+        raise InvalidStatusTransitionError(
+            f"Companies in status {current['status_code']} cannot move to status {status['status_code']}"
+        )
+
+
+def status_transition_allowed(status_id: UUID, current_status_id: ColumnElement) -> ColumnElement:
+    """
+    Condition for UPDATEs of companies, given their status_id column, that holds
+    when the target status is active and their current status allows moving to
+    it, as of the statement rather than the status cache.
+    """
+    statuses = CompanyStatus.__table__
+    target = statuses.alias("target_status")
+    current = statuses.alias("current_status")
+    target_active = exists().where(target.c.status_id == status_id, target.c.is_active)
+    allowed_from_current = or_(
+        current_status_id.is_(None),
+        exists().where(
+            current.c.status_id == current_status_id,
+            or_(current.c.next_status_ids.is_(None), current.c.next_status_ids.contains([status_id]))
+        )
+    )
+    return and_(target_active, allowed_from_current)
+
 
 # In services.py
 async def create_company_status(
@@ -26,6 +125,7 @@ async def create_company_status(
         db.add(new_status)
         await db.commit()
         await db.refresh(new_status)
+        status_cache.invalidate()
         return new_status
     except Exception as e:
         await db.rollback()
@@ -69,4 +169,5 @@ async def update_company_status_type(
     
     await db.commit()
     await db.refresh(status)
+    status_cache.invalidate()
     return status
\ No newline at end of file
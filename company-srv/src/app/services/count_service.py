@@ -0,0 +1,138 @@
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql.base import PGDialect
+from sqlalchemy.engine.interfaces import BindTyping
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.sql import Select
+from loguru import logger
+
+# Result sets estimated above this size get the planner estimate instead of an exact COUNT(*)
+COUNT_EXACT_THRESHOLD = int(os.getenv("COUNT_EXACT_THRESHOLD", "10000"))
+# How long exact counts are reused for the same filter
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv("COUNT_CACHE_MAX_ENTRIES", "1000"))
+
+
+@dataclass
+class TotalCount:
+    value: int
+    estimated: bool
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "X-Total-Count": str(self.value),
+            "X-Total-Count-Estimated": "true" if self.estimated else "false"
+        }
+
+
+class CountCache:
+    """Exact counts per filter, kept for a short time per worker process."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, int]] = {}
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: str, value: int):
+        now = time.monotonic()
+        if len(self._entries) >= self.max_entries:
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            if len(self._entries) >= self.max_entries:
+                # Still full of live entries: drop the oldest one
+                self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (now + self.ttl, value)
+
+
+count_cache = CountCache(COUNT_CACHE_TTL, COUNT_CACHE_MAX_ENTRIES)
+
+
+class _TextDialect(PGDialect):
+    # Named binds without inline casts (":id::UUID" would not parse as text())
+    bind_typing = BindTyping.NONE
+
+
+_text_dialect = _TextDialect(paramstyle="named")
+
+
+def _unpaginated(query: Select) -> Select:
+    return query.order_by(None).limit(None).offset(None)
+
+
+def compile_with_params(
+    query: Select,
+    schema_translate_map: Optional[Dict[Optional[str], Optional[str]]] = None
+) -> Tuple[str, Dict[str, Any]]:
+    """SQL of the query with named binds, and the values of those binds"""
+    compiled = query.compile(
+        dialect=_text_dialect,
+        # text() is not translated when executed, so the schemas are rendered here
+        schema_translate_map=schema_translate_map,
+        render_schema_translate=bool(schema_translate_map),
+        compile_kwargs={"render_postcompile": True}
+    )
+    return str(compiled), compiled.params
+
+
+def _schema_translate_map(conn: AsyncConnection) -> Optional[Dict[Optional[str], Optional[str]]]:
+    return conn.sync_connection.get_execution_options().get("schema_translate_map")
+
+
+async def explain_plan(conn: AsyncConnection, query: Select) -> Dict[str, Any]:
+    """Top plan node of EXPLAIN (FORMAT JSON); the filter values stay bind parameters"""
+    sql, params = compile_with_params(query, _schema_translate_map(conn))
+    result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params)
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+async def _estimate_rows(db: AsyncSession, query: Select) -> int:
+    """Row estimate of the planner (based on reltuples and column statistics)"""
+    plan = await explain_plan(await db.connection(), query)
+    return int(plan["Plan Rows"])
+
+
+async def count_total(db: AsyncSession, query: Select) -> TotalCount:
+    """
+    Total number of rows a paginated query would return without LIMIT/OFFSET.
+    Small results are counted exactly and cached for COUNT_CACHE_TTL seconds;
+    results the planner estimates above COUNT_EXACT_THRESHOLD rows return the estimate.
+    """
+    try:
+        base = _unpaginated(query)
+        conn = await db.connection()
+        # The statement and its parameters identify the filter
+        sql, params = compile_with_params(base, _schema_translate_map(conn))
+        key = f"{sql}\n{sorted(params.items())!r}"
+
+        cached = count_cache.get(key)
+        if cached is not None:
+            return TotalCount(cached, estimated=False)
+
+        estimate = await _estimate_rows(db, base)
+        if estimate > COUNT_EXACT_THRESHOLD:
+            logger.debug(f"Using planner estimate of {estimate} rows")
+            return TotalCount(estimate, estimated=True)
+
+        result = await db.execute(select(func.count()).select_from(base.subquery()))
+        exact = result.scalar_one()
+        count_cache.set(key, exact)
+        return TotalCount(exact, estimated=False)
+    except Exception as e:
+        logger.error(f"Error counting rows: {str(e)}")
+        raise
@@ -0,0 +1,199 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+from sqlalchemy import and_, case, func, literal, null, or_, select, JSON
+from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+
+from app.database import Company, CompanyVersion
+
+# "full" stores the complete company state on every version; "delta" stores a full
+# snapshot every VERSION_SNAPSHOT_INTERVAL versions and only changed fields in between
+VERSION_STORAGE_MODE = os.getenv("VERSION_STORAGE_MODE", "full").lower()
+VERSION_SNAPSHOT_INTERVAL = int(os.getenv("VERSION_SNAPSHOT_INTERVAL", "20"))
+
+# Company fields recorded in the version history
+VERSIONED_FIELDS = (
+    "company_code",
+    "company_name",
+    "company_country",
+    "company_accounting_standards",
+    "status_id",
+    "status_reason"
+)
+
+State = Dict[str, Any]
+
+
+def is_snapshot_version(version_number: int) -> bool:
+    """Versions 1, 1 + interval, 1 + 2 * interval, ... are full snapshots in delta mode"""
+    if VERSION_STORAGE_MODE != "delta" or VERSION_SNAPSHOT_INTERVAL <= 1:
+        return True
+    return (version_number - 1) % VERSION_SNAPSHOT_INTERVAL == 0
+
+
+def snapshot_condition(version_number):
+    """SQL counterpart of is_snapshot_version for set-based version inserts"""
+    if VERSION_STORAGE_MODE != "delta" or VERSION_SNAPSHOT_INTERVAL <= 1:
+        return literal(True)
+    return (version_number - 1) % VERSION_SNAPSHOT_INTERVAL == 0
+
+
+def company_state(company: Company) -> State:
+    return {field: getattr(company, field) for field in VERSIONED_FIELDS}
+
+
+def _encode(value: Any) -> Any:
+    return str(value) if isinstance(value, UUID) else value
+
+
+def _decode_changes(changes: Optional[dict]) -> State:
+    state = dict(changes or {})
+    if state.get("status_id") is not None:
+        state["status_id"] = UUID(state["status_id"])
+    return state
+
+
+def encode_changes(changes: State) -> dict:
+    return {field: _encode(value) for field, value in changes.items()}
+
+
+def delta_columns(updated, changes: State) -> Dict[str, Any]:
+    """
+    Version column values for rows inserted with INSERT ... SELECT from `updated`
+    (a CTE returning company rows) when every row received the same `changes`.
+    """
+    if VERSION_STORAGE_MODE != "delta" or VERSION_SNAPSHOT_INTERVAL <= 1:
+        columns = {"is_snapshot": literal(True), "changes": null()}
+        columns.update((field, updated.c[field]) for field in VERSIONED_FIELDS)
+        return columns
+
+    snapshot = snapshot_condition(updated.c.current_version)
+    columns = {
+        "is_snapshot": snapshot,
+        "changes": case((snapshot, null()), else_=literal(encode_changes(changes), JSON))
+    }
+    for field in VERSIONED_FIELDS:
+        columns[field] = case((snapshot, updated.c[field]), else_=None)
+    return columns
+
+
+def new_version(
+    company: Company,
+    version_number: int,
+    previous_state: Optional[State],
+    **metadata
+) -> CompanyVersion:
+    """
+    Build the version record for the current state of `company`. Outside of
+    snapshot versions only the fields that differ from `previous_state` are stored.
+    """
+    values = {"company_id": company.company_id, "version_number": version_number, **metadata}
+    state = company_state(company)
+    if previous_state is None or is_snapshot_version(version_number):
+        return CompanyVersion(is_snapshot=True, **state, **values)
+    changes = {
+        field: value for field, value in state.items()
+        if previous_state.get(field) != value
+    }
+    return CompanyVersion(is_snapshot=False, changes=encode_changes(changes), **values)
+
+
+def _is_delta(version: CompanyVersion) -> bool:
+    # Records built in memory before a flush have is_snapshot unset; only deltas set False
+    return version.is_snapshot is False
+
+
+def _with_state(version: CompanyVersion, state: State) -> CompanyVersion:
+    """Detached copy of a delta version carrying the rebuilt state"""
+    values = {column.key: getattr(version, column.key) for column in CompanyVersion.__table__.columns}
+    values.update(state)
+    return CompanyVersion(**values)
+
+
+async def rebuild_states(
+    db: AsyncSession,
+    bounds: Dict[UUID, Tuple[int, int]]
+) -> Dict[Tuple[UUID, int], State]:
+    """
+    Rebuild the full state of the versions lo..hi of each company in `bounds`,
+    replaying deltas from the latest snapshot at or before lo. Companies are
+    fetched in a single query.
+    """
+    clauses = []
+    for company_id, (lo, hi) in bounds.items():
+        base = select(func.max(CompanyVersion.version_number))\
+            .where(
+                CompanyVersion.company_id == company_id,
+                CompanyVersion.is_snapshot.is_(True),
+                CompanyVersion.version_number <= lo
+            )\
+            .scalar_subquery()
+        clauses.append(and_(
+            CompanyVersion.company_id == company_id,
+            CompanyVersion.version_number >= base,
+            CompanyVersion.version_number <= hi
+        ))
+    query = select(
+        CompanyVersion.company_id,
+        CompanyVersion.version_number,
+        CompanyVersion.is_snapshot,
+        CompanyVersion.changes,
+        *(getattr(CompanyVersion, field) for field in VERSIONED_FIELDS)
+    ).where(or_(*clauses)).order_by(CompanyVersion.company_id, CompanyVersion.version_number)
+    result = await db.execute(query)
+
+    states: Dict[Tuple[UUID, int], State] = {}
+    current: Dict[UUID, State] = {}
+    for row in result:
+        if row.is_snapshot:
+            state = {field: getattr(row, field) for field in VERSIONED_FIELDS}
+        elif row.company_id in current:
+            state = {**current[row.company_id], **_decode_changes(row.changes)}
+        else:
+            continue
+        current[row.company_id] = state
+        states[(row.company_id, row.version_number)] = state
+    return states
+
+
+async def materialize_versions(db: AsyncSession, versions: List[CompanyVersion]) -> List[CompanyVersion]:
+    """
+    Return the versions with their full company state, in the given order. Snapshot
+    versions are returned as they are, delta versions as rebuilt detached copies, so
+    the records loaded into the session are never modified. Versions may belong to
+    different companies.
+    """
+    bounds: Dict[UUID, Tuple[int, int]] = {}
+    for version in versions:
+        if _is_delta(version):
+            lo, hi = bounds.get(version.company_id, (version.version_number, version.version_number))
+            bounds[version.company_id] = (min(lo, version.version_number), max(hi, version.version_number))
+    if not bounds:
+        return list(versions)
+
+    states = await rebuild_states(db, bounds)
+    materialized = []
+    for version in versions:
+        if not _is_delta(version):
+            materialized.append(version)
+            continue
+        state = states.get((version.company_id, version.version_number))
+        if state is None:
+            logger.error(
+                f"No snapshot found for version {version.version_number} of company {version.company_id}"
+            )
+            raise RuntimeError(
+                f"Cannot rebuild version {version.version_number} of company {version.company_id}"
+            )
+        materialized.append(_with_state(version, state))
+    return materialized
+
+
+def diff_states(old: State, new: State) -> Dict[str, Dict[str, Any]]:
+    """Field-level differences between two company states"""
+    return {
+        field: {"old": old.get(field), "new": new.get(field)}
+        for field in VERSIONED_FIELDS
+        if old.get(field) != new.get(field)
+    }
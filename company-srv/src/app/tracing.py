@@ -0,0 +1,127 @@
+import os
+import threading
+from functools import wraps
+from typing import Any, Iterable, Optional, Sequence
+
+from fastapi import FastAPI
+from loguru import logger
+from opentelemetry import trace
+from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Spans are only recorded with TRACING_ENABLED=true; the W3C traceparent header
+# carries the trace across services (sampling follows OTEL_TRACES_SAMPLER)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+# "file" appends spans as JSON lines to TRACING_FILE, for offline use; "otlp"
+# sends them to OTEL_EXPORTER_OTLP_ENDPOINT (http/protobuf, e.g. a collector)
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces/spans.jsonl")
+# Comma-separated path patterns without spans
+TRACING_EXCLUDED_URLS = os.getenv("TRACING_EXCLUDED_URLS", "/metrics/.*,/admin/.*")
+# Appends the traceparent to each SQL statement as a comment, so Postgres logs
+# and pg_stat_activity show the trace. Off by default: every statement text
+# becomes unique, which defeats asyncpg's prepared statement cache.
+TRACING_SQL_COMMENTER = os.getenv("TRACING_SQL_COMMENTER", "false").lower() == "true"
+
+tracer = trace.get_tracer(__name__)
+_tracer_provider: Optional[TracerProvider] = None
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends finished spans to a file as JSON lines, one span per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._lock, open(self.path, "a", encoding="utf-8") as spans_file:
+                spans_file.write(lines)
+        except OSError as e:
+            logger.error(f"Failed to write spans to {self.path}: {str(e)}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def span_exporter() -> SpanExporter:
+    if TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    if TRACING_EXPORTER != "file":
+        raise RuntimeError(f"Unknown TRACING_EXPORTER '{TRACING_EXPORTER}', expected 'file' or 'otlp'")
+    return FileSpanExporter(TRACING_FILE)
+
+
+def traced(name: Optional[str] = None):
+    """Run the decorated coroutine function in a span, named after it by default"""
+    def decorator(function):
+        span_name = name or f"{function.__module__.rsplit('.', 1)[-1]}.{function.__name__}"
+
+        @wraps(function)
+        async def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(span_name):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def setup_tracing(
+    app: FastAPI,
+    service_name: str,
+    engines: Iterable[AsyncEngine] = (),
+    http_clients: Iterable[Any] = ()
+) -> Optional[TracerProvider]:
+    """
+    Record spans for the app's routes, the engines' statements and the
+    clients' outbound requests, which carry the trace in a traceparent header.
+    """
+    global _tracer_provider
+    if not TRACING_ENABLED:
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(span_exporter()))
+    trace.set_tracer_provider(provider)
+
+    # One span per request, without a child for every ASGI message
+    FastAPIInstrumentor.instrument_app(
+        app,
+        tracer_provider=provider,
+        excluded_urls=TRACING_EXCLUDED_URLS,
+        exclude_spans=["receive", "send"]
+    )
+    # The read engine is the primary when no replica is configured
+    unique_engines = list({id(engine): engine for engine in engines}.values())
+    SQLAlchemyInstrumentor().instrument(
+        engines=[engine.sync_engine for engine in unique_engines],
+        tracer_provider=provider,
+        enable_commenter=TRACING_SQL_COMMENTER
+    )
+    for client in http_clients:
+        if client is not None:
+            HTTPXClientInstrumentor.instrument_client(client, tracer_provider=provider)
+
+    _tracer_provider = provider
+    logger.info(f"Tracing enabled for {service_name}, exporting to {TRACING_EXPORTER}.")
+    return provider
+
+
+def shutdown_tracing():
+    """Export the spans still buffered"""
+    global _tracer_provider
+    if _tracer_provider is not None:
+        _tracer_provider.shutdown()
+        _tracer_provider = None
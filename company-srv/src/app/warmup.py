@@ -0,0 +1,54 @@
+import asyncio
+import os
+import time
+from uuid import UUID
+from loguru import logger
+
+from app.database import engine, read_engine, async_session, async_read_session
+from app.services import (
+    get_company,
+    get_company_validator,
+    get_companies,
+    get_company_versions,
+    get_company_statuses
+)
+
+# Number of pooled connections opened per engine before serving traffic
+DB_WARMUP_CONNECTIONS = int(os.getenv("DB_WARMUP_CONNECTIONS", "5"))
+
+WARMUP_COMPANY_ID = UUID(int=0)
+
+
+async def _warm_session(session_factory):
+    # Running the hot read paths once fills SQLAlchemy's compiled statement cache
+    # and asyncpg's prepared statement cache of the connection used
+    async with session_factory() as session:
+        await get_company_validator(session, WARMUP_COMPANY_ID)
+        await get_company(session, WARMUP_COMPANY_ID)
+        await get_companies(session, 0, 10)
+        await get_company_versions(session, WARMUP_COMPANY_ID, 0, 10)
+        await get_company_statuses(session, True)
+
+
+async def warm_up_pool():
+    """Open the connection pool(s) and prime statement caches so the first requests are not slow."""
+    if DB_WARMUP_CONNECTIONS <= 0:
+        return
+    started = time.perf_counter()
+    session_factories = [async_session]
+    if read_engine is not engine:
+        session_factories.append(async_read_session)
+    try:
+        # Sessions run concurrently so each one checks out its own connection
+        await asyncio.gather(*(
+            _warm_session(session_factory)
+            for session_factory in session_factories
+            for _ in range(DB_WARMUP_CONNECTIONS)
+        ))
+        logger.info(
+            f"Warmed up {DB_WARMUP_CONNECTIONS} connection(s) per engine "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+    except Exception as e:
+        # Warm-up is an optimization; the first requests will open connections instead
+        logger.warning(f"Connection pool warm-up failed: {str(e)}")
@@ -0,0 +1,2 @@
+# Fixtures of the integration tests in this directory; tests/unit only uses mocks
+from tests.conftest_integration import *  # noqa: F401,F403
@@ -0,0 +1,89 @@
+"""
+Test data inserted straight through the test's session, skipping HTTP and the
+service layer. Rows land in the test's transaction and are rolled back with it.
+"""
+import itertools
+from typing import Any, Dict, List
+from uuid import uuid4
+
+from app.database import Company, CompanyStatus
+from app.services.version_storage import new_version
+
+_sequence = itertools.count(1)
+
+
+def company_values(**overrides) -> Dict[str, Any]:
+    """Column values of a new company, unique per call"""
+    n = next(_sequence)
+    values = {
+        "company_id": uuid4(),
+        "company_code": f"FACTORY{n}",
+        "company_name": f"Factory Company {n}",
+        "company_country": "DE",
+        "company_accounting_standards": "IFRS",
+        "created_by": "factory",
+        "updated_by": "factory"
+    }
+    values.update(overrides)
+    return values
+
+
+def company_rows(count: int, **columns) -> List[Dict[str, Any]]:
+    """
+    Column values of `count` companies for a Core INSERT. A column given as a
+    callable gets the row number (0 to count - 1) and returns the value.
+    """
+    return [
+        company_values(**{
+            name: value(i) if callable(value) else value
+            for name, value in columns.items()
+        })
+        for i in range(count)
+    ]
+
+
+class DataFactory:
+    def __init__(self, portal, session_factory):
+        self.portal = portal
+        self.session_factory = session_factory
+
+    async def _add(self, objects: List[Any]):
+        async with self.session_factory() as session:
+            session.add_all(objects)
+            await session.commit()
+
+    def add(self, *objects: Any):
+        """Insert ORM objects in one flush"""
+        self.portal.call(self._add, list(objects))
+
+    def build_status(self, **overrides) -> CompanyStatus:
+        n = next(_sequence)
+        values = {
+            "status_id": uuid4(),
+            "status_code": f"STATUS{n}",
+            "status_description": f"Status {n}",
+            "created_by": "factory",
+            "updated_by": "factory"
+        }
+        values.update(overrides)
+        return CompanyStatus(**values)
+
+    def build_company(self, **overrides) -> List[Any]:
+        """A company and its initial version, as the create endpoint stores them"""
+        company = Company(**company_values(**overrides))
+        version = new_version(company, 1, None, changed_by=company.created_by, change_type="CREATE")
+        return [company, version]
+
+    def status(self, **overrides) -> CompanyStatus:
+        status = self.build_status(**overrides)
+        self.add(status)
+        return status
+
+    def company(self, **overrides) -> Company:
+        return self.companies(1, **overrides)[0]
+
+    def companies(self, count: int, **overrides) -> List[Company]:
+        """Insert `count` companies with one multi-row INSERT per table"""
+        rows = [self.build_company(**overrides) for _ in range(count)]
+        self.add(*(row for pair in rows for row in pair))
+        return [company for company, _ in rows]
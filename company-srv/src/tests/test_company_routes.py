@@ -1,8 +1,11 @@
 # test_company_routes.py
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.database import read_engine
 from uuid import UUID
 from typing import Dict
+from tests.factories import DataFactory
 
 def test_create_company(client: TestClient, auth_headers: Dict):
     company_data = {
@@ -42,6 +45,184 @@ def test_get_company(client: TestClient, auth_headers: Dict):
     assert data["company_code"] == company_data["company_code"]
     assert data["company_id"] == company_id
 
+def test_get_company_conditional(client: TestClient, auth_headers: Dict):
+    company_data = {
+        "company_code": "TEST007",
+        "company_name": "Test Company 7",
+        "company_country": "NL",
+        "company_accounting_standards": "IFRS"
+    }
+    create_response = client.post("/companies", json=company_data, headers=auth_headers)
+    company_id = create_response.json()["company_id"]
+
+    response = client.get(f"/companies/{company_id}", headers=auth_headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+
+    # Unchanged company is answered with 304 and no body
+    response = client.get(f"/companies/{company_id}", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    response = client.get(f"/companies/{company_id}", headers={**auth_headers, "If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    # An update creates a new version and invalidates the ETag
+    client.put(f"/companies/{company_id}", json={"company_name": "Renamed"}, headers=auth_headers)
+    response = client.get(f"/companies/{company_id}", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["company_name"] == "Renamed"
+
+def test_update_company_if_match(client: TestClient, auth_headers: Dict):
+    company_data = {
+        "company_code": "TEST008",
+        "company_name": "Test Company 8",
+        "company_country": "DE",
+        "company_accounting_standards": "HGB"
+    }
+    create_response = client.post("/companies", json=company_data, headers=auth_headers)
+    company_id = create_response.json()["company_id"]
+    etag = client.get(f"/companies/{company_id}", headers=auth_headers).headers["ETag"]
+
+    response = client.put(
+        f"/companies/{company_id}",
+        json={"company_name": "First Writer"},
+        headers={**auth_headers, "If-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["current_version"] == 2
+    assert response.headers["ETag"] != etag
+
+    # A second writer holding the old ETag must not overwrite the first one
+    response = client.put(
+        f"/companies/{company_id}",
+        json={"company_name": "Second Writer"},
+        headers={**auth_headers, "If-Match": etag}
+    )
+    assert response.status_code == 412
+
+    response = client.post(
+        f"/companies/{company_id}/restore/1",
+        params={"expected_version": 1},
+        headers=auth_headers
+    )
+    assert response.status_code == 412
+
+    response = client.get(f"/companies/{company_id}", headers=auth_headers)
+    assert response.json()["company_name"] == "First Writer"
+
+def test_bulk_update_companies(client: TestClient, auth_headers: Dict):
+    company_ids = []
+    for i, country in enumerate(["LU", "LU", "BE"]):
+        response = client.post("/companies", json={
+            "company_code": f"BULK{i}",
+            "company_name": f"Bulk Company {i}",
+            "company_country": country,
+            "company_accounting_standards": "GAAP"
+        }, headers=auth_headers)
+        company_ids.append(response.json()["company_id"])
+
+    response = client.post("/companies/bulk-update", json={
+        "filter": {"company_country": "LU"},
+        "update": {"company_accounting_standards": "IFRS"},
+        "change_reason": "Regulatory change"
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["updated_count"] == 2
+
+    for company_id, expected in zip(company_ids, ["IFRS", "IFRS", "GAAP"]):
+        data = client.get(f"/companies/{company_id}", headers=auth_headers).json()
+        assert data["company_accounting_standards"] == expected
+
+    versions = client.get(f"/companies/{company_ids[0]}/versions", headers=auth_headers).json()
+    assert {v["version_number"] for v in versions} == {1, 2}
+
+    # An empty filter would touch every company
+    response = client.post("/companies/bulk-update", json={
+        "filter": {},
+        "update": {"company_accounting_standards": "IFRS"}
+    }, headers=auth_headers)
+    assert response.status_code == 422
+
+    # Company codes are unique, so one code cannot go to many companies
+    response = client.post("/companies/bulk-update", json={
+        "filter": {"company_country": "LU"},
+        "update": {"company_code": "BULK-SHARED"}
+    }, headers=auth_headers)
+    assert response.status_code == 422
+
+def test_search_companies(client: TestClient, auth_headers: Dict):
+    for i, (name, country) in enumerate([
+        ("Searchable Holding", "AT"),
+        ("Searchable Logistics", "AT"),
+        ("Searchable Holding", "CH")
+    ]):
+        client.post("/companies", json={
+            "company_code": f"SEARCH{i}",
+            "company_name": name,
+            "company_country": country,
+            "company_accounting_standards": "IFRS"
+        }, headers=auth_headers)
+
+    response = client.get(
+        "/companies/search",
+        params={"company_country": "AT", "name": "holding"},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert [c["company_code"] for c in response.json()] == ["SEARCH0"]
+
+    response = client.get(
+        "/companies/search",
+        params={"name": "Serchable Holdng", "fuzzy": True},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert {"SEARCH0", "SEARCH2"} <= {c["company_code"] for c in response.json()}
+
+def test_company_status_transitions(client: TestClient, auth_headers: Dict):
+    status = client.post("/company-status/", json={
+        "status_code": "DORMANT",
+        "status_description": "Dormant company"
+    }, headers=auth_headers).json()
+    company_ids = []
+    for i in range(3):
+        response = client.post("/companies", json={
+            "company_code": f"STATUS{i}",
+            "company_name": f"Status Company {i}",
+            "company_country": "PT",
+            "company_accounting_standards": "IFRS"
+        }, headers=auth_headers)
+        company_ids.append(response.json()["company_id"])
+
+    response = client.post(f"/companies/{company_ids[0]}/status", json={
+        "status_id": status["status_id"],
+        "status_reason": "No activity"
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["status_id"] == status["status_id"]
+    assert response.json()["status_changed_at"] is not None
+
+    # The company that already has the status is skipped
+    response = client.post("/companies/bulk-status", json={
+        "filter": {"company_country": "PT"},
+        "status_id": status["status_id"],
+        "status_reason": "Month end"
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["updated_count"] == 2
+
+    versions = client.get(f"/companies/{company_ids[1]}/versions", headers=auth_headers).json()
+    assert versions[0]["change_type"] == "STATUS"
+
+    response = client.post(f"/companies/{company_ids[0]}/status", json={
+        "status_id": "00000000-0000-0000-0000-000000000000"
+    }, headers=auth_headers)
+    assert response.status_code == 422
+
 def test_list_companies(client: TestClient, auth_headers: Dict):
     # Create multiple companies
     companies = [
@@ -64,6 +245,125 @@ def test_list_companies(client: TestClient, auth_headers: Dict):
     assert len(data) >= 3
     assert all(isinstance(company["company_id"], str) for company in data)
 
+def test_company_includes(client: TestClient, auth_headers: Dict):
+    for i in range(10):
+        company_id = client.post("/companies", json={
+            "company_code": f"INCL{i}",
+            "company_name": f"Include Company {i}",
+            "company_country": "AT",
+            "company_accounting_standards": "IFRS"
+        }, headers=auth_headers).json()["company_id"]
+        client.put(f"/companies/{company_id}", json={"company_name": f"Renamed {i}"}, headers=auth_headers)
+
+    response = client.get(f"/companies/{company_id}?include=latest_version,versions", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["latest_version"]["version_number"] == 2
+    assert data["latest_version"]["company_name"] == "Renamed 9"
+    assert [v["version_number"] for v in data["versions"]] == [2, 1]
+    assert "status" not in data
+    assert "versions" not in client.get(f"/companies/{company_id}", headers=auth_headers).json()
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # The number of queries must not grow with the page size
+    counts = []
+    event.listen(read_engine.sync_engine, "before_cursor_execute", count_statement)
+    try:
+        for limit in (2, 10):
+            statements.clear()
+            response = client.get(
+                f"/companies/search?company_country=AT&limit={limit}&include=status,latest_version,versions",
+                headers=auth_headers
+            )
+            assert response.status_code == 200
+            assert len(response.json()) == limit
+            counts.append(len(statements))
+    finally:
+        event.remove(read_engine.sync_engine, "before_cursor_execute", count_statement)
+    assert counts[0] == counts[1]
+
+    response = client.get("/companies/companies?include=owner", headers=auth_headers)
+    assert response.status_code == 422
+
+def test_company_fields(client: TestClient, auth_headers: Dict):
+    company_id = client.post("/companies", json={
+        "company_code": "FIELDS1",
+        "company_name": "Fields Company",
+        "company_country": "BE",
+        "company_accounting_standards": "IFRS"
+    }, headers=auth_headers).json()["company_id"]
+
+    response = client.get("/companies/search?company_country=BE&fields=company_name", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == [{"company_name": "Fields Company", "company_id": company_id}]
+
+    response = client.get(f"/companies/{company_id}?fields=company_code", headers=auth_headers)
+    assert response.json() == {"company_code": "FIELDS1", "company_id": company_id}
+    # The slim representation has its own entity tag
+    full_etag = client.get(f"/companies/{company_id}", headers=auth_headers).headers["ETag"]
+    assert response.headers["ETag"] != full_etag
+
+    assert client.get("/companies/companies?fields=secret", headers=auth_headers).status_code == 422
+    response = client.get("/companies/companies?fields=company_name&include=status", headers=auth_headers)
+    assert response.status_code == 400
+
+def test_company_output_formats(client: TestClient, auth_headers: Dict, factory: DataFactory):
+    factory.companies(20, company_country="LU")
+
+    response = client.get(
+        "/companies/search?company_country=LU&limit=20&fields=company_code",
+        headers={**auth_headers, "Accept": "text/csv", "Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-encoding"] == "gzip"
+    lines = response.text.splitlines()
+    assert lines[0] == "company_code,company_id"
+    assert len(lines) == 21
+
+    response = client.get("/companies/export", headers={**auth_headers, "Accept-Encoding": "gzip"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.text.splitlines()) >= 20
+
+    response = client.get("/companies/companies", headers={**auth_headers, "Accept": "application/xml"})
+    assert response.status_code == 406
+
+def test_company_changes(client: TestClient, auth_headers: Dict):
+    # Start from the end of the feed so earlier tests' changes are skipped
+    page = client.get("/companies/changes?limit=1000", headers=auth_headers).json()
+    while page["has_more"]:
+        page = client.get(f"/companies/changes?limit=1000&since={page['next_cursor']}", headers=auth_headers).json()
+    cursor = page["next_cursor"]
+
+    company_id = client.post("/companies", json={
+        "company_code": "CHANGES1",
+        "company_name": "Changes Company",
+        "company_country": "AT",
+        "company_accounting_standards": "IFRS"
+    }, headers=auth_headers).json()["company_id"]
+    client.put(f"/companies/{company_id}", json={"company_name": "Renamed Company"}, headers=auth_headers)
+    client.delete(f"/companies/{company_id}", headers=auth_headers)
+
+    response = client.get(f"/companies/changes?since={cursor}&limit=2", headers=auth_headers)
+    assert response.status_code == 200
+    page = response.json()
+    assert [change["change_type"] for change in page["changes"]] == ["CREATE", "UPDATE"]
+    assert page["has_more"]
+    page = client.get(f"/companies/changes?since={page['next_cursor']}", headers=auth_headers).json()
+    assert [(change["company_id"], change["change_type"]) for change in page["changes"]] == [(company_id, "DELETE")]
+    assert page["changes"][0]["company_name"] == "Renamed Company"
+    assert not page["has_more"]
+
+    # Nothing new: the cursor is kept
+    response = client.get(f"/companies/changes?since={page['next_cursor']}&wait=1", headers=auth_headers)
+    assert response.json() == {"changes": [], "next_cursor": page["next_cursor"], "has_more": False}
+    assert client.get("/companies/changes?since=bogus", headers=auth_headers).status_code == 400
+
 def test_update_company(client: TestClient, auth_headers: Dict):
     # First create a company
     company_data = {
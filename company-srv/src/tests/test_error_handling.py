@@ -1,6 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
-from uuid import UUID
+from uuid import UUID, uuid4
 from typing import Dict
 
 # test_error_handling.py
@@ -0,0 +1,79 @@
+# test_search_query_plans.py
+import hashlib
+import os
+import pytest
+from sqlalchemy import insert, text
+
+from app.database import Company
+from app.schemas import CompanyFilter
+from app.services import build_company_search_query
+from app.services.count_service import explain_plan
+from tests.conftest_integration import use_test_schema
+from tests.factories import company_rows
+
+# Raise (e.g. to 2000000) to check the plans at production scale
+PLAN_TEST_ROWS = int(os.getenv("PLAN_TEST_ROWS", "200000"))
+COUNTRIES = ["DE", "FR", "US", "UK", "IT", "ES", "NL", "AT", "CH", "BE"]
+STANDARDS = ["IFRS", "GAAP", "HGB"]
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+async def _explain(conn, query) -> list:
+    return list(_plan_nodes(await explain_plan(conn, query)))
+
+@pytest.fixture
+async def seeded_connection(async_engine):
+    """
+    Connection whose transaction sees PLAN_TEST_ROWS generated companies and fresh
+    statistics, in the worker's schema. Everything is rolled back afterwards,
+    including the ANALYZE.
+    """
+    async with async_engine.connect() as conn:
+        transaction = await conn.begin()
+        await use_test_schema(conn)
+        rows = company_rows(
+            PLAN_TEST_ROWS,
+            company_code=lambda n: f"PLAN-{n}",
+            company_name=lambda n: f"Company {hashlib.md5(str(n).encode()).hexdigest()}",
+            company_country=lambda n: f"{COUNTRIES[n % 10]}{n // 10 % 20}",
+            company_accounting_standards=lambda n: STANDARDS[n % 3],
+            created_by="plan-test",
+            updated_by="plan-test"
+        )
+        await conn.execute(insert(Company.__table__), rows)
+        # Unqualified, so search_path resolves it to the worker's table
+        await conn.execute(text(f"ANALYZE {Company.__table__.name}"))
+        yield conn
+        await transaction.rollback()
+
+def _scanned_tables(nodes: list) -> dict:
+    return {node.get("Relation Name"): node["Node Type"] for node in nodes if "Relation Name" in node}
+
+async def test_country_filter_uses_index(seeded_connection):
+    query = build_company_search_query(CompanyFilter.model_construct(company_country="DE7"))
+    nodes = await _explain(seeded_connection, query)
+    assert _scanned_tables(nodes)["companies"] != "Seq Scan"
+    assert any(node.get("Index Name") == "ix_companies_company_country" for node in nodes)
+
+async def test_substring_search_uses_trigram_index(seeded_connection):
+    query = build_company_search_query(CompanyFilter.model_construct(), name="3f9a1c")
+    nodes = await _explain(seeded_connection, query)
+    assert _scanned_tables(nodes)["companies"] != "Seq Scan"
+    assert any(node.get("Index Name") == "ix_companies_company_name_trgm" for node in nodes)
+
+async def test_fuzzy_search_uses_trigram_index(seeded_connection):
+    query = build_company_search_query(CompanyFilter.model_construct(), name="Company 3f9a1c2e", fuzzy=True)
+    nodes = await _explain(seeded_connection, query)
+    assert _scanned_tables(nodes)["companies"] != "Seq Scan"
+    assert any(node.get("Index Name") == "ix_companies_company_name_trgm" for node in nodes)
+
+async def test_combined_filters_stay_index_driven(seeded_connection):
+    query = build_company_search_query(
+        CompanyFilter.model_construct(company_country="FR3", company_accounting_standards="IFRS"),
+        name="ab12"
+    )
+    nodes = await _explain(seeded_connection, query)
+    assert _scanned_tables(nodes)["companies"] != "Seq Scan"
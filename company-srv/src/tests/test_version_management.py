@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from uuid import UUID
@@ -44,6 +45,90 @@ def test_get_company_versions(client: TestClient, auth_headers: Dict):
     assert all("version_number" in version for version in versions)
     assert all("change_type" in version for version in versions)
 
+def test_get_company_versions_total(client: TestClient, auth_headers: Dict):
+    company_data = {
+        "company_code": "TEST009",
+        "company_name": "Counted Company",
+        "company_country": "IT",
+        "company_accounting_standards": "IFRS"
+    }
+    create_response = client.post("/companies", json=company_data, headers=auth_headers)
+    company_id = create_response.json()["company_id"]
+    for i in range(2):
+        client.put(f"/companies/{company_id}", json={"company_name": f"Counted {i}"}, headers=auth_headers)
+
+    response = client.get(
+        f"/companies/{company_id}/versions",
+        headers=auth_headers,
+        params={"skip": 0, "limit": 1, "include_total": True}
+    )
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert response.headers["X-Total-Count"] == "3"
+    assert response.headers["X-Total-Count-Estimated"] == "false"
+
+    # Totals are only computed on request
+    response = client.get(f"/companies/{company_id}/versions", headers=auth_headers)
+    assert "X-Total-Count" not in response.headers
+
+def test_diff_company_versions(client: TestClient, auth_headers: Dict):
+    company_data = {
+        "company_code": "TEST010",
+        "company_name": "Diffed Company",
+        "company_country": "IT",
+        "company_accounting_standards": "IFRS"
+    }
+    create_response = client.post("/companies", json=company_data, headers=auth_headers)
+    company_id = create_response.json()["company_id"]
+    client.put(f"/companies/{company_id}", json={"company_name": "Diffed Company 2"}, headers=auth_headers)
+    client.put(f"/companies/{company_id}", json={"company_country": "FR"}, headers=auth_headers)
+
+    response = client.get(
+        f"/companies/{company_id}/versions/diff",
+        headers=auth_headers,
+        params={"from_version": 1, "to_version": 3}
+    )
+    assert response.status_code == 200
+    assert response.json()["changes"] == {
+        "company_name": {"old": "Diffed Company", "new": "Diffed Company 2"},
+        "company_country": {"old": "IT", "new": "FR"}
+    }
+
+    response = client.get(
+        f"/companies/{company_id}/versions/diff",
+        headers=auth_headers,
+        params={"from_version": 1, "to_version": 99}
+    )
+    assert response.status_code == 404
+
+def test_company_as_of(client: TestClient, auth_headers: Dict):
+    company_data = {
+        "company_code": "TEST011",
+        "company_name": "Quarter Start",
+        "company_country": "IT",
+        "company_accounting_standards": "IFRS"
+    }
+    create_response = client.post("/companies", json=company_data, headers=auth_headers)
+    company_id = create_response.json()["company_id"]
+    created_at = create_response.json()["updated_at"]
+    client.put(f"/companies/{company_id}", json={"company_name": "Quarter End"}, headers=auth_headers)
+
+    response = client.get(f"/companies/{company_id}", params={"as_of": created_at}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["company_name"] == "Quarter Start"
+    assert response.json()["current_version"] == 1
+
+    response = client.get(f"/companies/{company_id}", params={"as_of": "2000-01-01T00:00:00Z"}, headers=auth_headers)
+    assert response.status_code == 404
+
+    response = client.get("/companies/export", params={"as_of": created_at}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert {"company_id": company_id, "company_name": "Quarter Start"}.items() <= next(
+        c for c in exported if c["company_id"] == company_id
+    ).items()
+
 def test_restore_company_version(client: TestClient, auth_headers: Dict):
     # Create a company
     company_data = {
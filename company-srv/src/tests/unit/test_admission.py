@@ -0,0 +1,76 @@
+import pytest
+from unittest.mock import patch
+from app import admission
+from app.admission import AdmissionController, AdmissionMiddleware, PoolWaitMonitor
+
+async def call(middleware, method: str, path: str = "/companies/companies"):
+    """Run one request through the middleware and collect the sent messages"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware({"type": "http", "method": method, "path": path}, receive, send)
+    return messages
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+def test_pool_wait_average_decays():
+    """Test that the smoothed pool wait decays while no samples arrive"""
+    with patch.object(admission.time, "monotonic", return_value=100.0):
+        monitor = PoolWaitMonitor(half_life=2, alpha=0.5)
+        monitor.record(0.4)
+        assert monitor.average == pytest.approx(0.2)
+    with patch.object(admission.time, "monotonic", return_value=104.0):
+        assert monitor.average == pytest.approx(0.05)
+
+@pytest.mark.asyncio
+async def test_reads_are_shed_when_pool_waits():
+    """Test that reads get 503 with Retry-After while writes are still served"""
+    monitor = PoolWaitMonitor(half_life=0)
+    controller = AdmissionController(monitor, pool_wait_threshold=0.1, max_in_flight=10)
+    middleware = AdmissionMiddleware(ok_app, controller)
+
+    assert (await call(middleware, "GET"))[0]["status"] == 200
+
+    for _ in range(20):
+        monitor.record(0.5)
+    shed = await call(middleware, "GET", "/companies/export")
+    assert shed[0]["status"] == 503
+    assert (b"retry-after", str(admission.ADMISSION_RETRY_AFTER).encode()) in shed[0]["headers"]
+    assert (await call(middleware, "POST"))[0]["status"] == 200
+    assert controller.shed_total == 1
+    assert controller.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_reads_are_shed_at_in_flight_limit():
+    """Test that capacity beyond the in-flight limit is kept for writes"""
+    controller = AdmissionController(PoolWaitMonitor(half_life=0), pool_wait_threshold=1, max_in_flight=1)
+    middleware = AdmissionMiddleware(ok_app, controller)
+    # One request is already being served
+    controller.in_flight = 1
+
+    assert (await call(middleware, "GET"))[0]["status"] == 503
+    assert (await call(middleware, "POST"))[0]["status"] == 200
+    assert controller.in_flight == 1
+
+@pytest.mark.asyncio
+async def test_streams_are_not_counted_in_flight():
+    """Test that long-lived streams do not take up the in-flight limit"""
+    seen = []
+
+    async def recording_app(scope, receive, send):
+        seen.append(controller.in_flight)
+        await ok_app(scope, receive, send)
+
+    controller = AdmissionController(PoolWaitMonitor(half_life=0), pool_wait_threshold=1, max_in_flight=1)
+    middleware = AdmissionMiddleware(recording_app, controller)
+
+    assert (await call(middleware, "GET", "/audit-logs/stream"))[0]["status"] == 200
+    assert (await call(middleware, "GET"))[0]["status"] == 200
+    assert seen == [0, 1]
@@ -0,0 +1,75 @@
+import pytest
+from datetime import datetime, timezone
+from uuid import UUID
+from app.conditional import (
+    make_etag,
+    format_http_date,
+    etag_matches,
+    not_modified_since,
+    is_not_modified,
+    cache_headers,
+    parse_if_match_version
+)
+
+COMPANY_ID = UUID("12345678-1234-5678-1234-567812345678")
+UPDATED_AT = datetime(2024, 12, 16, 10, 30, 15, 123456, tzinfo=timezone.utc)
+
+def test_make_etag():
+    """Test ETag generation from company id and version"""
+    assert make_etag(COMPANY_ID, 3) == '"12345678-1234-5678-1234-567812345678-v3"'
+    assert make_etag(COMPANY_ID, 3, "versions") == '"12345678-1234-5678-1234-567812345678-v3-versions"'
+    assert make_etag(COMPANY_ID, 3) != make_etag(COMPANY_ID, 4)
+
+def test_format_http_date():
+    """Test HTTP-date formatting of aware and naive datetimes"""
+    assert format_http_date(UPDATED_AT) == "Mon, 16 Dec 2024 10:30:15 GMT"
+    assert format_http_date(UPDATED_AT.replace(tzinfo=None)) == "Mon, 16 Dec 2024 10:30:15 GMT"
+
+def test_etag_matches():
+    """Test weak comparison against If-None-Match lists"""
+    etag = make_etag(COMPANY_ID, 3)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(make_etag(COMPANY_ID, 2), etag)
+    assert not etag_matches(None, etag)
+
+def test_not_modified_since():
+    """Test If-Modified-Since evaluation with second precision"""
+    assert not_modified_since("Mon, 16 Dec 2024 10:30:15 GMT", UPDATED_AT)
+    assert not_modified_since("Tue, 17 Dec 2024 00:00:00 GMT", UPDATED_AT)
+    assert not not_modified_since("Mon, 16 Dec 2024 10:30:14 GMT", UPDATED_AT)
+    assert not not_modified_since("not a date", UPDATED_AT)
+
+def test_if_none_match_takes_precedence():
+    """Test that If-Modified-Since is ignored when If-None-Match is present"""
+    etag = make_etag(COMPANY_ID, 3)
+    stale_etag = make_etag(COMPANY_ID, 2)
+    assert not is_not_modified(stale_etag, "Tue, 17 Dec 2024 00:00:00 GMT", etag, UPDATED_AT)
+    assert is_not_modified(etag, "Sun, 15 Dec 2024 00:00:00 GMT", etag, UPDATED_AT)
+    assert is_not_modified(None, "Tue, 17 Dec 2024 00:00:00 GMT", etag, UPDATED_AT)
+    assert not is_not_modified(None, None, etag, UPDATED_AT)
+
+def test_cache_headers():
+    """Test validator headers"""
+    headers = cache_headers(make_etag(COMPANY_ID, 1), UPDATED_AT)
+    assert headers["ETag"] == make_etag(COMPANY_ID, 1)
+    assert headers["Last-Modified"] == "Mon, 16 Dec 2024 10:30:15 GMT"
+    assert "Last-Modified" not in cache_headers(make_etag(COMPANY_ID, 1), None)
+
+def test_parse_if_match_version():
+    """Test extraction of the expected version from If-Match"""
+    assert parse_if_match_version(make_etag(COMPANY_ID, 4), COMPANY_ID) == 4
+    assert parse_if_match_version(f'"other", {make_etag(COMPANY_ID, 4)}', COMPANY_ID) == 4
+    assert parse_if_match_version("*", COMPANY_ID) is None
+    assert parse_if_match_version(None, COMPANY_ID) is None
+    other_id = UUID("87654321-4321-8765-4321-876543218765")
+    for value in (
+        make_etag(other_id, 4),
+        f"W/{make_etag(COMPANY_ID, 4)}",
+        make_etag(COMPANY_ID, 4, "versions"),
+        f"{make_etag(COMPANY_ID, 3)}, {make_etag(COMPANY_ID, 4)}",
+        "garbage"
+    ):
+        with pytest.raises(ValueError):
+            parse_if_match_version(value, COMPANY_ID)
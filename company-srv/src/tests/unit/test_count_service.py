@@ -0,0 +1,103 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from app.database.models.company import Company
+from app.services import count_service
+from app.services.count_service import CountCache, TotalCount, count_total
+
+@pytest.fixture
+def counting_db(mock_db):
+    """Mock session whose EXPLAIN reports `plan_rows` and whose COUNT(*) returns `exact`"""
+    conn = MagicMock()
+    conn.execute = AsyncMock()
+    conn.sync_connection.get_execution_options.return_value = {}
+    mock_db.connection = AsyncMock(return_value=conn)
+
+    def configure(plan_rows: int, exact: int):
+        conn.execute.return_value = MagicMock(
+            scalar_one=MagicMock(return_value=[{"Plan": {"Plan Rows": plan_rows}}])
+        )
+        mock_db.execute.return_value = MagicMock(scalar_one=MagicMock(return_value=exact))
+        return conn
+
+    return configure
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    with patch.object(count_service, "count_cache", CountCache(ttl=30, max_entries=10)):
+        yield
+
+@pytest.mark.asyncio
+async def test_small_result_is_counted_exactly(mock_db, counting_db):
+    """Test that results below the threshold get an exact count"""
+    counting_db(plan_rows=120, exact=117)
+
+    total = await count_total(mock_db, select(Company).where(Company.company_country == "DE").limit(10))
+
+    assert total == TotalCount(117, estimated=False)
+    assert total.headers() == {"X-Total-Count": "117", "X-Total-Count-Estimated": "false"}
+    count_sql = str(mock_db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert count_sql.startswith("SELECT count(*)")
+    assert "LIMIT" not in count_sql
+
+@pytest.mark.asyncio
+async def test_large_result_is_estimated(mock_db, counting_db):
+    """Test that results above the threshold return the planner estimate without COUNT(*)"""
+    conn = counting_db(plan_rows=count_service.COUNT_EXACT_THRESHOLD + 1, exact=0)
+
+    total = await count_total(mock_db, select(Company))
+
+    assert total == TotalCount(count_service.COUNT_EXACT_THRESHOLD + 1, estimated=True)
+    assert conn.execute.call_args.args[0].text.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    mock_db.execute.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_exact_counts_are_cached_per_filter(mock_db, counting_db):
+    """Test that repeated counts of the same filter reuse the cached value"""
+    conn = counting_db(plan_rows=50, exact=42)
+
+    first = await count_total(mock_db, select(Company).where(Company.company_country == "DE"))
+    second = await count_total(mock_db, select(Company).where(Company.company_country == "DE").offset(10))
+    other = await count_total(mock_db, select(Company).where(Company.company_country == "FR"))
+
+    assert first == second == other == TotalCount(42, estimated=False)
+    # DE is counted once, FR once
+    assert mock_db.execute.call_count == 2
+    assert conn.execute.call_count == 2
+
+@pytest.mark.asyncio
+async def test_filter_values_are_bound(mock_db, counting_db):
+    """Test that the EXPLAIN passes filter values as bind parameters, not as SQL text"""
+    conn = counting_db(plan_rows=50, exact=1)
+
+    await count_total(mock_db, select(Company).where(Company.company_name == "O'Brien; DROP TABLE companies"))
+
+    explain, params = conn.execute.call_args.args
+    assert "O'Brien" not in explain.text
+    assert ":company_name_1" in explain.text
+    assert params == {"company_name_1": "O'Brien; DROP TABLE companies"}
+
+@pytest.mark.asyncio
+async def test_explain_uses_connection_schema(mock_db, counting_db):
+    """Test that the EXPLAIN reads the schema the connection translates to"""
+    conn = counting_db(plan_rows=50, exact=1)
+    conn.sync_connection.get_execution_options.return_value = {
+        "schema_translate_map": {Company.__table__.schema: "company_test_gw0"}
+    }
+
+    await count_total(mock_db, select(Company))
+
+    assert "FROM company_test_gw0.companies" in conn.execute.call_args.args[0].text
+
+def test_count_cache_expiry():
+    """Test TTL expiry and the entry limit of the count cache"""
+    cache = CountCache(ttl=30, max_entries=2)
+    with patch.object(count_service.time, "monotonic", return_value=100.0):
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 3)
+        assert cache.get("a") is None
+        assert cache.get("c") == 3
+    with patch.object(count_service.time, "monotonic", return_value=131.0):
+        assert cache.get("c") is None
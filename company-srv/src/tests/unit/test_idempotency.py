@@ -0,0 +1,146 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services import idempotency_service
+from app.services.idempotency_service import (
+    IdempotencyClaim,
+    IdempotencyClaimLostError,
+    IdempotencyConflictError,
+    IdempotencyKeyMismatchError,
+    request_fingerprint,
+    begin_idempotent_request,
+    complete_idempotent_request,
+    release_idempotent_request
+)
+
+SCOPE = "companies:create:test-user"
+
+def record(request_hash, status_code=None, response_body=None):
+    return SimpleNamespace(request_hash=request_hash, status_code=status_code, response_body=response_body)
+
+def test_request_fingerprint_is_stable():
+    """Test that equal payloads hash equally regardless of key order"""
+    assert request_fingerprint({"a": 1, "b": 2}, None) == request_fingerprint({"b": 2, "a": 1}, None)
+    assert request_fingerprint({"a": 1}, None) != request_fingerprint({"a": 2}, None)
+
+@pytest.mark.asyncio
+async def test_first_request_claims_key(mock_db):
+    """Test that the first request owns the key under a token of its own and keeps it alive"""
+    claim_key = AsyncMock(return_value=True)
+    with patch.object(idempotency_service, "_claim_key", claim_key), \
+         patch.object(idempotency_service, "_cleanup_expired", AsyncMock()):
+        claim = await begin_idempotent_request(mock_db, SCOPE, "key-1", "hash")
+    assert isinstance(claim, IdempotencyClaim)
+    assert (claim.scope, claim.key) == (SCOPE, "key-1")
+    claim_key.assert_awaited_once_with(mock_db, SCOPE, "key-1", "hash", claim.token)
+    assert not claim.heartbeat.done()
+    claim.stop_heartbeat()
+
+@pytest.mark.asyncio
+async def test_retry_replays_stored_response(mock_db):
+    """Test that a retry after completion is a cheap lookup"""
+    stored = record("hash", 200, {"company_id": "abc"})
+    with patch.object(idempotency_service, "_claim_key", AsyncMock(return_value=False)), \
+         patch.object(idempotency_service, "_get_record", AsyncMock(return_value=stored)):
+        response = await begin_idempotent_request(mock_db, SCOPE, "key-2", "hash")
+    assert response.status_code == 200
+    assert response.body == {"company_id": "abc"}
+
+@pytest.mark.asyncio
+async def test_key_reuse_with_different_payload(mock_db):
+    """Test that a key cannot be reused for a different payload"""
+    with patch.object(idempotency_service, "_claim_key", AsyncMock(return_value=False)), \
+         patch.object(idempotency_service, "_get_record", AsyncMock(return_value=record("other-hash"))):
+        with pytest.raises(IdempotencyKeyMismatchError):
+            await begin_idempotent_request(mock_db, SCOPE, "key-3", "hash")
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_polls_until_response_is_stored(mock_db):
+    """Test that a duplicate polls the record, wherever the first request runs, and replays its response"""
+    records = [record("hash"), record("hash"), record("hash", 200, {"company_id": "abc"})]
+    get_record = AsyncMock(side_effect=records)
+    with patch.object(idempotency_service, "POLL_INTERVAL", 0.001), \
+         patch.object(idempotency_service, "_claim_key", AsyncMock(return_value=False)), \
+         patch.object(idempotency_service, "_get_record", get_record), \
+         patch.object(idempotency_service, "_cleanup_expired", AsyncMock()):
+        response = await asyncio.wait_for(begin_idempotent_request(mock_db, SCOPE, "key-4", "hash"), timeout=1)
+    assert response.body == {"company_id": "abc"}
+    assert get_record.await_count == 3
+
+@pytest.mark.asyncio
+async def test_complete_leaves_commit_to_the_request(mock_db):
+    """Test that the response is stored in the transaction making the request's changes"""
+    mock_db.execute.return_value = MagicMock(rowcount=1)
+    await complete_idempotent_request(mock_db, IdempotencyClaim(SCOPE, "key-6", "token"), 200, {"company_id": "abc"})
+    mock_db.execute.assert_awaited_once()
+    mock_db.commit.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_complete_only_matches_the_current_claim(mock_db):
+    """Test that a request whose expired claim was taken over cannot store its response"""
+    mock_db.execute.return_value = MagicMock(rowcount=0)
+    heartbeat = asyncio.create_task(asyncio.sleep(60))
+    claim = IdempotencyClaim(SCOPE, "key-7", "stale-token", heartbeat)
+
+    with pytest.raises(IdempotencyClaimLostError):
+        await complete_idempotent_request(mock_db, claim, 200, {"company_id": "abc"})
+
+    statement = mock_db.execute.await_args.args[0]
+    assert statement.compile().params["claim_token_1"] == "stale-token"
+    assert "status_code IS NULL" in str(statement)
+    await asyncio.sleep(0)
+    assert heartbeat.cancelled()
+
+@pytest.mark.asyncio
+async def test_release_only_drops_the_current_claim(mock_db):
+    """Test that releasing cannot delete the claim of a request that took the key over"""
+    await release_idempotent_request(mock_db, IdempotencyClaim(SCOPE, "key-8", "token"))
+
+    statement = mock_db.execute.await_args.args[0]
+    assert statement.compile().params["claim_token_1"] == "token"
+    mock_db.rollback.assert_awaited_once()
+    mock_db.commit.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_heartbeat_extends_claim_until_lost():
+    """Test that the claim is extended while the request runs and stops once taken over"""
+    session = AsyncMock()
+    session.execute.side_effect = [MagicMock(rowcount=1), MagicMock(rowcount=1), MagicMock(rowcount=0)]
+    session_factory = MagicMock()
+    session_factory.return_value.__aenter__.return_value = session
+    owner = asyncio.current_task()
+
+    with patch.object(idempotency_service, "IDEMPOTENCY_LOCK_TIMEOUT", 0.003), \
+         patch.object(idempotency_service, "async_session", session_factory):
+        await asyncio.wait_for(
+            idempotency_service._extend_claim(IdempotencyClaim(SCOPE, "key-9", "token"), owner), timeout=1
+        )
+
+    assert session.execute.await_count == 3
+    assert session.commit.await_count == 3
+
+@pytest.mark.asyncio
+async def test_heartbeat_stops_with_its_request():
+    """Test that a cancelled request does not keep its claim alive"""
+    owner = asyncio.create_task(asyncio.sleep(0))
+    await owner
+    session_factory = MagicMock()
+
+    with patch.object(idempotency_service, "IDEMPOTENCY_LOCK_TIMEOUT", 0.003), \
+         patch.object(idempotency_service, "async_session", session_factory):
+        await asyncio.wait_for(
+            idempotency_service._extend_claim(IdempotencyClaim(SCOPE, "key-10", "token"), owner), timeout=1
+        )
+
+    session_factory.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_duplicate_gives_up_after_wait_timeout(mock_db):
+    """Test that a duplicate does not wait forever for a stuck request"""
+    with patch.object(idempotency_service, "IDEMPOTENCY_WAIT_TIMEOUT", 0.05), \
+         patch.object(idempotency_service, "_claim_key", AsyncMock(return_value=False)), \
+         patch.object(idempotency_service, "_get_record", AsyncMock(return_value=record("hash"))), \
+         patch.object(idempotency_service, "_cleanup_expired", AsyncMock()):
+        with pytest.raises(IdempotencyConflictError):
+            await begin_idempotent_request(mock_db, SCOPE, "key-5", "hash")
@@ -0,0 +1,97 @@
+import gzip
+import zlib
+import pytest
+from app import negotiation
+from app.negotiation import (
+    CSV,
+    JSON,
+    MSGPACK,
+    NDJSON,
+    NotAcceptableError,
+    StreamCompressor,
+    negotiate_encoding,
+    negotiate_format,
+    negotiated_response,
+    negotiated_stream,
+    render
+)
+
+RECORDS = [
+    {"company_id": "a", "company_name": "First, Ltd", "status": None},
+    {"company_id": "b", "company_name": "Second", "status": {"status_code": "ACTIVE"}},
+]
+
+def test_negotiate_format():
+    """Test Accept parsing with q-values, wildcards and the default"""
+    offered = (JSON, CSV, NDJSON)
+    assert negotiate_format(None, offered) == JSON
+    assert negotiate_format("*/*", offered) == JSON
+    assert negotiate_format("text/csv", offered) == CSV
+    assert negotiate_format("application/json;q=0.5, application/x-ndjson", offered) == NDJSON
+    assert negotiate_format("text/*, application/json;q=0.1", offered) == CSV
+    with pytest.raises(NotAcceptableError):
+        negotiate_format("application/xml", offered)
+    with pytest.raises(NotAcceptableError):
+        negotiate_format("*/*;q=0", offered)
+
+def test_negotiate_encoding():
+    """Test content coding selection"""
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, br") is None
+    expected = "zstd" if negotiation.zstandard is not None else "gzip"
+    assert negotiate_encoding("zstd, gzip") == expected
+
+def test_render_formats():
+    """Test JSON, NDJSON and CSV rendering of records"""
+    columns = ("company_id", "company_name", "status")
+    assert render(RECORDS, NDJSON, columns).count(b"\n") == 2
+    assert render(RECORDS, CSV, columns).decode().splitlines() == [
+        "company_id,company_name,status",
+        'a,"First, Ltd",',
+        'b,Second,"{""status_code"":""ACTIVE""}"',
+    ]
+    assert render(RECORDS[:1], CSV, columns, first=False).decode().count("company_id") == 0
+
+def test_render_msgpack():
+    """Test that MessagePack output is a stream of records"""
+    msgpack = pytest.importorskip("msgpack")
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(render(RECORDS, MSGPACK, ()))
+    assert list(unpacker) == RECORDS
+
+def test_small_bodies_are_not_compressed():
+    """Test the compression size threshold"""
+    response = negotiated_response(RECORDS, JSON, "gzip", ())
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+
+    records = RECORDS * (negotiation.COMPRESSION_MIN_SIZE // 50)
+    response = negotiated_response(records, JSON, "gzip", ())
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == render(records, JSON, ())
+
+def test_stream_compressor_flushes_each_chunk():
+    """Test that each compressed chunk is decodable as it arrives"""
+    compressor = StreamCompressor("gzip")
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decoder.decompress(compressor.compress(b"first batch\n")) == b"first batch\n"
+    assert decoder.decompress(compressor.compress(b"second batch\n")) == b"second batch\n"
+    decoder.decompress(compressor.finish())
+    assert decoder.eof
+
+@pytest.mark.asyncio
+async def test_negotiated_stream():
+    """Test a compressed CSV stream with the header written once"""
+    async def batches():
+        yield RECORDS[:1]
+        yield RECORDS[1:]
+
+    response = negotiated_stream(batches(), CSV, "gzip", ("company_id", "company_name"))
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body).decode().splitlines() == [
+        "company_id,company_name",
+        'a,"First, Ltd"',
+        "b,Second",
+    ]
@@ -0,0 +1,83 @@
+import os
+import pytest
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app import profiling
+from app.profiling import ProfilingMiddleware, SlowQueryLog, admin_router, current_scope
+
+def make_app(**options) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, **options)
+
+    @app.get("/companies/{company_id}")
+    async def get_company(company_id: str):
+        return {"company_id": company_id}
+
+    app.include_router(admin_router)
+    return app
+
+def test_slow_queries_are_recorded_with_route():
+    """Test that statements over the threshold are kept with the route that issued them"""
+    log = SlowQueryLog(threshold_ms=0, size=2)
+    engine = create_engine("sqlite://")
+    log.attach(SimpleNamespace(sync_engine=engine))
+
+    token = current_scope.set({"method": "GET", "path": "/companies/1", "route": SimpleNamespace(path="/companies/{company_id}")})
+    try:
+        with engine.connect() as conn:
+            for n in range(3):
+                conn.execute(text("SELECT :n"), {"n": n})
+    finally:
+        current_scope.reset(token)
+
+    entries = log.recent()
+    assert len(entries) == 2
+    assert log.recorded_total == 3
+    assert entries[0]["statement"] == "SELECT ?"
+    assert entries[0]["parameters"] == "(2,)"
+    assert entries[0]["route"] == "GET /companies/{company_id}"
+
+def test_fast_queries_are_not_recorded():
+    """Test that statements under the threshold are not kept"""
+    log = SlowQueryLog(threshold_ms=60000, size=10)
+    engine = create_engine("sqlite://")
+    log.attach(SimpleNamespace(sync_engine=engine))
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert log.recent() == []
+
+def test_request_with_admin_token_is_profiled(tmp_path):
+    """Test that the profiling header with the admin token writes an artifact"""
+    client = TestClient(make_app(admin_token="secret", output_dir=str(tmp_path)))
+
+    response = client.get("/companies/1", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    artifact = response.headers["x-profile-artifact"]
+    assert artifact.endswith(".html")
+    assert os.path.isfile(tmp_path / artifact)
+
+    response = client.get("/companies/1", headers={"X-Profile": "wrong"})
+    assert "x-profile-artifact" not in response.headers
+    assert len(os.listdir(tmp_path)) == 1
+
+def test_sampled_requests_are_profiled(tmp_path):
+    """Test that sampling profiles requests without the header, but not streams"""
+    client = TestClient(make_app(sample_rate=1, output_dir=str(tmp_path), output_format="speedscope"))
+
+    assert client.get("/companies/1").headers["x-profile-artifact"].endswith(".speedscope.json")
+    assert "x-profile-artifact" not in client.get("/companies/changes").headers
+
+@pytest.mark.parametrize("token", [None, "wrong"])
+def test_admin_endpoints_require_token(monkeypatch, token):
+    """Test that the admin endpoints reject requests without the admin token"""
+    monkeypatch.setattr(profiling, "PROFILING_ADMIN_TOKEN", "secret")
+    client = TestClient(make_app())
+
+    headers = {"X-Admin-Token": token} if token else {}
+    assert client.get("/admin/slow-queries", headers=headers).status_code == 403
+    response = client.get("/admin/slow-queries", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert "queries" in response.json()
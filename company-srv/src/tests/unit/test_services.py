@@ -1,11 +1,30 @@
 import pytest
-from uuid import UUID
-from unittest.mock import AsyncMock, patch
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import BackgroundTasks, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.services.company_service import create_company, update_company, delete_company
-from app.schemas.company_schema import CompanyCreate, CompanyUpdate
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.dialects import postgresql
+from app.services.company_service import (
+    ConcurrencyConflictError,
+    create_company,
+    update_company,
+    bulk_update_companies,
+    build_company_search_query,
+    get_companies_as_of,
+    get_companies,
+    company_details,
+    delete_company,
+    get_company_changes
+)
+from app.schemas.company_schema import CompanyBulkUpdate, CompanyCreate, CompanyUpdate, CompanyFilter
+from app.routes.company_routes import bulk_update_companies_endpoint
 from app.database.models.company import Company
 from app.database.models.company_version import CompanyVersion
+from app.database.models.company_deletion import CompanyDeletion
+from app.database.models.company_status import CompanyStatus
 
 @pytest.fixture
 def mock_db():
@@ -15,6 +34,29 @@ def mock_db():
     mock.refresh = AsyncMock()
     return mock
 
+@pytest.mark.asyncio
+async def test_create_company_runs_before_commit_in_transaction(mock_db):
+    """Test that before_commit sees the loaded company before the transaction commits"""
+    calls = []
+    mock_db.add = MagicMock()
+    mock_db.flush = AsyncMock(side_effect=lambda: calls.append("flush"))
+    mock_db.refresh = AsyncMock(side_effect=lambda company: calls.append("refresh"))
+    mock_db.commit = AsyncMock(side_effect=lambda: calls.append("commit"))
+
+    async def before_commit(company):
+        calls.append(("before_commit", company.company_code))
+
+    company_data = CompanyCreate(
+        company_code="TEST001",
+        company_name="Test Company",
+        company_country="US",
+        company_accounting_standards="GAAP"
+    )
+    await create_company(mock_db, company_data, "test-user", before_commit=before_commit)
+
+    assert calls.index(("before_commit", "TEST001")) < calls.index("commit")
+    assert calls[calls.index(("before_commit", "TEST001")) - 1] == "refresh"
+
 @pytest.mark.asyncio
 async def test_update_company(mock_db):
     """Test company update service"""
@@ -30,18 +72,16 @@ async def test_update_company(mock_db):
         company_country="US",
         company_accounting_standards="GAAP",
         created_by="test-user",
-        updated_by="test-user"
+        updated_by="test-user",
+        current_version=1
     )
     
     # Setup mocks
     with patch('app.services.company_service.get_company', 
-               new_callable=AsyncMock) as mock_get_company, \
-         patch('app.services.company_service.get_latest_version_number',
-               new_callable=AsyncMock) as mock_get_version:
+               new_callable=AsyncMock) as mock_get_company:
         
         # Configure mocks
         mock_get_company.return_value = existing_company
-        mock_get_version.return_value = 0  # This will make next_version = 1
         
         # Act
         result = await update_company(
@@ -59,7 +99,8 @@ async def test_update_company(mock_db):
         assert mock_db.add.call_count == 1
         version = mock_db.add.call_args.args[0]
         assert isinstance(version, CompanyVersion)
-        assert version.version_number == 1
+        # The next version follows the company's current version
+        assert version.version_number == 2
         assert version.company_id == company_id
         assert version.company_code == existing_company.company_code
         assert version.company_name == existing_company.company_name
@@ -72,6 +113,283 @@ async def test_update_company(mock_db):
         mock_db.commit.assert_called_once()
         mock_db.refresh.assert_called_once_with(existing_company)
 
+@pytest.mark.asyncio
+async def test_update_company_version_mismatch(mock_db):
+    """Test update company when the expected version is outdated"""
+    company_id = UUID("12345678-1234-5678-1234-567812345678")
+    existing_company = Company(
+        company_code="TEST001",
+        company_name="Original Company",
+        current_version=3
+    )
+    
+    with patch('app.services.company_service.get_company', 
+               new_callable=AsyncMock) as mock_get_company:
+        mock_get_company.return_value = existing_company
+        
+        with pytest.raises(ConcurrencyConflictError):
+            await update_company(
+                db=mock_db,
+                company_id=company_id,
+                update_data=CompanyUpdate(company_name="Updated Company"),
+                user_id="test-user",
+                expected_version=2
+            )
+        
+        mock_db.add.assert_not_called()
+        mock_db.commit.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_update_company_concurrent_write(mock_db):
+    """Test update company when another writer commits first"""
+    company_id = UUID("12345678-1234-5678-1234-567812345678")
+    existing_company = Company(
+        company_code="TEST001",
+        company_name="Original Company",
+        current_version=1
+    )
+    # The versioned UPDATE matched no row
+    mock_db.commit.side_effect = StaleDataError("0 rows matched")
+    
+    with patch('app.services.company_service.get_company', 
+               new_callable=AsyncMock) as mock_get_company:
+        mock_get_company.return_value = existing_company
+        
+        with pytest.raises(ConcurrencyConflictError):
+            await update_company(
+                db=mock_db,
+                company_id=company_id,
+                update_data=CompanyUpdate(company_name="Updated Company"),
+                user_id="test-user",
+                expected_version=1
+            )
+        
+        mock_db.rollback.assert_called_once()
+
+def test_company_filter_requires_criterion():
+    """Test that an empty bulk filter is rejected instead of matching every company"""
+    with pytest.raises(ValueError):
+        CompanyFilter()
+    assert CompanyFilter(company_country="DE").company_country == "DE"
+
+def test_company_bulk_update_rejects_company_code():
+    """Test that a bulk update cannot give many companies the same unique code"""
+    with pytest.raises(ValueError):
+        CompanyBulkUpdate(filter={"company_country": "DE"}, update={"company_code": "SHARED"})
+    bulk_update = CompanyBulkUpdate(filter={"company_country": "DE"}, update={"company_name": "Renamed"})
+    assert bulk_update.update.company_name == "Renamed"
+
+@pytest.mark.asyncio
+async def test_bulk_update_constraint_violation_is_conflict(mock_db):
+    """Test that a constraint violation in a bulk update is a 409 without the database error"""
+    bulk_update = CompanyBulkUpdate(filter={"company_country": "DE"}, update={"company_name": "Renamed"})
+    error = IntegrityError("UPDATE companies ...", {}, Exception("duplicate key value violates unique constraint"))
+    with patch("app.routes.company_routes.bulk_update_companies", AsyncMock(side_effect=error)):
+        with pytest.raises(HTTPException) as exc_info:
+            await bulk_update_companies_endpoint(
+                bulk_update, BackgroundTasks(), current_user={"user_id": "test-user"}, db=mock_db
+            )
+    assert exc_info.value.status_code == 409
+    assert "duplicate key" not in exc_info.value.detail
+
+@pytest.mark.asyncio
+async def test_bulk_update_is_audited_with_one_batch(mock_db):
+    """Test that a bulk update schedules a single batch audit call for all updated companies"""
+    bulk_update = CompanyBulkUpdate(filter={"company_country": "DE"}, update={"company_name": "Renamed"})
+    updated = [MagicMock(company_id=uuid4(), version_number=4), MagicMock(company_id=uuid4(), version_number=2)]
+    background_tasks = BackgroundTasks()
+    with patch("app.routes.company_routes.bulk_update_companies", AsyncMock(return_value=updated)):
+        response = await bulk_update_companies_endpoint(
+            bulk_update, background_tasks, current_user={"user_id": "test-user"}, db=mock_db
+        )
+
+    assert response.updated_count == 2
+    [task] = background_tasks.tasks
+    assert task.func.__name__ == "record_batch"
+    assert task.args == ("UPDATE", [(row.company_id, row.version_number) for row in updated], "test-user")
+    assert task.kwargs["new_data"] == {"company_name": "Renamed"}
+
+@pytest.mark.asyncio
+async def test_bulk_update_companies(mock_db):
+    """Test that a bulk update is issued as one statement"""
+    updated = [(uuid4(), 2), (uuid4(), 5), (uuid4(), 3)]
+    mock_db.execute.return_value = MagicMock(all=MagicMock(return_value=updated))
+    
+    result = await bulk_update_companies(
+        db=mock_db,
+        company_filter=CompanyFilter(company_country="DE"),
+        update_data=CompanyUpdate(company_accounting_standards="IFRS"),
+        user_id="test-user",
+        change_reason="Regulatory change"
+    )
+    
+    assert result == updated
+    mock_db.execute.assert_called_once()
+    sql = str(mock_db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "UPDATE companies SET company_accounting_standards" in sql
+    assert "current_version=(companies.current_version +" in sql
+    assert "INSERT INTO company_versions" in sql
+    assert "WHERE companies.company_country =" in sql
+    mock_db.commit.assert_called_once()
+
+def test_build_company_search_query():
+    """Test search query construction for substring and fuzzy name matches"""
+    company_filter = CompanyFilter.model_construct(company_country="DE")
+    
+    sql = str(build_company_search_query(company_filter, name="50%_off").compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    ))
+    assert "companies.company_country = 'DE'" in sql
+    # Wildcards in the search term are matched literally
+    assert "ILIKE '%%50/%%/_off%%' ESCAPE '/'" in sql
+    assert "ORDER BY companies.company_name, companies.company_id" in sql
+    
+    sql = str(build_company_search_query(company_filter, name="acme", fuzzy=True).compile(
+        dialect=postgresql.dialect()
+    ))
+    assert "companies.company_name %% " in sql
+    assert "ORDER BY similarity(companies.company_name" in sql
+
+@pytest.mark.asyncio
+async def test_get_companies_as_of(mock_db):
+    """Test point-in-time listing via DISTINCT ON over the version history"""
+    company_id = UUID("12345678-1234-5678-1234-567812345678")
+    changed_at = datetime(2024, 3, 30, 12, 0, tzinfo=timezone.utc)
+    created_at = datetime(2024, 1, 2, 9, 0, tzinfo=timezone.utc)
+    version = CompanyVersion(
+        company_id=company_id,
+        version_number=4,
+        is_snapshot=True,
+        company_code="TEST001",
+        company_name="Quarter End Name",
+        company_country="DE",
+        company_accounting_standards="HGB",
+        changed_at=changed_at,
+        changed_by="editor",
+        change_type="UPDATE"
+    )
+    row = MagicMock(created_at=created_at, created_by="creator")
+    row.__getitem__.side_effect = lambda index: version
+    mock_db.execute.return_value = MagicMock(all=MagicMock(return_value=[row]))
+    
+    companies = await get_companies_as_of(mock_db, datetime(2024, 3, 31, 23, 59, 59), 0, 10)
+    
+    assert companies == [{
+        "company_id": company_id,
+        "company_code": "TEST001",
+        "company_name": "Quarter End Name",
+        "company_country": "DE",
+        "company_accounting_standards": "HGB",
+        "status_id": None,
+        "status_reason": None,
+        "current_version": 4,
+        "created_at": created_at,
+        "created_by": "creator",
+        "updated_at": changed_at,
+        "updated_by": "editor"
+    }]
+    sql = str(mock_db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "DISTINCT ON (company_versions.company_id)" in sql
+    assert "ORDER BY company_versions.company_id, company_versions.changed_at DESC" in sql
+    assert "latest_versions.change_type !=" in sql
+    # Creation data comes from the first version, which deleted companies keep
+    assert "created_versions.version_number = " in sql
+    assert "JOIN companies" not in sql
+
+@pytest.mark.asyncio
+async def test_get_companies_with_includes(mock_db):
+    """Test that included relationships are eager loaded with the page"""
+    mock_db.execute.return_value = MagicMock(
+        scalars=MagicMock(return_value=MagicMock(all=MagicMock(return_value=[])))
+    )
+
+    await get_companies(mock_db, 0, 10, ["status", "versions"])
+
+    query = mock_db.execute.call_args.args[0]
+    loaded = {option.path[1].key for option in query._with_options}
+    assert loaded == {"status", "versions"}
+
+@pytest.mark.asyncio
+async def test_get_companies_with_fields(mock_db):
+    """Test that a fieldset selects only its columns and returns plain rows"""
+    company_id = uuid4()
+    row = MagicMock(_mapping={"company_id": company_id, "company_name": "Test Company"})
+    mock_db.execute.return_value = [row]
+
+    companies = await get_companies(mock_db, 0, 10, fields=("company_name", "company_id"))
+
+    assert companies == [{"company_id": company_id, "company_name": "Test Company"}]
+    sql = str(mock_db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert sql.startswith("SELECT companies.company_name, companies.company_id \nFROM companies")
+
+@pytest.mark.asyncio
+async def test_company_details(mock_db):
+    """Test serialization of included relationships with delta versions rebuilt once"""
+    company_id = uuid4()
+    now = datetime(2024, 3, 30, 12, 0, tzinfo=timezone.utc)
+    version_fields = {"company_id": company_id, "changed_at": now, "changed_by": "editor", "change_type": "UPDATE"}
+    company = Company(
+        company_id=company_id,
+        company_code="TEST001",
+        company_name="Renamed",
+        company_country="DE",
+        company_accounting_standards="HGB",
+        current_version=2,
+        created_at=now,
+        created_by="creator",
+        updated_at=now,
+        updated_by="editor"
+    )
+    company.status = CompanyStatus(
+        status_id=uuid4(),
+        status_code="ACTIVE",
+        is_active=True,
+        created_at=now,
+        created_by="creator",
+        updated_at=now,
+        updated_by="creator"
+    )
+    snapshot = CompanyVersion(
+        version_id=uuid4(),
+        version_number=1,
+        is_snapshot=True,
+        company_code="TEST001",
+        company_name="Original",
+        company_country="DE",
+        company_accounting_standards="HGB",
+        **version_fields
+    )
+    delta = CompanyVersion(
+        version_id=uuid4(),
+        version_number=2,
+        is_snapshot=False,
+        changes={"company_name": "Renamed"},
+        **version_fields
+    )
+    company.versions = [snapshot, delta]
+    company.latest_version = delta
+    rebuilt = MagicMock(company_id=company_id, version_number=2, is_snapshot=False, changes={"company_name": "Renamed"},
+                        status_id=None, status_reason=None, company_code="TEST001", company_name="Renamed",
+                        company_country="DE", company_accounting_standards="HGB")
+    mock_db.execute.return_value = [
+        MagicMock(company_id=company_id, version_number=1, is_snapshot=True, changes=None,
+                  status_id=None, status_reason=None, company_code="TEST001", company_name="Original",
+                  company_country="DE", company_accounting_standards="HGB"),
+        rebuilt
+    ]
+
+    [data] = await company_details(mock_db, [company], ["status", "latest_version", "versions"])
+
+    assert data["status"]["status_code"] == "ACTIVE"
+    assert data["latest_version"]["company_name"] == "Renamed"
+    assert [v["version_number"] for v in data["versions"]] == [2, 1]
+    assert data["versions"][1]["company_name"] == "Original"
+    # latest_version and versions share one reconstruction query
+    mock_db.execute.assert_called_once()
+
+    [plain] = await company_details(mock_db, [company])
+    assert not {"status", "latest_version", "versions"} & plain.keys()
+
 @pytest.mark.asyncio
 async def test_update_company_not_found(mock_db):
     """Test update company when company doesn't exist"""
@@ -130,4 +448,65 @@ async def test_update_company_no_changes(mock_db):
         
         assert str(exc_info.value) == "At least one non-empty field must be provided for update"
         mock_db.add.assert_not_called()
-        mock_db.commit.assert_not_called()
\ No newline at end of file
+        mock_db.commit.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_company_changes(mock_db):
+    """Test that versions and deletions are merged in feed order after the position"""
+    company_id = uuid4()
+    versions = [
+        CompanyVersion(company_id=company_id, version_number=n, is_snapshot=True, change_txid=txid, change_seq=seq)
+        for n, (txid, seq) in enumerate([(100, 7), (102, 9)], start=1)
+    ]
+    deletion = CompanyDeletion(company_id=uuid4(), version_number=3, change_txid=101, change_seq=8)
+    mock_db.execute.side_effect = [
+        MagicMock(scalars=MagicMock(return_value=MagicMock(all=MagicMock(return_value=versions)))),
+        MagicMock(scalars=MagicMock(return_value=MagicMock(all=MagicMock(return_value=[deletion]))))
+    ]
+
+    changes, position = await get_company_changes(mock_db, (90, 5), limit=2)
+
+    assert changes == [versions[0], deletion]
+    assert position == (101, 8)
+    sql = str(mock_db.execute.call_args_list[0].args[0].compile(dialect=postgresql.dialect()))
+    assert "company_versions.change_txid < txid_snapshot_xmin(txid_current_snapshot())" in sql
+    assert "(company_versions.change_txid, company_versions.change_seq) >" in sql
+    assert "ORDER BY company_versions.change_txid, company_versions.change_seq" in sql
+
+@pytest.mark.asyncio
+async def test_get_company_changes_none_yet(mock_db):
+    """Test that the position is kept when there are no new changes"""
+    mock_db.execute.return_value = MagicMock(
+        scalars=MagicMock(return_value=MagicMock(all=MagicMock(return_value=[])))
+    )
+
+    assert await get_company_changes(mock_db, (90, 5)) == ([], (90, 5))
+
+@pytest.mark.asyncio
+async def test_delete_company_keeps_history(mock_db):
+    """Test that deleting a company ends its history with a DELETE version instead of removing it"""
+    company = Company(
+        company_id=uuid4(),
+        company_code="TEST001",
+        company_name="Test Company",
+        company_country="DE",
+        company_accounting_standards="HGB",
+        current_version=3
+    )
+    with patch('app.services.company_service.get_company', new_callable=AsyncMock, return_value=company):
+        await delete_company(mock_db, company.company_id, "test-user", "duplicate")
+
+    [final_version] = [call.args[0] for call in mock_db.add.call_args_list]
+    assert isinstance(final_version, CompanyVersion)
+    assert final_version.change_type == "DELETE"
+    assert final_version.version_number == 4
+    assert final_version.change_reason == "duplicate"
+    mock_db.delete.assert_awaited_once_with(company)
+    mock_db.commit.assert_called_once()
+
+def test_company_delete_leaves_versions_alone():
+    """Test that the ORM neither deletes nor orphans version rows when a company is deleted"""
+    versions = Company.__mapper__.relationships["versions"]
+    assert versions.passive_deletes == "all"
+    assert "delete" not in versions.cascade
+    assert not CompanyVersion.__table__.c.company_id.foreign_keys
@@ -0,0 +1,99 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from app.database import config
+from app.read_your_writes import LAST_WRITE_COOKIE, LAST_WRITE_HEADER, ReadYourWritesMiddleware, mark_write, wrote_recently
+
+def make_request(headers=None):
+    raw = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({"type": "http", "headers": raw, "client": ("10.0.0.1", 12345)})
+
+def test_wrote_recently_reads_cookie_and_header():
+    """Test that the write time comes back from the client as a cookie or a header"""
+    with patch("app.read_your_writes.time.time", return_value=100.0):
+        assert wrote_recently(make_request({"Cookie": f"{LAST_WRITE_COOKIE}=98.5"}), window=5)
+        assert wrote_recently(make_request({LAST_WRITE_HEADER: "98.5"}), window=5)
+        assert not wrote_recently(make_request(), window=5)
+        assert not wrote_recently(None, window=5)
+
+def test_wrote_recently_expires_with_window():
+    """Test that a write only routes reads to the primary for the configured window"""
+    with patch("app.read_your_writes.time.time", return_value=105.0):
+        assert not wrote_recently(make_request({LAST_WRITE_HEADER: "100"}), window=5)
+        assert not wrote_recently(make_request({LAST_WRITE_HEADER: "not-a-time"}), window=5)
+        # Forged or skewed times in the future are bounded by the window too
+        assert not wrote_recently(make_request({LAST_WRITE_HEADER: "1000000"}), window=5)
+
+def test_middleware_hands_write_time_to_writers_only():
+    """Test that only responses to requests that wrote carry the write time"""
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware, window=5)
+
+    @app.post("/write")
+    async def write(request: Request):
+        mark_write(request)
+        return {}
+
+    @app.get("/read")
+    async def read():
+        return {}
+
+    client = TestClient(app)
+    with patch("app.read_your_writes.time.time", return_value=100.0):
+        response = client.post("/write")
+    assert response.headers[LAST_WRITE_HEADER] == "100.000"
+    assert response.cookies[LAST_WRITE_COOKIE] == "100.000"
+    assert "Max-Age=5" in response.headers["set-cookie"]
+
+    response = TestClient(app).get("/read")
+    assert LAST_WRITE_HEADER not in response.headers
+    assert "set-cookie" not in response.headers
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica_until_client_writes():
+    """Test read-your-writes routing between replica and primary sessions"""
+    primary_session = MagicMock(name="primary")
+    replica_session = MagicMock(name="replica")
+
+    def factory(session):
+        context = MagicMock()
+        async def enter():
+            return session
+        async def exit(*args):
+            return False
+        context.__aenter__ = lambda self: enter()
+        context.__aexit__ = lambda self, *args: exit()
+        return MagicMock(return_value=context)
+
+    with patch.object(config, "read_engine", MagicMock(name="read_engine")), \
+         patch.object(config, "async_session", factory(primary_session)), \
+         patch.object(config, "async_read_session", factory(replica_session)), \
+         patch("app.read_your_writes.time.time", return_value=100.0):
+
+        reader = config.get_read_db_session(make_request())
+        assert await reader.__anext__() is replica_session
+
+        request = make_request()
+        writer = config.get_db_session(request)
+        assert await writer.__anext__() is primary_session
+        with pytest.raises(StopAsyncIteration):
+            await writer.__anext__()
+        assert request.state.wrote
+
+        # The next request may reach any worker; it carries the write time
+        reader = config.get_read_db_session(make_request({"Cookie": f"{LAST_WRITE_COOKIE}=99.0"}))
+        assert await reader.__anext__() is primary_session
+
+        other_reader = config.get_read_db_session(make_request())
+        assert await other_reader.__anext__() is replica_session
+
+@pytest.mark.parametrize("with_replica", [True, False])
+def test_recent_writers_never_coalesce(with_replica):
+    """Test that reads of a client that just wrote are not coalesced, with or without a replica"""
+    read_engine = MagicMock(name="read_engine") if with_replica else config.engine
+    with patch.object(config, "read_engine", read_engine), \
+         patch("app.read_your_writes.time.time", return_value=100.0):
+        assert config.coalescing_target(make_request({LAST_WRITE_HEADER: "99.0"})) is None
+        assert config.coalescing_target(make_request()) == ("replica" if with_replica else "primary")
@@ -0,0 +1,32 @@
+from pathlib import Path
+import pytest
+
+# Each service is built and deployed on its own (docker build context, requirements,
+# pyproject), so modules both need are copied rather than shared as a package.
+# The copies must stay identical: change both, then this test passes again.
+SERVICES_ROOT = Path(__file__).resolve().parents[4]
+COMPANY_SRC = SERVICES_ROOT / "company-srv" / "src"
+AUDIT_LOG_SRC = SERVICES_ROOT / "audit-log-srv" / "src"
+
+SHARED_MODULES = [
+    ("main.py", "main.py"),
+    ("app/admission.py", "app/admission.py"),
+    ("app/negotiation.py", "app/negotiation.py"),
+    ("app/profiling.py", "app/profiling.py"),
+    ("app/read_your_writes.py", "app/read_your_writes.py"),
+    ("app/schema_migrations.py", "app/schema_migrations.py"),
+    ("app/secrets_provider.py", "app/secrets_provider.py"),
+    ("app/single_flight.py", "app/single_flight.py"),
+    ("app/tracing.py", "app/tracing.py"),
+    ("app/services/idempotency_service.py", "app/idempotency.py")
+]
+
+@pytest.mark.skipif(not AUDIT_LOG_SRC.is_dir(), reason="needs the audit-log-srv sources next to company-srv")
+@pytest.mark.parametrize("company_path,audit_log_path", SHARED_MODULES)
+def test_shared_module_copies_are_identical(company_path, audit_log_path):
+    """Test that the modules copied into both services have not diverged"""
+    company_copy = (COMPANY_SRC / company_path).read_text()
+    audit_log_copy = (AUDIT_LOG_SRC / audit_log_path).read_text()
+
+    assert company_copy == audit_log_copy, \
+        f"company-srv/src/{company_path} and audit-log-srv/src/{audit_log_path} differ; apply the change to both"
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from app.single_flight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Test that identical concurrent calls run once and all get the result"""
+    flight = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"name": "Acme"}
+
+    tasks = [asyncio.create_task(flight.do(("company", "replica", 1), load)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert flight.stats()["company"]["in_flight"] == 1
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert calls == 1
+    assert results == [{"name": "Acme"}] * 5
+    assert flight.stats() == {"company": {"executed": 1, "coalesced": 4, "in_flight": 0}}
+
+@pytest.mark.asyncio
+async def test_different_keys_are_not_coalesced():
+    """Test that calls with different keys run separately"""
+    flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0)
+        return 1
+
+    await asyncio.gather(
+        flight.do(("company", "replica", 1), load),
+        flight.do(("company", "replica", 2), load)
+    )
+    assert flight.stats()["company"]["executed"] == 2
+    assert flight.stats()["company"]["coalesced"] == 0
+
+@pytest.mark.asyncio
+async def test_exception_is_shared_with_waiters():
+    """Test that the error of the shared call is raised to every caller"""
+    flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0)
+        raise ValueError("database unavailable")
+
+    results = await asyncio.gather(
+        *(flight.do(("company", "replica", 1), load) for _ in range(3)),
+        return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["company"]["executed"] == 1
+
+@pytest.mark.asyncio
+async def test_waiters_rerun_when_leader_is_cancelled():
+    """Test that waiters run the call themselves when the executing caller is cancelled"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    leader = asyncio.create_task(flight.do(("company", "replica", 1), load))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(flight.do(("company", "replica", 1), load))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await waiter == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert flight.stats()["company"] == {"executed": 2, "coalesced": 0, "in_flight": 0}
+
+@pytest.mark.asyncio
+async def test_none_key_bypasses_coalescing():
+    """Test that a key of None always executes the call"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+
+    await asyncio.gather(flight.do(None, load), flight.do(None, load))
+    assert calls == 2
+    assert flight.stats() == {}
@@ -0,0 +1,177 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app import schema_migrations
+from app.database import config
+from app.database.migrations import MIGRATIONS
+from app.database.models.company import Company
+from app.database.models.company_version import CompanyVersion
+
+def mock_engine(version=None, error=None):
+    """Engine whose connection returns the given schema version (or raises)"""
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = version
+    conn = AsyncMock()
+    conn.execute = AsyncMock(return_value=result, side_effect=error)
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=conn)
+    context.__aexit__ = AsyncMock(return_value=False)
+    engine = MagicMock()
+    engine.connect.return_value = context
+    return engine, conn
+
+@pytest.mark.asyncio
+async def test_verify_schema_version_matches():
+    """Test that startup verification passes with a single query"""
+    engine, conn = mock_engine(version=config.SCHEMA_VERSION)
+    with patch.object(config, "engine", engine):
+        await config.verify_schema_version()
+    assert conn.execute.await_count == 1
+
+@pytest.mark.asyncio
+async def test_verify_schema_version_mismatch():
+    """Test that a stale database fails fast"""
+    engine, _ = mock_engine(version=config.SCHEMA_VERSION - 1)
+    with patch.object(config, "engine", engine):
+        with pytest.raises(RuntimeError) as exc_info:
+            await config.verify_schema_version()
+    assert "does not match" in str(exc_info.value)
+
+@pytest.mark.asyncio
+async def test_verify_schema_version_missing_table():
+    """Test that an uninitialized database fails fast"""
+    engine, _ = mock_engine(error=Exception("relation \"schema_version\" does not exist"))
+    with patch.object(config, "engine", engine):
+        with pytest.raises(RuntimeError):
+            await config.verify_schema_version()
+
+@pytest.mark.asyncio
+async def test_setup_db_verify_mode_skips_create_all():
+    """Test that verify mode never runs DDL"""
+    with patch.object(config, "DB_STARTUP_MODE", "verify"), \
+         patch.object(config, "verify_schema_version", new_callable=AsyncMock) as mock_verify, \
+         patch.object(config, "engine") as mock_engine_:
+        await config.setup_db()
+    mock_verify.assert_awaited_once()
+    mock_engine_.begin.assert_not_called()
+
+def reflected(table, drop=(), not_null=()):
+    """Columns of the table as the inspector reports them, less the dropped ones"""
+    return [
+        {"name": column.name, "nullable": column.nullable and column.name not in not_null}
+        for column in table.columns if column.name not in drop
+    ]
+
+def test_schema_drift_reports_missing_and_not_null_columns():
+    """Test that columns a migration missed are reported"""
+    companies = Company.__table__
+    inspector = MagicMock()
+    inspector.get_columns.side_effect = lambda name, schema=None: (
+        reflected(companies, drop=("current_version",), not_null=("status_id",))
+        if name == companies.name else reflected(config.Base.metadata.tables[f"{schema}.{name}" if schema else name])
+    )
+    with patch.object(schema_migrations, "inspect", return_value=inspector):
+        drift = schema_migrations.schema_drift(MagicMock(), config.Base.metadata)
+    assert sorted(drift) == [
+        f"{companies.fullname}.current_version is missing",
+        f"{companies.fullname}.status_id is NOT NULL"
+    ]
+
+def test_pending_migrations_follow_the_stamped_version():
+    """Test that only the steps after the stamped version run, in order"""
+    migrations = {1: ["one"], 3: ["three"], 4: []}
+    assert schema_migrations.pending_migrations(migrations, 0, 4) == [(1, ["one"]), (3, ["three"])]
+    assert schema_migrations.pending_migrations(migrations, 1, 4) == [(3, ["three"])]
+    assert schema_migrations.pending_migrations(migrations, 4, 4) == []
+
+@pytest.mark.asyncio
+async def test_migrate_qualifies_names_with_the_schema():
+    """Test that migrations run against the configured schema"""
+    conn = AsyncMock()
+    await schema_migrations.migrate(conn, {2: ["ALTER TABLE {schema}companies ADD COLUMN x INT"]}, 1, 2, "tenant")
+    assert str(conn.execute.await_args.args[0]) == 'ALTER TABLE "tenant".companies ADD COLUMN x INT'
+
+def test_company_migrations_cover_known_versions():
+    """Test that every migration step belongs to a released version and formats cleanly"""
+    assert max(MIGRATIONS) <= config.SCHEMA_VERSION
+    for statements in MIGRATIONS.values():
+        for statement in statements:
+            assert "{" not in statement.format(schema='"tenant".')
+
+def migrating_engine(stored_version, drift=()):
+    """Engine whose transaction reports the stored version and the drift left after migrating"""
+    def run_sync(function, *args):
+        if function is schema_migrations.stored_schema_version:
+            return stored_version
+        if function is schema_migrations.schema_drift:
+            return list(drift)
+        return None
+    conn = AsyncMock()
+    conn.run_sync = AsyncMock(side_effect=run_sync)
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=conn)
+    context.__aexit__ = AsyncMock(return_value=False)
+    engine = MagicMock()
+    engine.begin.return_value = context
+    return engine, conn
+
+def stamped(conn):
+    return [call for call in conn.execute.await_args_list if "schema_version" in str(call.args[0])]
+
+@pytest.mark.asyncio
+async def test_migrate_db_migrates_existing_tables_then_stamps():
+    """Test that an older database is migrated from its stamped version"""
+    engine, conn = migrating_engine(stored_version=3)
+    with patch.object(config, "engine", engine), patch.object(config, "migrate", AsyncMock()) as mock_migrate:
+        await config.migrate_db()
+    mock_migrate.assert_awaited_once_with(conn, MIGRATIONS, 3, config.SCHEMA_VERSION, config.DATABASE_SCHEMA)
+    assert len(stamped(conn)) == 1
+
+@pytest.mark.asyncio
+async def test_migrate_db_creates_new_database_without_migrating():
+    """Test that a database without tables is created at the current version"""
+    engine, conn = migrating_engine(stored_version=None)
+    with patch.object(config, "engine", engine), patch.object(config, "migrate", AsyncMock()) as mock_migrate:
+        await config.migrate_db()
+    mock_migrate.assert_not_awaited()
+    assert len(stamped(conn)) == 1
+
+@pytest.mark.asyncio
+async def test_migrate_db_refuses_newer_database():
+    """Test that older code never restamps a database migrated by newer code"""
+    engine, conn = migrating_engine(stored_version=config.SCHEMA_VERSION + 1)
+    with patch.object(config, "engine", engine):
+        with pytest.raises(RuntimeError) as exc_info:
+            await config.migrate_db()
+    assert "newer" in str(exc_info.value)
+    assert stamped(conn) == []
+
+@pytest.mark.asyncio
+async def test_migrate_db_does_not_stamp_drifted_tables():
+    """Test that tables a migration missed fail the upgrade instead of being stamped"""
+    engine, conn = migrating_engine(stored_version=1, drift=["companies.current_version is missing"])
+    with patch.object(config, "engine", engine), patch.object(config, "migrate", AsyncMock()):
+        with pytest.raises(RuntimeError) as exc_info:
+            await config.migrate_db()
+    assert "companies.current_version is missing" in str(exc_info.value)
+    assert stamped(conn) == []
+
+def test_company_migrations_backfill_current_version():
+    """Test that existing companies continue their history instead of restarting at version 1"""
+    statements = " ".join(MIGRATIONS[3])
+    assert "ADD COLUMN IF NOT EXISTS current_version" in statements
+    assert "max(version_number)" in statements
+
+def test_version_numbers_are_unique_per_company():
+    """Test that a version number written twice fails loudly"""
+    index = next(
+        index for index in CompanyVersion.__table__.indexes
+        if index.name == "ix_company_versions_company_id_version_number"
+    )
+    assert index.unique
+
+def test_company_migrations_mark_existing_versions_as_snapshots():
+    """Test that history written before delta storage stays readable as snapshots"""
+    statements = " ".join(MIGRATIONS[5])
+    assert "SET is_snapshot = true WHERE is_snapshot IS NULL" in statements
+    for field in ("company_code", "company_name", "company_country", "company_accounting_standards"):
+        assert f"ALTER COLUMN {field} DROP NOT NULL" in statements
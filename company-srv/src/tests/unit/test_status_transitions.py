@@ -0,0 +1,175 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+from sqlalchemy.dialects import postgresql
+from app.database.models.company import Company
+from app.schemas.company_schema import CompanyFilter
+from app.services import company_status_service
+from app.services.company_status_service import (
+    InvalidStatusTransitionError,
+    StatusCache,
+    status_transition_allowed,
+    validate_status_transition
+)
+from app.services.company_service import (
+    ConcurrencyConflictError,
+    bulk_transition_company_status,
+    transition_company_status
+)
+
+ACTIVE_ID = uuid4()
+RETIRED_ID = uuid4()
+
+DRAFT_ID = uuid4()
+
+def status_rows():
+    return [
+        MagicMock(status_id=ACTIVE_ID, status_code="ACTIVE", is_active=True, next_status_ids=None),
+        MagicMock(status_id=RETIRED_ID, status_code="RETIRED", is_active=False, next_status_ids=None),
+        MagicMock(status_id=DRAFT_ID, status_code="DRAFT", is_active=True, next_status_ids=[ACTIVE_ID]),
+    ]
+
+def compiled(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+@pytest.fixture(autouse=True)
+def fresh_status_cache():
+    with patch.object(company_status_service, "status_cache", StatusCache(ttl=60)):
+        yield
+
+@pytest.mark.asyncio
+async def test_status_cache_loads_once(mock_db):
+    """Test that statuses are loaded with one query and reused until invalidated"""
+    mock_db.execute.return_value = status_rows()
+
+    await validate_status_transition(mock_db, ACTIVE_ID)
+    await validate_status_transition(mock_db, ACTIVE_ID)
+    assert mock_db.execute.call_count == 1
+
+    company_status_service.status_cache.invalidate()
+    await validate_status_transition(mock_db, ACTIVE_ID)
+    assert mock_db.execute.call_count == 2
+
+@pytest.mark.asyncio
+async def test_unknown_or_inactive_status_is_rejected(mock_db):
+    """Test that transitions to unknown or inactive statuses are rejected"""
+    mock_db.execute.return_value = status_rows()
+
+    with pytest.raises(InvalidStatusTransitionError):
+        await validate_status_transition(mock_db, RETIRED_ID)
+    with pytest.raises(InvalidStatusTransitionError):
+        await validate_status_transition(mock_db, uuid4())
+
+@pytest.mark.asyncio
+async def test_transition_rules_restrict_next_status(mock_db):
+    """Test that a status listing its next statuses only allows moving to those"""
+    mock_db.execute.return_value = status_rows()
+
+    await validate_status_transition(mock_db, ACTIVE_ID, DRAFT_ID)
+    await validate_status_transition(mock_db, DRAFT_ID, ACTIVE_ID)
+    with pytest.raises(InvalidStatusTransitionError, match="cannot move"):
+        await validate_status_transition(mock_db, DRAFT_ID, DRAFT_ID)
+
+def test_transition_rules_are_rechecked_by_the_update():
+    """Test that the UPDATE condition re-reads the target's active flag and the current status' rules"""
+    condition = status_transition_allowed(ACTIVE_ID, Company.__table__.c.status_id)
+
+    sql = compiled(condition)
+    assert "target_status.is_active" in sql
+    assert "companies.status_id IS NULL" in sql
+    assert "current_status.next_status_ids IS NULL" in sql
+    assert "current_status.next_status_ids @> " in sql
+
+@pytest.mark.asyncio
+async def test_transition_company_status(mock_db):
+    """Test single status transition with a version record"""
+    company_id = uuid4()
+    company = Company(
+        company_id=company_id,
+        company_code="TEST001",
+        company_name="Test Company",
+        company_country="DE",
+        company_accounting_standards="HGB",
+        current_version=2
+    )
+    mock_db.execute.side_effect = [
+        status_rows(),
+        MagicMock(all=MagicMock(return_value=[(uuid4(), 3)]))
+    ]
+
+    with patch('app.services.company_service.get_company', new_callable=AsyncMock) as mock_get_company:
+        mock_get_company.return_value = company
+        result = await transition_company_status(
+            mock_db, company_id, ACTIVE_ID, "test-user", status_reason="Onboarded"
+        )
+
+    assert result is company
+    sql = compiled(mock_db.execute.call_args.args[0])
+    assert "UPDATE companies SET status_id=" in sql
+    assert "companies.current_version = " in sql
+    assert "target_status.is_active" in sql
+    # The rule subquery correlates to the updated row instead of scanning companies again
+    assert "FROM company_statuses AS current_status, companies" not in sql
+    assert "current_status.status_id = companies.status_id" in sql
+    assert "INSERT INTO company_versions" in sql
+    mock_db.commit.assert_called_once()
+    mock_db.refresh.assert_awaited_once_with(company)
+    company.status_id = ACTIVE_ID
+
+    # Moving to the status the company already has is not a transition
+    with patch('app.services.company_service.get_company', new_callable=AsyncMock) as mock_get_company:
+        mock_get_company.return_value = company
+        with pytest.raises(InvalidStatusTransitionError):
+            await transition_company_status(mock_db, company_id, ACTIVE_ID, "test-user")
+
+@pytest.mark.asyncio
+async def test_transition_to_status_deactivated_elsewhere(mock_db):
+    """Test that a status deactivated after this worker cached it is rejected by the UPDATE"""
+    company = Company(company_id=uuid4(), company_code="TEST001", current_version=2)
+    deactivated = [MagicMock(status_id=ACTIVE_ID, status_code="ACTIVE", is_active=False, next_status_ids=None)]
+    mock_db.execute.side_effect = [
+        status_rows(),
+        MagicMock(all=MagicMock(return_value=[])),
+        deactivated
+    ]
+
+    with patch('app.services.company_service.get_company', new_callable=AsyncMock, return_value=company):
+        with pytest.raises(InvalidStatusTransitionError, match="not active"):
+            await transition_company_status(mock_db, company.company_id, ACTIVE_ID, "test-user")
+
+    mock_db.rollback.assert_awaited_once()
+    mock_db.commit.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_transition_conflicts_with_concurrent_update(mock_db):
+    """Test that an UPDATE missing only because of a newer version is a conflict"""
+    company = Company(company_id=uuid4(), company_code="TEST001", current_version=2)
+    mock_db.execute.side_effect = [
+        status_rows(),
+        MagicMock(all=MagicMock(return_value=[])),
+        status_rows()
+    ]
+
+    with patch('app.services.company_service.get_company', new_callable=AsyncMock, return_value=company):
+        with pytest.raises(ConcurrencyConflictError):
+            await transition_company_status(mock_db, company.company_id, ACTIVE_ID, "test-user")
+
+@pytest.mark.asyncio
+async def test_bulk_transition_company_status(mock_db):
+    """Test that bulk transitions run as one set-based statement"""
+    mock_db.execute.side_effect = [
+        status_rows(),
+        MagicMock(all=MagicMock(return_value=[(uuid4(), 3)] * 42))
+    ]
+
+    updated = await bulk_transition_company_status(
+        mock_db, CompanyFilter(company_country="DE"), ACTIVE_ID, "test-user", status_reason="Month end"
+    )
+
+    assert len(updated) == 42
+    sql = compiled(mock_db.execute.call_args.args[0])
+    assert "UPDATE companies SET status_id=" in sql
+    assert "companies.status_id IS DISTINCT FROM" in sql
+    assert "target_status.is_active" in sql
+    assert "INSERT INTO company_versions" in sql
+    mock_db.commit.assert_called_once()
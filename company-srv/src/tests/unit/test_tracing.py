@@ -0,0 +1,110 @@
+import json
+import httpx
+import pytest
+from uuid import UUID, uuid4
+from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from app import audit_client, tracing
+from app.audit_client import AuditLogClient, audit_user_id
+from app.tracing import FileSpanExporter, traced
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    """Provider writing spans to a file, used by @traced"""
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(FileSpanExporter(str(tmp_path / "spans.jsonl"))))
+    monkeypatch.setattr(tracing, "tracer", provider.get_tracer("test"))
+    return provider
+
+def read_spans(tmp_path):
+    with open(tmp_path / "spans.jsonl") as spans_file:
+        return {span["name"]: span for span in map(json.loads, spans_file)}
+
+@pytest.mark.asyncio
+async def test_traced_functions_are_nested_spans(provider, tmp_path):
+    """Test that decorated coroutines record spans in the caller's trace"""
+    @traced()
+    async def get_company():
+        return "company"
+
+    @traced("update_company")
+    async def update_company():
+        return await get_company()
+
+    assert await update_company() == "company"
+
+    spans = read_spans(tmp_path)
+    parent, child = spans["update_company"], spans["test_tracing.get_company"]
+    assert child["context"]["trace_id"] == parent["context"]["trace_id"]
+    assert child["parent_id"] == parent["context"]["span_id"]
+
+@pytest.mark.asyncio
+async def test_audit_call_propagates_trace(provider, tmp_path):
+    """Test that the audit log call is a client span whose traceparent continues the trace"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(201, json={"message": "Audit log entry created successfully"})
+
+    client = AuditLogClient("http://audit-log-srv:8000", transport=httpx.MockTransport(handler))
+    HTTPXClientInstrumentor.instrument_client(client.client, tracer_provider=provider)
+    company_id = uuid4()
+
+    with tracing.tracer.start_as_current_span("PUT /companies/{company_id}") as span:
+        await client.record("UPDATE", company_id, "test-user", 2, new_data={"company_name": "Renamed"})
+        trace_id = format(span.get_span_context().trace_id, "032x")
+
+    request = requests[0]
+    assert request.url.path == "/audit-logs/"
+    assert request.headers["traceparent"].split("-")[1] == trace_id
+    assert request.headers["idempotency-key"] == f"company:{company_id}:UPDATE:2"
+    entry = json.loads(request.content)
+    assert entry["entity_id"] == str(company_id)
+    assert entry["user_id"] == str(audit_user_id("test-user"))
+    assert read_spans(tmp_path)["POST"]["context"]["trace_id"] == f"0x{trace_id}"
+    await client.close()
+
+@pytest.mark.asyncio
+async def test_audit_batch_is_split_into_requests(monkeypatch):
+    """Test that bulk changes are recorded with one batch request per AUDIT_LOG_BATCH_SIZE entries"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(201, json={"message": "audit log entries created successfully"})
+
+    monkeypatch.setattr(audit_client, "AUDIT_LOG_BATCH_SIZE", 2)
+    client = AuditLogClient("http://audit-log-srv:8000", transport=httpx.MockTransport(handler))
+    changes = [(uuid4(), 3), (uuid4(), 5), (uuid4(), 2)]
+
+    await client.record_batch("STATUS", changes, "test-user", new_data={"status_id": "active"})
+    await client.record_batch("STATUS", changes, "test-user", new_data={"status_id": "active"})
+
+    assert [request.url.path for request in requests] == ["/audit-logs/batch"] * 4
+    assert [len(json.loads(request.content)) for request in requests] == [2, 1, 2, 1]
+    entry = json.loads(requests[0].content)[1]
+    assert entry["entity_id"] == str(changes[1][0])
+    assert entry["meta_data"]["version"] == 5
+    # Retries of a chunk reuse its key, different chunks do not
+    keys = [request.headers["idempotency-key"] for request in requests]
+    assert keys[:2] == keys[2:] and keys[0] != keys[1]
+    await client.close()
+
+@pytest.mark.asyncio
+async def test_audit_call_failure_is_not_raised():
+    """Test that a failing audit log call is logged, not raised"""
+    client = AuditLogClient(
+        "http://audit-log-srv:8000",
+        transport=httpx.MockTransport(lambda request: httpx.Response(503))
+    )
+    await client.record("DELETE", uuid4(), "test-user", 3)
+    await client.close()
+
+def test_audit_user_id_is_stable():
+    """Test that non-UUID token subjects map to the same UUID every time"""
+    user_id = uuid4()
+    assert audit_user_id(str(user_id)) == user_id
+    assert audit_user_id("test-user") == audit_user_id("test-user")
+    assert isinstance(audit_user_id("test-user"), UUID)
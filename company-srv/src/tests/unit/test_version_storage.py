@@ -0,0 +1,112 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+from app.database.models.company import Company
+from app.database.models.company_version import CompanyVersion
+from app.services import version_storage
+from app.services.version_storage import (
+    VERSIONED_FIELDS,
+    company_state,
+    diff_states,
+    is_snapshot_version,
+    materialize_versions,
+    new_version
+)
+
+@pytest.fixture
+def delta_mode():
+    with patch.object(version_storage, "VERSION_STORAGE_MODE", "delta"), \
+         patch.object(version_storage, "VERSION_SNAPSHOT_INTERVAL", 3):
+        yield
+
+def _company(**fields) -> Company:
+    values = {
+        "company_id": uuid4(),
+        "company_code": "TEST001",
+        "company_name": "Test Company",
+        "company_country": "DE",
+        "company_accounting_standards": "HGB"
+    }
+    values.update(fields)
+    return Company(**values)
+
+def _row(company_id, version_number, is_snapshot, changes=None, **fields):
+    values = {field: None for field in VERSIONED_FIELDS}
+    values.update(fields)
+    return SimpleNamespace(
+        company_id=company_id,
+        version_number=version_number,
+        is_snapshot=is_snapshot,
+        changes=changes,
+        **values
+    )
+
+def test_full_mode_always_snapshots():
+    """Test that the default mode stores the full state on every version"""
+    company = _company()
+    version = new_version(company, 7, company_state(company), changed_by="test-user", change_type="UPDATE")
+    assert version.is_snapshot is True
+    assert version.company_name == "Test Company"
+    assert version.changes is None
+
+def test_delta_mode_stores_changed_fields(delta_mode):
+    """Test that delta versions only carry the changed fields"""
+    assert [is_snapshot_version(n) for n in range(1, 8)] == [True, False, False, True, False, False, True]
+
+    company = _company()
+    previous = company_state(company)
+    company.company_name = "Renamed"
+    version = new_version(company, 2, previous, changed_by="test-user", change_type="UPDATE")
+    assert version.is_snapshot is False
+    assert version.changes == {"company_name": "Renamed"}
+    assert version.company_name is None
+
+    snapshot = new_version(company, 4, previous, changed_by="test-user", change_type="UPDATE")
+    assert snapshot.is_snapshot is True
+    assert snapshot.company_name == "Renamed"
+
+@pytest.mark.asyncio
+async def test_materialize_versions_replays_deltas(mock_db):
+    """Test that delta versions are rebuilt from the latest snapshot"""
+    company_id = uuid4()
+    status_id = uuid4()
+    base = {
+        "company_code": "TEST001",
+        "company_name": "Original",
+        "company_country": "DE",
+        "company_accounting_standards": "HGB"
+    }
+    mock_db.execute.return_value = MagicMock(__iter__=lambda self: iter([
+        _row(company_id, 4, True, **base),
+        _row(company_id, 5, False, {"company_name": "Renamed"}),
+        _row(company_id, 6, False, {"company_country": "FR", "status_id": str(status_id)}),
+    ]))
+    requested = [
+        CompanyVersion(company_id=company_id, version_number=6, is_snapshot=False, change_type="UPDATE"),
+        CompanyVersion(company_id=company_id, version_number=5, is_snapshot=False, change_type="UPDATE"),
+    ]
+
+    versions = await materialize_versions(mock_db, requested)
+
+    assert [v.version_number for v in versions] == [6, 5]
+    assert versions[0].company_name == "Renamed"
+    assert versions[0].company_country == "FR"
+    assert versions[0].status_id == status_id
+    assert versions[1].company_country == "DE"
+    # Loaded records stay untouched so the session never flushes rebuilt state
+    assert requested[0].company_name is None
+    mock_db.execute.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_materialize_snapshots_skips_query(mock_db):
+    """Test that snapshot-only pages need no extra query"""
+    version = CompanyVersion(company_id=uuid4(), version_number=1, is_snapshot=True, company_name="Test")
+    assert await materialize_versions(mock_db, [version]) == [version]
+    mock_db.execute.assert_not_called()
+
+def test_diff_states():
+    """Test field-level diff between two states"""
+    old = {"company_name": "Original", "company_country": "DE"}
+    new = {"company_name": "Renamed", "company_country": "DE"}
+    assert diff_states(old, new) == {"company_name": {"old": "Original", "new": "Renamed"}}